@@ -0,0 +1,3 @@
+"""
+Benchmarks de rendimiento de Token Helper.
+"""
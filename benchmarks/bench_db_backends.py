@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Comparativa de los backends de base de datos (jdbc y pytds) contra SQL Server.
+
+Cada backend se mide en un proceso nuevo para que la memoria de la JVM no
+afecte al otro: carga del driver, primera conexión (incluido el arranque de
+la JVM), conexiones posteriores, latencia de la consulta del token con el pool
+y memoria residente (RSS) del proceso.
+
+Necesita la VPN y la configuración de .env, como la aplicación.
+
+Uso:
+    python3 -m benchmarks.bench_db_backends --provisioning-id 36
+        [--backends jdbc pytds] [--iterations N] [--connections N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_services import percentile
+
+
+def current_rss_mb() -> float:
+    """Memoria residente actual del proceso en MB (Linux) o el pico si no hay /proc."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso en MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure_backend(backend_name: str, provisioning_id: str, iterations: int, connections: int) -> dict:
+    """
+    Mide un backend en el proceso actual.
+
+    Returns:
+        Tiempos en ms y memoria en MB
+    """
+    from dotenv import load_dotenv
+
+    from src.config.settings import AppConfig
+    from src.services.database import TokenRepository
+
+    load_dotenv(Path(__file__).parent.parent / ".env")
+    config = AppConfig.from_env()
+    config.database.backend = backend_name
+
+    result = {"rss_start_mb": current_rss_mb()}
+    repository = TokenRepository(config.database, config.jtds_jar_path)
+
+    # La consola de TokenRepository no forma parte de la medida
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        repository.backend.load_driver()
+        result["driver_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        connection = repository.backend.connect()
+        result["first_connect_ms"] = (time.perf_counter() - start) * 1000
+        connection.close()
+
+        connect_times = []
+        for _ in range(connections):
+            start = time.perf_counter()
+            connection = repository.backend.connect()
+            connect_times.append((time.perf_counter() - start) * 1000)
+            connection.close()
+
+        # Primera consulta fuera de la medida: abre la conexión del pool
+        repository.get_token_by_provisioning_id(provisioning_id)
+
+        query_times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            repository.get_token_by_provisioning_id(provisioning_id)
+            query_times.append((time.perf_counter() - start) * 1000)
+
+        repository.close()
+
+    connect_times.sort()
+    query_times.sort()
+    result.update({
+        "connect_p50_ms": percentile(connect_times, 0.50),
+        "query_p50_ms": percentile(query_times, 0.50),
+        "query_p95_ms": percentile(query_times, 0.95),
+        "rss_end_mb": current_rss_mb(),
+        "rss_peak_mb": peak_rss_mb(),
+    })
+    return result
+
+
+def run_child(backend_name: str, args) -> dict:
+    """Mide un backend en un proceso nuevo."""
+    command = [
+        sys.executable, "-m", "benchmarks.bench_db_backends",
+        "--child", backend_name,
+        "--provisioning-id", args.provisioning_id,
+        "--iterations", str(args.iterations),
+        "--connections", str(args.connections),
+    ]
+    completed = subprocess.run(
+        command,
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        detail = (completed.stderr or completed.stdout).strip().splitlines()
+        return {"error": detail[-1] if detail else f"código {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_table(results: dict[str, dict]) -> None:
+    """Muestra la comparativa."""
+    rows = [
+        ("Carga del driver", "driver_ms", "ms"),
+        ("Primera conexión", "first_connect_ms", "ms"),
+        ("Conexión (p50)", "connect_p50_ms", "ms"),
+        ("Consulta token (p50)", "query_p50_ms", "ms"),
+        ("Consulta token (p95)", "query_p95_ms", "ms"),
+        ("RSS al inicio", "rss_start_mb", "MB"),
+        ("RSS al final", "rss_end_mb", "MB"),
+        ("RSS pico", "rss_peak_mb", "MB"),
+    ]
+
+    names = list(results)
+    print(f"\n{'':<24}" + "".join(f"{name:>14}" for name in names))
+    for label, key, unit in rows:
+        values = []
+        for name in names:
+            value = results[name].get(key)
+            values.append(f"{value:>11.1f} {unit}" if value is not None else f"{'-':>14}")
+        print(f"{label:<24}" + "".join(values))
+
+    for name, result in results.items():
+        if "error" in result:
+            print(f"\n❌ {name}: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--provisioning-id", required=True, help="ID con token en la BD")
+    parser.add_argument("--backends", nargs="+", default=["jdbc", "pytds"], help="Backends a comparar")
+    parser.add_argument("--iterations", type=int, default=50, help="Consultas medidas por backend")
+    parser.add_argument("--connections", type=int, default=5, help="Conexiones nuevas medidas por backend")
+    parser.add_argument("--child", metavar="BACKEND", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = measure_backend(args.child, args.provisioning_id, args.iterations, args.connections)
+        print(json.dumps(result))
+        return
+
+    results = {}
+    for backend_name in args.backends:
+        print(f"⏱️  Midiendo backend {backend_name}...")
+        results[backend_name] = run_child(backend_name, args)
+
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la actualización del token en archivos JS grandes.
+
+Compara la expresión regular anterior (`MULTILINE | DOTALL` con `.*?` sobre
+todo el archivo) con el escáner léxico de JsTokenTarget, en frío (recorriendo
+el archivo) y con la posición de la asignación ya recordada para la versión
+del archivo, sobre configuraciones generadas de varios megabytes.
+
+Uso:
+    python3 -m benchmarks.bench_js_target [--sizes 1 4] [--iterations N]
+"""
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services.token_targets import JsTokenTarget
+
+
+LEGACY_PATTERN = re.compile(
+    r'(^\s*(?:export\s+)?(?:const|let|var)\s+auth\s*=\s*)(["\'])(.*?)\2\s*;?\s*$',
+    re.MULTILINE | re.DOTALL,
+)
+
+NEW_TOKEN = "eyJhbGciOiJIUzI1NiJ9." + "b" * 600 + ".sig"
+
+
+def legacy_render(content: str, new_token: str) -> str:
+    """Sustitución previa al escáner."""
+    new_content, _ = LEGACY_PATTERN.subn(lambda m: f'{m.group(1)}"{new_token}";', content, count=1)
+    return new_content
+
+
+def generate_config(size: int) -> str:
+    """Configuración generada con URLs, comentarios de bloque y templates."""
+    parts = ["window.__CONFIG__ = {\n"]
+    total = 0
+    i = 0
+    while total < size:
+        i += 1
+        if i % 200 == 0:
+            line = f"  /* Sección {i}: servicios generados (auth = \"no\") */\n"
+        elif i % 500 == 0:
+            line = f"  banner{i}: `Versión ${{version}}\n  const auth = \"no\"`,\n"
+        else:
+            line = (
+                f'  "service_{i}": {{ "url": "https://api.example.com/v1/service/{i}", '
+                f'"timeout": {i % 30}, "author": "team-{i % 7}" }}, // auto\n'
+            )
+        parts.append(line)
+        total += len(line)
+    parts.append("};\n")
+    return "".join(parts)
+
+
+def build_cases(size: int) -> dict[str, str]:
+    """Archivos con la asignación al principio, al final y con comentario final."""
+    body = generate_config(size)
+    token = 'const auth = "eyJhbGciOiJIUzI1NiJ9.' + "a" * 600 + '.sig";\n'
+    return {
+        "al principio": token + body,
+        "al final": body + token,
+        "con comentario": token.replace(";\n", "; // token de desarrollo\n") + body,
+    }
+
+
+def report(label: str, timings: dict[str, float], iterations: int) -> None:
+    """Imprime el tiempo por operación de cada variante."""
+    columns = " | ".join(f"{name}: {seconds / iterations * 1000:9.3f} ms" for name, seconds in timings.items())
+    print(f"{label:<34} {columns}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4], help="Tamaños en MB")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for position, content in build_cases(size * 1024 * 1024).items():
+            target = JsTokenTarget("config.js")
+            version = (1, len(content), 0)
+            expected = target.render(content, NEW_TOKEN)
+            legacy = legacy_render(content, NEW_TOKEN)
+            if legacy != expected:
+                position += " (regex: ≠)"
+
+            target.read_token(content, version)
+            timings = {
+                "regex": timeit.timeit(lambda: legacy_render(content, NEW_TOKEN), number=args.iterations),
+                "escáner": timeit.timeit(lambda: target.render(content, NEW_TOKEN), number=args.iterations),
+                "recordada": timeit.timeit(
+                    lambda: target.render(content, NEW_TOKEN, version),
+                    number=args.iterations,
+                ),
+            }
+            report(f"{size} MB, {position}", timings, args.iterations)
+
+    print("(≠: la regex anterior genera otro archivo: absorbe el comentario o la asignación de un template)")
+
+
+if __name__ == "__main__":
+    main()
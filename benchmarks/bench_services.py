@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark sin conexión de los caminos críticos de TokenService.
+
+Ejecuta auto_update(), auto_update_batch() (con hilos y con asyncio),
+get_token_from_database(), TokenFileManager.update_token() y
+TemplateRenderer.render() contra sustitutos locales (SQLite con las tablas de
+tokens y un servidor de login HTTP), sin VPN ni SQL Server. Informa del
+rendimiento (op/s) y de los percentiles de latencia de cada escenario.
+
+Con --save se guardan los resultados y con --baseline se comparan con una
+ejecución anterior: el script termina con código 1 si el p95 de algún
+escenario empeora más de --tolerance.
+
+Uso:
+    python3 -m benchmarks.bench_services [--iterations N] [--ids N]
+        [--db-latency-ms MS] [--login-latency-ms MS]
+        [--save resultados.json] [--baseline resultados.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_template_renderer import build_context
+from benchmarks.fakes import FakeLoginServer, SqliteTokenDatabase, make_jwt
+from src.config.settings import AppConfig, DatabaseConfig
+from src.services.async_token_service import AsyncTokenService
+from src.services.database import TokenRepository
+from src.services.token_service import TokenService
+from src.web.template_renderer import TemplateRenderer
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Percentil por rango más cercano de una lista ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def measure(operation: Callable[[int], object], iterations: int, warmup: int) -> dict:
+    """
+    Ejecuta una operación y calcula rendimiento y percentiles.
+
+    Args:
+        operation: Función que recibe el número de iteración
+        iterations: Iteraciones medidas
+        warmup: Iteraciones previas no medidas
+
+    Returns:
+        Diccionario con ops_per_sec, p50_ms, p95_ms, p99_ms y max_ms
+    """
+    for index in range(warmup):
+        operation(index)
+
+    durations = []
+    total_start = time.perf_counter()
+    for index in range(iterations):
+        start = time.perf_counter()
+        operation(index)
+        durations.append((time.perf_counter() - start) * 1000)
+    total = time.perf_counter() - total_start
+
+    durations.sort()
+    return {
+        "ops_per_sec": iterations / total if total else 0.0,
+        "p50_ms": percentile(durations, 0.50),
+        "p95_ms": percentile(durations, 0.95),
+        "p99_ms": percentile(durations, 0.99),
+        "max_ms": durations[-1] if durations else 0.0,
+    }
+
+
+def build_service(workdir: Path, database: SqliteTokenDatabase, login_url: str) -> TokenService:
+    """Crea un TokenService que usa los sustitutos locales."""
+    json_path = workdir / "http-client.private.env.json"
+    js_path = workdir / "config.js"
+    json_path.write_text(json.dumps({"dev": {"panel_token": "inicial"}}, indent=2), encoding="utf-8")
+    js_path.write_text('const auth = "inicial";\n', encoding="utf-8")
+
+    config = AppConfig(
+        json_path=str(json_path),
+        js_path=str(js_path),
+        port=0,
+        login_url=login_url,
+        jtds_jar_path="",
+        database=DatabaseConfig(
+            host="sqlite",
+            port=0,
+            name=database.path,
+            domain="LOCAL",
+            user="benchmark",
+            password="",
+        ),
+        auto_refresh_timeout=10.0,
+        token_store_path=str(workdir / "tokens.sqlite3"),
+    )
+    repository = TokenRepository(config.database, config.jtds_jar_path, backend=database)
+    return TokenService(config, repository=repository)
+
+
+def run_scenarios(args) -> dict[str, dict]:
+    """Ejecuta todos los escenarios y devuelve sus resultados."""
+    provisioning_ids = list(range(1000, 1000 + args.ids))
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="token-bench-") as tmp:
+        workdir = Path(tmp)
+        database = SqliteTokenDatabase(
+            workdir / "ngcs.sqlite",
+            connect_latency=args.db_latency_ms / 1000,
+            query_latency=args.db_latency_ms / 1000,
+        )
+        database.seed(provisioning_ids)
+
+        with FakeLoginServer(database, latency=args.login_latency_ms / 1000) as login_server:
+            service = build_service(workdir, database, login_server.url)
+            async_service = AsyncTokenService(service)
+            loop = asyncio.new_event_loop()
+            renderer = TemplateRenderer()
+            context = build_context(renderer)
+            tokens = [make_jwt("a"), make_jwt("b")]
+
+            def pick(index: int) -> int:
+                return provisioning_ids[index % len(provisioning_ids)]
+
+            scenarios = {
+                "get_token_from_database": lambda i: service.get_token_from_database(pick(i), use_cache=False),
+                "get_token_from_database (caché)": lambda i: service.get_token_from_database(pick(i)),
+                # Primera consulta tras un reinicio: sin caché en memoria, con almacén local
+                "get_token_from_database (almacén)": lambda i: (
+                    service.token_cache.invalidate(),
+                    service.get_token_from_database(pick(i)),
+                ),
+                f"get_tokens_by_provisioning_ids ({len(provisioning_ids)})":
+                    lambda i: service.repository.get_tokens_by_provisioning_ids(provisioning_ids),
+                "auto_update": lambda i: service.auto_update(pick(i)),
+                f"auto_update_batch hilos ({len(provisioning_ids)})":
+                    lambda i: service.auto_update_batch(provisioning_ids),
+                f"auto_update_batch asyncio ({len(provisioning_ids)})":
+                    lambda i: loop.run_until_complete(async_service.auto_update_batch(provisioning_ids)),
+                "file_manager.update_token": lambda i: service.file_manager.update_token(tokens[i % 2]),
+                "renderer.render": lambda i: renderer.render("index.html", context),
+            }
+
+            try:
+                for name, operation in scenarios.items():
+                    iterations = args.iterations
+                    if name == "auto_update":
+                        iterations = max(1, iterations // 4)
+                    elif name.startswith("auto_update_batch"):
+                        iterations = max(1, iterations // 20)
+
+                    # Los servicios informan de cada paso por consola
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        results[name] = measure(operation, iterations, args.warmup)
+                    print_result(name, results[name])
+            finally:
+                loop.run_until_complete(async_service.close())
+                loop.close()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    service.close()
+
+    return results
+
+
+def print_result(name: str, result: dict) -> None:
+    """Imprime la línea de resultados de un escenario."""
+    print(
+        f"{name:<42} {result['ops_per_sec']:10.1f} op/s | "
+        f"p50 {result['p50_ms']:8.3f} ms | p95 {result['p95_ms']:8.3f} ms | "
+        f"p99 {result['p99_ms']:8.3f} ms"
+    )
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """
+    Compara el p95 de cada escenario con la ejecución de referencia.
+
+    Returns:
+        Descripción de los escenarios que empeoran más de la tolerancia
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference or not reference.get("p95_ms"):
+            continue
+
+        ratio = result["p95_ms"] / reference["p95_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{name}: p95 {reference['p95_ms']:.3f} ms → {result['p95_ms']:.3f} ms (x{ratio:.2f})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Iteraciones por escenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Iteraciones de calentamiento")
+    parser.add_argument("--ids", type=int, default=50, help="Provisioning IDs en la BD")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Latencia simulada de la BD")
+    parser.add_argument("--login-latency-ms", type=float, default=0.0, help="Latencia simulada del login")
+    parser.add_argument("--save", metavar="RUTA", help="Guarda los resultados en JSON")
+    parser.add_argument("--baseline", metavar="RUTA", help="Resultados de referencia a comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento del p95 admitido (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run_scenarios(args)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\n💾 Resultados guardados en {args.save}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regresiones respecto a la referencia:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones respecto a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de TemplateRenderer.
+
+Compara el renderizado anterior (leer el template del disco y un `replace`
+por variable) con el template compilado y cacheado, y el escapado HTML
+actual (cadena de `replace`) con una traducción de una sola pasada
+(`str.translate`).
+
+Uso:
+    python3 -m benchmarks.bench_template_renderer [--iterations N]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.web.template_renderer import TemplateRenderer
+
+
+def legacy_render(templates_dir: Path, template_name: str, context: dict) -> str:
+    """Renderizado previo a la compilación de templates."""
+    with open(templates_dir / template_name, "r", encoding="utf-8") as f:
+        template = f.read()
+
+    for key, value in context.items():
+        placeholder = f"{{{{ {key} }}}}"
+        template = template.replace(placeholder, str(value))
+
+    return template
+
+
+_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    "{": "&#123;",
+    "}": "&#125;",
+    '"': "&quot;",
+    "'": "&#39;",
+})
+
+
+def translate_escape_html(text: str) -> str:
+    """Escapado en una sola pasada con `str.translate`."""
+    return text.translate(_ESCAPE_TABLE)
+
+
+def build_context(renderer: TemplateRenderer) -> dict:
+    """Contexto similar al de una petición real."""
+    login_result = "STATUS: 200\n\nBODY:\n" + "<div class='x'>{{ login }}</div>\n" * 50
+    return {
+        "msg_block": '<div class="alert alert-success">✅ Token actualizado</div>',
+        "current_token": "Bearer " + "eyJhbGciOiJIUzI1NiJ9." + "a" * 600 + ".sig",
+        "json_path": "/home/user/project/http-client.private.env.json",
+        "js_path": "/home/user/project/public/config.js",
+        "db_result_block": "",
+        "login_result_block": f"<pre>{renderer.escape_html(login_result)}</pre>",
+        "token_animation_class": "token-updated",
+        "styles_css_url": "/static/styles.css?v=0123456789ab",
+        "app_js_url": "/static/app.js?v=0123456789ab",
+    }
+
+
+def report(label: str, before: float, after: float, iterations: int,
+           names: tuple[str, str] = ("antes", "después")) -> None:
+    """Imprime el tiempo por operación de dos variantes."""
+    before_us = before / iterations * 1e6
+    after_us = after / iterations * 1e6
+    print(
+        f"{label:<22} {names[0]}: {before_us:9.2f} µs/op | "
+        f"{names[1]}: {after_us:9.2f} µs/op | x{before_us / after_us:5.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    renderer = TemplateRenderer()
+    context = build_context(renderer)
+    template = "index.html"
+
+    assert legacy_render(renderer.templates_dir, template, context) == renderer.render(template, context)
+
+    before = timeit.timeit(
+        lambda: legacy_render(renderer.templates_dir, template, context),
+        number=args.iterations,
+    )
+    after = timeit.timeit(lambda: renderer.render(template, context), number=args.iterations)
+    report("render()", before, after, args.iterations)
+
+    samples = {
+        "escape_html(token)": context["current_token"],
+        "escape_html(html)": context["login_result_block"] * 4,
+    }
+    for label, text in samples.items():
+        assert translate_escape_html(text) == renderer.escape_html(text)
+
+        translate = timeit.timeit(lambda: translate_escape_html(text), number=args.iterations)
+        chained = timeit.timeit(lambda: renderer.escape_html(text), number=args.iterations)
+        report(label, translate, chained, args.iterations, names=("translate", "replace"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Sustitutos locales de SQL Server y del endpoint de login para los benchmarks.
+
+- SqliteTokenDatabase: SQLite con las tablas CORE_PROVISIONED_PRODUCTS,
+  ACL_USERS y ACL_USER_TOKENS; sus conexiones DB-API traducen el dialecto
+  de SQL Server que usa TokenRepository (`ngcs..tabla`, `SELECT TOP n`).
+- FakeLoginServer: servidor HTTP/1.1 keep-alive que responde al POST de
+  login con una redirección y emite un token nuevo en la base de datos,
+  como hace el panel real.
+"""
+import base64
+import http.server
+import json
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from src.services.db_backends import DatabaseBackend
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS CORE_PROVISIONED_PRODUCTS (
+    CPPR_ID INTEGER PRIMARY KEY,
+    CPPR_PROVISIONINGID INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ACL_USERS (
+    ACUS_ID INTEGER PRIMARY KEY,
+    ACUS_USERNAME TEXT NOT NULL,
+    ACUS_PROVISIONEDPRODUCTID INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ACL_USER_TOKENS (
+    ACUT_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ACUT_USERID INTEGER NOT NULL,
+    ACUT_JWT_TOKEN TEXT,
+    ACUT_LAST_RESFRESH TEXT
+);
+CREATE INDEX IF NOT EXISTS IX_CPPR_PROVISIONINGID ON CORE_PROVISIONED_PRODUCTS (CPPR_PROVISIONINGID);
+CREATE INDEX IF NOT EXISTS IX_ACUS_PRODUCT ON ACL_USERS (ACUS_PROVISIONEDPRODUCTID);
+CREATE INDEX IF NOT EXISTS IX_ACUT_USER ON ACL_USER_TOKENS (ACUT_USERID, ACUT_LAST_RESFRESH);
+"""
+
+_TOP_PATTERN = re.compile(r"^\s*SELECT\s+TOP\s+(\d+)\s", re.IGNORECASE)
+
+
+def make_jwt(subject: str, lifetime: float = 3600.0) -> str:
+    """
+    Genera un JWT (sin firma válida) con `sub`, `iat` y `exp`.
+
+    Args:
+        subject: Valor del claim `sub`
+        lifetime: Segundos de validez
+
+    Returns:
+        Token con el prefijo "Bearer "
+    """
+    def encode(data: dict) -> str:
+        raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+    now = time.time()
+    header = encode({"alg": "HS256", "typ": "JWT"})
+    payload = encode({"sub": subject, "iat": now, "exp": int(now + lifetime)})
+    return f"Bearer {header}.{payload}.firma"
+
+
+def translate_sql(sql: str) -> str:
+    """
+    Traduce las sentencias de TokenRepository al dialecto de SQLite.
+
+    Args:
+        sql: Sentencia en el dialecto de SQL Server
+
+    Returns:
+        Sentencia equivalente para SQLite
+    """
+    sql = sql.replace("ngcs..", "")
+
+    match = _TOP_PATTERN.match(sql)
+    if match:
+        sql = "SELECT " + sql[match.end():] + f" LIMIT {match.group(1)}"
+
+    return sql
+
+
+class _Cursor:
+    """Cursor DB-API que traduce el SQL y simula la latencia de red."""
+
+    def __init__(self, cursor: sqlite3.Cursor, latency: float):
+        self._cursor = cursor
+        self._latency = latency
+
+    def execute(self, sql: str, params: tuple = ()) -> None:
+        if self._latency:
+            time.sleep(self._latency)
+        self._cursor.execute(translate_sql(sql), params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class _Connection:
+    """Conexión DB-API sobre SQLite con la interfaz que usa ConnectionPool."""
+
+    def __init__(self, connection: sqlite3.Connection, latency: float):
+        self._connection = connection
+        self._latency = latency
+
+    def cursor(self) -> _Cursor:
+        return _Cursor(self._connection.cursor(), self._latency)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class SqliteTokenDatabase(DatabaseBackend):
+    """Base de datos SQLite con la forma de las tablas de tokens de SQL Server."""
+
+    name = "sqlite"
+    label = "SQLite"
+    placeholder = "?"
+
+    def __init__(
+        self,
+        path: str | Path,
+        connect_latency: float = 0.0,
+        query_latency: float = 0.0,
+    ):
+        """
+        Inicializa la base de datos.
+
+        Args:
+            path: Ruta del archivo SQLite
+            connect_latency: Segundos que tarda cada conexión nueva
+            query_latency: Segundos añadidos a cada consulta (ida y vuelta)
+        """
+        self.path = str(path)
+        self.connect_latency = connect_latency
+        self.query_latency = query_latency
+        self._write_lock = threading.Lock()
+
+        with self._open() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def seed(self, provisioning_ids: list[int], tokens_per_user: int = 3) -> None:
+        """
+        Crea un producto, un usuario y varios tokens históricos por ID.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+            tokens_per_user: Tokens anteriores de cada usuario
+        """
+        with self._write_lock, self._open() as connection:
+            for index, provisioning_id in enumerate(provisioning_ids, start=1):
+                connection.execute(
+                    "INSERT INTO CORE_PROVISIONED_PRODUCTS (CPPR_ID, CPPR_PROVISIONINGID) VALUES (?, ?)",
+                    (index, provisioning_id),
+                )
+                connection.execute(
+                    "INSERT INTO ACL_USERS (ACUS_ID, ACUS_USERNAME, ACUS_PROVISIONEDPRODUCTID) VALUES (?, ?, ?)",
+                    (index, f"user{provisioning_id}", index),
+                )
+                connection.executemany(
+                    "INSERT INTO ACL_USER_TOKENS (ACUT_USERID, ACUT_JWT_TOKEN, ACUT_LAST_RESFRESH) VALUES (?, ?, ?)",
+                    [
+                        (index, make_jwt(str(provisioning_id)), f"2024-01-{day:02d} 00:00:00.000000")
+                        for day in range(1, tokens_per_user + 1)
+                    ],
+                )
+
+    def load_driver(self) -> None:
+        pass
+
+    def connect(self) -> _Connection:
+        """Abre una conexión DB-API (backend de TokenRepository)."""
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        return _Connection(self._open(), self.query_latency)
+
+    def issue_token(self, provisioning_id: int | str) -> Optional[str]:
+        """
+        Emite un token nuevo para el usuario del ID, como hace el panel tras el login.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+
+        Returns:
+            Token emitido o None si el ID no existe
+        """
+        token = make_jwt(str(provisioning_id))
+        refreshed_at = datetime.now().isoformat(sep=" ", timespec="microseconds")
+
+        with self._write_lock, self._open() as connection:
+            row = connection.execute(
+                """
+                SELECT ACUS_ID FROM ACL_USERS
+                    JOIN CORE_PROVISIONED_PRODUCTS ON CPPR_ID = ACUS_PROVISIONEDPRODUCTID
+                WHERE CPPR_PROVISIONINGID = ?
+                """,
+                (provisioning_id,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "INSERT INTO ACL_USER_TOKENS (ACUT_USERID, ACUT_JWT_TOKEN, ACUT_LAST_RESFRESH) VALUES (?, ?, ?)",
+                (row[0], token, refreshed_at),
+            )
+
+        return token
+
+    def _open(self) -> sqlite3.Connection:
+        """Abre una conexión SQLite compartible entre hilos (la usa el pool)."""
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.isolation_level = None
+        return connection
+
+
+class _LoginHandler(http.server.BaseHTTPRequestHandler):
+    """Imita el formulario de login del panel."""
+
+    protocol_version = "HTTP/1.1"
+    server: "_LoginHTTPServer"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        data = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+        provisioning_id = (data.get("provisioningId", [""])[0] or "").strip()
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if not provisioning_id:
+            self._send(400, b"Falta provisioningId")
+            return
+
+        self.server.fake.schedule_refresh(provisioning_id)
+
+        self.send_response(302)
+        self.send_header("Location", "/panel")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._send(200, b"<html><body>" + b"<div>panel</div>" * 200 + b"</body></html>")
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LoginHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Admite ráfagas de cientos de conexiones (benchmarks con asyncio)
+    request_queue_size = 1024
+
+    def __init__(self, server_address, fake: "FakeLoginServer", latency: float):
+        super().__init__(server_address, _LoginHandler)
+        self.fake = fake
+        self.latency = latency
+
+
+class FakeLoginServer:
+    """Endpoint de login local que refresca los tokens de una SqliteTokenDatabase."""
+
+    def __init__(
+        self,
+        database: SqliteTokenDatabase,
+        latency: float = 0.0,
+        refresh_delay: float = 0.0,
+    ):
+        """
+        Inicializa el servidor.
+
+        Args:
+            database: Base de datos en la que se emiten los tokens
+            latency: Segundos que tarda en responder el POST de login
+            refresh_delay: Segundos tras la respuesta en los que aparece el token nuevo
+        """
+        self.database = database
+        self.latency = latency
+        self.refresh_delay = refresh_delay
+        self._server: Optional[_LoginHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL del endpoint de login."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/login"
+
+    def start(self) -> "FakeLoginServer":
+        """Arranca el servidor en un puerto libre."""
+        self._server = _LoginHTTPServer(("127.0.0.1", 0), self, self.latency)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Detiene el servidor."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def schedule_refresh(self, provisioning_id: str) -> None:
+        """Emite el token nuevo, inmediatamente o tras refresh_delay."""
+        if not self.refresh_delay:
+            self.database.issue_token(provisioning_id)
+            return
+
+        timer = threading.Timer(self.refresh_delay, self.database.issue_token, (provisioning_id,))
+        timer.daemon = True
+        timer.start()
+
+    def __enter__(self) -> "FakeLoginServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
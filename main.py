@@ -8,6 +8,10 @@ Script de entrada principal. Delega la ejecución a la aplicación modular.
 Uso:
     python3 main.py                    # Inicia el servidor web
     python3 main.py --auto <prov_id>   # Modo automático
+    python3 main.py --auto <id> <id>   # Modo automático por lotes
+    python3 main.py --auto-file ids.txt --workers 8
+    python3 main.py --daemon           # Daemon residente que usa --auto si está en marcha
+    python3 main.py --auto <id> --profile  # Traza y perfil de cProfile en traces/
 """
 
 if __name__ == "__main__":
@@ -65,12 +65,17 @@ function run_web() {
 function run_auto() {
     if [ -z "$1" ]; then
         echo -e "${RED}❌ Falta el provisioning ID${NC}"
-        echo "   Uso: ./run.sh auto <provisioning_id>"
+        echo "   Uso: ./run.sh auto <provisioning_id> [<provisioning_id> ...]"
         exit 1
     fi
 
     echo -e "${YELLOW}Ejecutando modo automático...${NC}"
-    python3 main.py --auto "$1"
+    python3 main.py --auto "$@"
+}
+
+function run_daemon() {
+    echo -e "${YELLOW}Iniciando daemon...${NC}"
+    python3 main.py --daemon
 }
 
 function show_help() {
@@ -80,7 +85,9 @@ function show_help() {
     echo "  check       Verifica dependencias y configuración"
     echo "  install     Instala dependencias de Python"
     echo "  web         Inicia el servidor web (por defecto)"
-    echo "  auto <id>   Ejecuta modo automático con el provisioning ID"
+    echo "  auto <id>…  Ejecuta modo automático con uno o varios provisioning IDs"
+    echo "              (usa el daemon si está en marcha)"
+    echo "  daemon      Inicia el daemon residente para el modo automático"
     echo "  help        Muestra esta ayuda"
     echo ""
 }
@@ -102,7 +109,11 @@ case "${1:-web}" in
         ;;
     auto)
         check_dependencies
-        run_auto "$2"
+        run_auto "${@:2}"
+        ;;
+    daemon)
+        check_dependencies
+        run_daemon
         ;;
     help|--help|-h)
         show_help
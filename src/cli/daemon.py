@@ -0,0 +1,345 @@
+"""
+Daemon residente para el modo automático.
+
+Mantiene en memoria la JVM, el pool de conexiones a SQL Server, las
+conexiones keep-alive del login y las cachés, y atiende las peticiones de
+`main.py --auto` por un socket Unix local. Cada petición es una línea JSON y
+cada respuesta otra:
+
+    {"action": "auto_update", "provisioning_id": 36}
+    {"ok": true, "result": {...}}
+"""
+import json
+import math
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Optional
+
+from ..services import tracing
+from ..services.file_manager import FileWriteResult, TokenFileManager
+from ..services.token_service import AutoUpdateResult, TokenService
+
+
+class DaemonError(RuntimeError):
+    """Error devuelto por el daemon al procesar una petición."""
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Atiende las peticiones de una conexión (una línea JSON por petición)."""
+
+    server: "_UnixDaemonServer"
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("se esperaba un objeto JSON")
+            except ValueError as e:
+                reply = {"ok": False, "error": f"Petición no válida: {e}"}
+            else:
+                reply = self.server.token_daemon.dispatch(request)
+
+            self.wfile.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _UnixDaemonServer(socketserver.ThreadingUnixStreamServer):
+    """Servidor de socket Unix con un hilo por cliente."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, token_daemon: "TokenDaemon"):
+        self.token_daemon = token_daemon
+        super().__init__(socket_path, _DaemonRequestHandler)
+
+
+class TokenDaemon:
+    """Proceso residente que ejecuta el modo automático para la CLI."""
+
+    def __init__(self, token_service: TokenService, socket_path: str):
+        """
+        Inicializa el daemon.
+
+        Args:
+            token_service: Servicio de tokens que se mantiene en memoria
+            socket_path: Ruta del socket Unix
+        """
+        self.token_service = token_service
+        self.socket_path = socket_path
+        self.started_at = time.time()
+        self.requests_served = 0
+        self._server: Optional[_UnixDaemonServer] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Escucha en el socket hasta recibir Ctrl+C o SIGTERM."""
+        self._prepare_socket()
+
+        # Solo el usuario que arranca el daemon puede lanzar logins con él. El
+        # socket se crea ya con permisos 0600 (umask) para que no haya un
+        # intervalo entre bind() y listen() en el que otros usuarios conecten
+        previous_umask = os.umask(0o177)
+        try:
+            self._server = _UnixDaemonServer(self.socket_path, self)
+        finally:
+            os.umask(previous_umask)
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._handle_sigterm)
+
+        print(f"🛰️  Daemon escuchando en {self.socket_path} (PID {os.getpid()})")
+        print("   Las llamadas a main.py --auto lo usarán automáticamente")
+
+        threading.Thread(
+            target=self.token_service.warm_up_database,
+            name="db-prewarm",
+            daemon=True,
+        ).start()
+
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Daemon detenido")
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Cierra el socket y libera los servicios."""
+        server, self._server = self._server, None
+        if server is None:
+            return
+
+        server.server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self.token_service.close()
+
+    def dispatch(self, request: dict) -> dict:
+        """
+        Ejecuta una petición.
+
+        Args:
+            request: Petición con la clave "action" y sus parámetros
+
+        Returns:
+            {"ok": True, "result": ...} o {"ok": False, "error": "..."}
+        """
+        handlers = {
+            "ping": self._ping,
+            "auto_update": self._auto_update,
+            "auto_update_batch": self._auto_update_batch,
+        }
+
+        action = request.get("action")
+        handler = handlers.get(action)
+        if handler is None:
+            return {"ok": False, "error": f"Acción no soportada: {action}"}
+
+        with self._lock:
+            self.requests_served += 1
+
+        try:
+            if action == "ping":
+                return {"ok": True, "result": handler(request)}
+            with tracing.trace(f"daemon.{action}"):
+                return {"ok": True, "result": handler(request)}
+        except Exception as e:
+            return {"ok": False, "error": str(e).strip() or repr(e)}
+
+    def _ping(self, request: dict) -> dict:
+        """Estado del daemon."""
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started_at,
+            "requests": self.requests_served,
+        }
+
+    def _auto_update(self, request: dict) -> dict:
+        """Login, espera al refresco y actualización de los archivos de un ID."""
+        provisioning_id = request.get("provisioning_id")
+        if provisioning_id in (None, ""):
+            raise ValueError("Falta provisioning_id")
+
+        print(f"🤖 Modo automático (daemon) para provisioning ID {provisioning_id}")
+        start = time.perf_counter()
+        token = self.token_service.refresh_token(provisioning_id)
+        results = self.token_service.file_manager.update_token(token)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        files = [{**asdict(result), "path": str(result.path)} for result in results]
+        return {"provisioning_id": provisioning_id, "token": token, "total_ms": total_ms, "files": files}
+
+    def _auto_update_batch(self, request: dict) -> list[dict]:
+        """Modo automático por lotes."""
+        provisioning_ids = request.get("provisioning_ids")
+        if not isinstance(provisioning_ids, list) or not provisioning_ids:
+            raise ValueError("provisioning_ids debe ser una lista no vacía")
+
+        results = self.token_service.auto_update_batch(provisioning_ids, max_workers=request.get("workers"))
+        return [asdict(result) for result in results]
+
+    def _prepare_socket(self) -> None:
+        """
+        Elimina un socket huérfano o falla si ya hay un daemon escuchando.
+
+        Raises:
+            RuntimeError: Si ya hay un daemon o la ruta no es un socket
+        """
+        path = Path(self.socket_path)
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+        try:
+            mode = path.lstat().st_mode
+        except FileNotFoundError:
+            return
+
+        # Nunca se borra un archivo normal por una DAEMON_SOCKET mal configurada
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f"{self.socket_path} existe y no es un socket; elimínalo o cambia DAEMON_SOCKET")
+
+        if DaemonClient(self.socket_path).ping() is not None:
+            raise RuntimeError(f"Ya hay un daemon escuchando en {self.socket_path}")
+
+        # Socket de un daemon que terminó sin limpiar
+        path.unlink()
+
+    @staticmethod
+    def _handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+
+
+class DaemonClient:
+    """Cliente del daemon para la CLI."""
+
+    def __init__(self, socket_path: str, connect_timeout: float = 1.0, request_timeout: float = 100.0):
+        """
+        Inicializa el cliente.
+
+        Args:
+            socket_path: Ruta del socket Unix del daemon
+            connect_timeout: Segundos máximos para conectar
+            request_timeout: Segundos máximos de espera de la respuesta de un ID
+                (AppConfig.daemon_request_timeout)
+        """
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+
+    def ping(self) -> Optional[dict]:
+        """
+        Comprueba si el daemon está en marcha.
+
+        Returns:
+            Estado del daemon o None si no responde
+        """
+        try:
+            return self.request("ping", timeout=self.connect_timeout)
+        except (OSError, DaemonError, ValueError):
+            return None
+
+    def auto_update(self, provisioning_id: int | str) -> dict:
+        """
+        Ejecuta el modo automático de un ID en el daemon.
+
+        Returns:
+            Token, tiempo total y resultado de cada archivo
+
+        Raises:
+            DaemonError: Si el modo automático falla en el daemon
+            OSError: Si no se puede hablar con el daemon o no responde a tiempo
+        """
+        return self.request("auto_update", provisioning_id=provisioning_id)
+
+    def auto_update_batch(
+        self,
+        provisioning_ids: list[int | str],
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> list[AutoUpdateResult]:
+        """
+        Ejecuta el modo automático por lotes en el daemon.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+            workers: Logins simultáneos (None: AUTO_WORKERS del daemon)
+            timeout: Segundos máximos de espera (por defecto, request_timeout
+                por cada tanda de `workers` IDs)
+
+        Returns:
+            Resultado de cada ID, en el orden recibido
+
+        Raises:
+            DaemonError: Si el daemon rechaza la petición
+            OSError: Si no se puede hablar con el daemon o no responde a tiempo
+        """
+        if timeout is None:
+            rounds = math.ceil(len(provisioning_ids) / workers) if workers else len(provisioning_ids)
+            timeout = self.request_timeout * max(rounds, 1)
+        results = self.request(
+            "auto_update_batch",
+            timeout=timeout,
+            provisioning_ids=provisioning_ids,
+            workers=workers,
+        )
+        return [AutoUpdateResult(**result) for result in results]
+
+    @tracing.traced("daemon.request")
+    def request(self, action: str, timeout: Optional[float] = None, **params) -> Any:
+        """
+        Envía una petición y espera la respuesta.
+
+        Args:
+            action: Acción del daemon
+            timeout: Segundos máximos de espera de la respuesta (None: request_timeout)
+            **params: Parámetros de la acción
+
+        Returns:
+            Resultado de la acción
+
+        Raises:
+            DaemonError: Si el daemon devuelve un error
+            OSError: Si no se puede conectar, la conexión se corta o vence el plazo
+        """
+        tracing.annotate(action=action)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(self.socket_path)
+            sock.settimeout(self.request_timeout if timeout is None else timeout)
+
+            payload = json.dumps({"action": action, **params}, ensure_ascii=False) + "\n"
+            sock.sendall(payload.encode("utf-8"))
+
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+
+        if not line:
+            raise ConnectionError("El daemon cerró la conexión sin responder")
+
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise DaemonError(reply.get("error", "Error desconocido del daemon"))
+        return reply.get("result")
+
+
+def print_file_results(files: list[dict]) -> None:
+    """Muestra el resultado de cada archivo devuelto por el daemon."""
+    for data in files:
+        TokenFileManager.print_result(FileWriteResult(
+            path=Path(data["path"]),
+            status=data["status"],
+            elapsed_ms=data["elapsed_ms"],
+            error=data.get("error", ""),
+        ))
@@ -1,15 +1,37 @@
 """
 Gestión de configuración de la aplicación.
 """
+import getpass
 import os
-from dataclasses import dataclass
+import tempfile
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    """Lee una variable de entorno booleana (1/true/yes/on)."""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _default_daemon_socket() -> str:
+    """Ruta por defecto del socket del daemon, una por usuario."""
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return str(Path(runtime_dir) / "token-helper.sock")
+    return str(Path(tempfile.gettempdir()) / f"token-helper-{getpass.getuser()}.sock")
+
+
 @dataclass
 class DatabaseConfig:
     """Configuración de la base de datos SQL Server."""
+
+    # Drivers soportados: JDBC con jTDS (JVM) o python-tds
+    BACKENDS = ("jdbc", "pytds")
+
     host: str
     port: int
     name: str
@@ -17,6 +39,12 @@ class DatabaseConfig:
     user: str
     password: str
     tds_version: str = "8.0"
+    pool_min_size: int = 0
+    pool_max_size: int = 4
+    pool_idle_timeout: float = 300.0
+    pool_validate_on_borrow: bool = True
+    pool_validation_interval: float = 5.0
+    backend: str = "jdbc"
 
     @property
     def jdbc_url(self) -> str:
@@ -35,15 +63,110 @@ class DatabaseConfig:
         }
 
 
+@dataclass
+class TokenTargetConfig:
+    """Archivo adicional en el que se guarda el token."""
+    kind: str
+    path: str
+    option: str = ""
+
+    KINDS = ("json", "js", "dotenv")
+
+    @classmethod
+    def parse_list(cls, spec: str) -> list['TokenTargetConfig']:
+        """
+        Interpreta la variable TOKEN_TARGETS.
+
+        Formato: entradas `tipo:ruta[#opción]` separadas por `;` o saltos de
+        línea. La opción es la ruta de claves en JSON (`dev.panel_token`), la
+        variable en JS (`auth`) o la clave en dotenv (`PANEL_TOKEN`).
+
+        Args:
+            spec: Valor de la variable
+
+        Returns:
+            Lista de destinos
+
+        Raises:
+            ValueError: Si alguna entrada no tiene el formato esperado
+        """
+        targets = []
+
+        for entry in spec.replace("\n", ";").split(";"):
+            entry = entry.strip()
+            if not entry:
+                continue
+
+            kind, separator, rest = entry.partition(":")
+            kind = kind.strip().lower()
+            if not separator or kind not in cls.KINDS:
+                raise ValueError(
+                    f"Destino de token no válido: '{entry}' "
+                    f"(usa tipo:ruta[#opción] con tipo en {', '.join(cls.KINDS)})"
+                )
+
+            path, _, option = rest.partition("#")
+            if not path.strip():
+                raise ValueError(f"Destino de token sin ruta: '{entry}'")
+
+            targets.append(cls(kind, path.strip(), option.strip()))
+
+        return targets
+
+
 @dataclass
 class AppConfig:
     """Configuración general de la aplicación."""
+
+    # Vigilancia de los archivos de token para /events
+    TOKEN_WATCH_BACKENDS = ("auto", "inotify", "poll")
+
+    # Segundos que se reservan para la BD en cada petición al daemon: apertura
+    # de la conexión (15 s) y espera por una conexión libre del pool (30 s)
+    DAEMON_DATABASE_TIMEOUT = 45.0
+
     json_path: str
     js_path: str
     port: int
     login_url: str
     jtds_jar_path: str
     database: DatabaseConfig
+    token_cache_size: int = 256
+    token_cache_expiry_margin: float = 60.0
+    token_store_enabled: bool = True
+    token_store_path: str = "cache/tokens.sqlite3"
+    token_store_prune_interval: float = 300.0
+    auto_wait_for_refresh: bool = True
+    auto_refresh_timeout: float = 15.0
+    auto_workers: int = 8
+    async_max_concurrency: int = 100
+    async_db_workers: int = 4
+    web_max_workers: int = 8
+    web_queue_size: int = 32
+    web_prewarm_database: bool = True
+    web_keepalive_timeout: float = 5.0
+    web_keepalive_max_requests: int = 100
+    web_events_max_clients: int = 50
+    web_events_heartbeat: float = 15.0
+    token_watch_backend: str = "auto"
+    token_watch_poll_interval: float = 1.0
+    token_targets: list[TokenTargetConfig] = field(default_factory=list)
+    file_write_workers: int = 8
+    login_connect_timeout: float = 10.0
+    login_read_timeout: float = 30.0
+    login_max_body_bytes: int = 2000
+    refresh_watch_ids: list[str] = field(default_factory=list)
+    refresh_lead_time: float = 300.0
+    refresh_jitter: float = 60.0
+    refresh_max_concurrency: int = 2
+    refresh_retry_delay: float = 60.0
+    daemon_socket: str = field(default_factory=_default_daemon_socket)
+    trace_enabled: bool = False
+    trace_profile: bool = False
+    trace_file: str = "traces/traces.jsonl"
+    trace_max_bytes: int = 10 * 1024 * 1024
+    trace_backup_count: int = 5
+    trace_max_profiles: int = 100
 
     @classmethod
     def from_env(cls) -> 'AppConfig':
@@ -56,6 +179,12 @@ class AppConfig:
             user=os.getenv("DB_USER", "usuario"),
             password=os.getenv("DB_PASSWORD", ""),
             tds_version=os.getenv("TDS_VERSION", "8.0"),
+            pool_min_size=int(os.getenv("DB_POOL_MIN_SIZE", "0")),
+            pool_max_size=int(os.getenv("DB_POOL_MAX_SIZE", "4")),
+            pool_idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+            pool_validate_on_borrow=_env_bool("DB_POOL_VALIDATE_ON_BORROW", True),
+            pool_validation_interval=float(os.getenv("DB_POOL_VALIDATION_INTERVAL", "5")),
+            backend=os.getenv("DB_BACKEND", "jdbc").strip().lower(),
         )
 
         base_path = Path(__file__).parent.parent.parent
@@ -70,6 +199,61 @@ class AppConfig:
             ),
             jtds_jar_path=str(base_path / "jtds-1.3.1.jar"),
             database=db_config,
+            token_cache_size=int(os.getenv("TOKEN_CACHE_SIZE", "256")),
+            token_cache_expiry_margin=float(os.getenv("TOKEN_CACHE_EXPIRY_MARGIN", "60")),
+            token_store_enabled=_env_bool("TOKEN_STORE_ENABLED", True),
+            token_store_path=os.getenv("TOKEN_STORE_PATH") or str(base_path / "cache" / "tokens.sqlite3"),
+            token_store_prune_interval=float(os.getenv("TOKEN_STORE_PRUNE_SECONDS", "300")),
+            auto_wait_for_refresh=_env_bool("AUTO_WAIT_FOR_REFRESH", True),
+            auto_refresh_timeout=float(os.getenv("AUTO_REFRESH_TIMEOUT", "15")),
+            auto_workers=int(os.getenv("AUTO_WORKERS", "8")),
+            async_max_concurrency=int(os.getenv("ASYNC_MAX_CONCURRENCY", "100")),
+            async_db_workers=int(os.getenv("ASYNC_DB_WORKERS", "4")),
+            web_max_workers=int(os.getenv("WEB_MAX_WORKERS", "8")),
+            web_queue_size=int(os.getenv("WEB_QUEUE_SIZE", "32")),
+            web_prewarm_database=_env_bool("WEB_PREWARM_DATABASE", True),
+            web_keepalive_timeout=float(os.getenv("WEB_KEEPALIVE_TIMEOUT", "5")),
+            web_keepalive_max_requests=int(os.getenv("WEB_KEEPALIVE_MAX_REQUESTS", "100")),
+            web_events_max_clients=int(os.getenv("WEB_EVENTS_MAX_CLIENTS", "50")),
+            web_events_heartbeat=float(os.getenv("WEB_EVENTS_HEARTBEAT_SECONDS", "15")),
+            token_watch_backend=os.getenv("TOKEN_WATCH_BACKEND", "auto").strip().lower(),
+            token_watch_poll_interval=float(os.getenv("TOKEN_WATCH_POLL_SECONDS", "1")),
+            token_targets=TokenTargetConfig.parse_list(os.getenv("TOKEN_TARGETS", "")),
+            file_write_workers=int(os.getenv("FILE_WRITE_WORKERS", "8")),
+            login_connect_timeout=float(os.getenv("LOGIN_CONNECT_TIMEOUT", "10")),
+            login_read_timeout=float(os.getenv("LOGIN_READ_TIMEOUT", "30")),
+            login_max_body_bytes=int(os.getenv("LOGIN_MAX_BODY_BYTES", "2000")),
+            refresh_watch_ids=[
+                value.strip()
+                for value in os.getenv("REFRESH_WATCH_IDS", "").replace(";", ",").split(",")
+                if value.strip()
+            ],
+            refresh_lead_time=float(os.getenv("REFRESH_LEAD_SECONDS", "300")),
+            refresh_jitter=float(os.getenv("REFRESH_JITTER_SECONDS", "60")),
+            refresh_max_concurrency=int(os.getenv("REFRESH_MAX_CONCURRENCY", "2")),
+            refresh_retry_delay=float(os.getenv("REFRESH_RETRY_SECONDS", "60")),
+            daemon_socket=os.getenv("DAEMON_SOCKET") or _default_daemon_socket(),
+            trace_enabled=_env_bool("TRACE_ENABLED", False),
+            trace_profile=_env_bool("TRACE_PROFILE", False),
+            trace_file=os.getenv("TRACE_FILE") or str(base_path / "traces" / "traces.jsonl"),
+            trace_max_bytes=int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024))),
+            trace_backup_count=int(os.getenv("TRACE_BACKUP_COUNT", "5")),
+            trace_max_profiles=int(os.getenv("TRACE_MAX_PROFILES", "100")),
+        )
+
+    @property
+    def daemon_request_timeout(self) -> float:
+        """
+        Espera máxima de la CLI por la respuesta del daemon para un provisioning ID.
+
+        Suma los plazos del login, la espera al refresco en la BD y el margen
+        de las consultas, para que un daemon colgado no bloquee `--auto`.
+        """
+        return (
+            self.login_connect_timeout
+            + self.login_read_timeout
+            + self.auto_refresh_timeout
+            + self.DAEMON_DATABASE_TIMEOUT
         )
 
     def validate(self) -> list[str]:
@@ -79,8 +263,66 @@ class AppConfig:
         if not self.database.password:
             errors.append("DB_PASSWORD no está configurado")
 
-        if not Path(self.jtds_jar_path).exists():
+        if self.database.backend not in DatabaseConfig.BACKENDS:
+            errors.append(
+                f"DB_BACKEND no soportado: {self.database.backend} "
+                f"(opciones: {', '.join(DatabaseConfig.BACKENDS)})"
+            )
+        elif self.database.backend == "jdbc" and not Path(self.jtds_jar_path).exists():
             errors.append(f"Driver jTDS no encontrado: {self.jtds_jar_path}")
 
+        if self.file_write_workers < 1:
+            errors.append("FILE_WRITE_WORKERS debe ser al menos 1")
+
+        if self.refresh_max_concurrency < 1:
+            errors.append("REFRESH_MAX_CONCURRENCY debe ser al menos 1")
+
+        if self.auto_workers < 1:
+            errors.append("AUTO_WORKERS debe ser al menos 1")
+
+        if self.async_max_concurrency < 1:
+            errors.append("ASYNC_MAX_CONCURRENCY debe ser al menos 1")
+
+        if self.async_db_workers < 1:
+            errors.append("ASYNC_DB_WORKERS debe ser al menos 1")
+
+        if self.web_max_workers < 1:
+            errors.append("WEB_MAX_WORKERS debe ser al menos 1")
+
+        if self.web_queue_size < 0:
+            errors.append("WEB_QUEUE_SIZE no puede ser negativo")
+
+        if self.web_keepalive_timeout < 0:
+            errors.append("WEB_KEEPALIVE_TIMEOUT no puede ser negativo")
+
+        if self.web_keepalive_max_requests < 1:
+            errors.append("WEB_KEEPALIVE_MAX_REQUESTS debe ser al menos 1")
+
+        if self.web_events_max_clients < 1:
+            errors.append("WEB_EVENTS_MAX_CLIENTS debe ser al menos 1")
+
+        if self.web_events_heartbeat <= 0:
+            errors.append("WEB_EVENTS_HEARTBEAT_SECONDS debe ser mayor que 0")
+
+        if self.token_watch_backend not in self.TOKEN_WATCH_BACKENDS:
+            errors.append(
+                f"TOKEN_WATCH_BACKEND no soportado: {self.token_watch_backend} "
+                f"(opciones: {', '.join(self.TOKEN_WATCH_BACKENDS)})"
+            )
+
+        if self.token_watch_poll_interval <= 0:
+            errors.append("TOKEN_WATCH_POLL_SECONDS debe ser mayor que 0")
+
+        if self.token_store_prune_interval < 0:
+            errors.append("TOKEN_STORE_PRUNE_SECONDS no puede ser negativo")
+
+        if self.trace_max_bytes < 1024:
+            errors.append("TRACE_MAX_BYTES debe ser al menos 1024")
+
+        if self.database.pool_max_size < 1:
+            errors.append("DB_POOL_MAX_SIZE debe ser al menos 1")
+        elif not 0 <= self.database.pool_min_size <= self.database.pool_max_size:
+            errors.append("DB_POOL_MIN_SIZE debe estar entre 0 y DB_POOL_MAX_SIZE")
+
         return errors
 
@@ -1,27 +1,54 @@
 """
 Aplicación principal - Punto de entrada.
 """
+import argparse
+import asyncio
+import math
+import re
 import sys
 from pathlib import Path
+from typing import Optional
 
 # Agregar el directorio src al path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from dotenv import load_dotenv
 
+from src.cli.daemon import DaemonClient, DaemonError, TokenDaemon, print_file_results
 from src.config.settings import AppConfig
-from src.services.token_service import TokenService
+from src.services import tracing
+from src.services.async_token_service import AsyncTokenService
+from src.services.token_service import AutoUpdateResult, TokenService
 from src.web.server import TokenWebServer
 
 
 class Application:
     """Aplicación principal de Token Helper."""
 
-    def __init__(self):
-        """Inicializa la aplicación."""
+    def __init__(self, args: Optional[argparse.Namespace] = None):
+        """
+        Inicializa la aplicación.
+
+        Args:
+            args: Argumentos de línea de comandos ya interpretados
+        """
+        self.args = args if args is not None else parse_args()
         self._load_environment()
         self.config = self._load_config()
-        self.token_service = TokenService(self.config)
+        self._configure_tracing()
+        self._token_service: Optional[TokenService] = None
+
+    @property
+    def token_service(self) -> TokenService:
+        """
+        Servicio de tokens, creado al usarlo por primera vez.
+
+        Cuando `--auto` delega en el daemon no se llega a crear, así que no se
+        abre el almacén de tokens ni se prepara el pool de conexiones.
+        """
+        if self._token_service is None:
+            self._token_service = TokenService(self.config)
+        return self._token_service
 
     def _load_environment(self):
         """Carga las variables de entorno desde .env"""
@@ -44,45 +71,291 @@ class Application:
             for error in errors:
                 print(f"   • {error}")
 
-            # Solo salir si hay errores críticos
-            if "jTDS no encontrado" in str(errors):
+            # Solo salir si hay errores críticos: sin DB_PASSWORD se puede seguir
+            # usando la actualización manual, pero un valor numérico fuera de
+            # rango o un driver que falta harían fallar la aplicación más tarde
+            critical = [error for error in errors if not error.startswith("DB_PASSWORD")]
+            if "jTDS no encontrado" in str(critical):
                 print("\n💡 Descarga jTDS desde:")
                 print("   https://sourceforge.net/projects/jtds/files/jtds/1.3.1/")
+            if critical:
                 sys.exit(1)
 
         return config
 
+    def _configure_tracing(self):
+        """Activa las trazas con TRACE_ENABLED o --profile (que añade cProfile)."""
+        if self.args.profile:
+            self.config.trace_enabled = True
+            self.config.trace_profile = True
+
+        if not self.config.trace_enabled:
+            return
+
+        tracer = tracing.Tracer.from_config(self.config)
+        tracing.configure(tracer)
+        print(f"🔬 Trazas activadas en {tracer.path}")
+        if tracer.profile:
+            print(f"   Perfiles de cProfile en {tracer.profile_dir}")
+
     def run_web_server(self):
         """Inicia el servidor web."""
-        server = TokenWebServer(self.config)
+        server = TokenWebServer(self.config, self.token_service)
         server.start()
 
+    def run_daemon(self):
+        """Inicia el daemon residente para el modo automático."""
+        daemon = TokenDaemon(self.token_service, self.config.daemon_socket)
+        daemon.start()
+
+    def connect_daemon(self) -> Optional[DaemonClient]:
+        """
+        Obtiene un cliente del daemon si está en marcha.
+
+        Returns:
+            Cliente del daemon, o None si no responde o se ha pedido --no-daemon
+        """
+        if self.args.no_daemon:
+            return None
+
+        client = DaemonClient(self.config.daemon_socket, request_timeout=self.config.daemon_request_timeout)
+        status = client.ping()
+        if status is None:
+            return None
+
+        print(f"🛰️  Usando el daemon (PID {status['pid']}) en {self.config.daemon_socket}")
+        return client
+
     def run_auto_mode(self, provisioning_id: str):
         """
         Ejecuta el modo automático.
 
+        Usa el daemon si está en marcha; si no, lo ejecuta en este proceso.
+
         Args:
             provisioning_id: ID de aprovisionamiento
         """
+        client = None if self.args.async_mode else self.connect_daemon()
         try:
+            if self.args.async_mode:
+                asyncio.run(self._async_auto_update(provisioning_id))
+                return
+
+            if client:
+                try:
+                    result = client.auto_update(provisioning_id)
+                except OSError as e:
+                    self._print_daemon_fallback(e)
+                else:
+                    print_file_results(result["files"])
+                    print(f"✅ Token obtenido y actualizado correctamente ({result['total_ms']:.0f} ms)")
+                    return
+
             self.token_service.auto_update(provisioning_id)
         except Exception as e:
             print(f"❌ Error en modo automático: {e}")
             sys.exit(1)
 
-    def run(self):
-        """Ejecuta la aplicación según los argumentos de línea de comandos."""
-        if len(sys.argv) > 1 and sys.argv[1] == "--auto":
-            provisioning_id = sys.argv[2] if len(sys.argv) > 2 else None
+    def run_batch_auto_mode(self, provisioning_ids: list[str], workers: Optional[int] = None):
+        """
+        Ejecuta el modo automático para varios IDs y muestra una tabla de resultados.
 
-            if not provisioning_id:
-                print("❌ Falta provisioning ID")
-                print("   Uso: python main.py --auto <provisioning_id>")
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+            workers: Logins simultáneos
+        """
+        client = None if self.args.async_mode else self.connect_daemon()
+        results = None
+        if self.args.async_mode:
+            results = asyncio.run(self._async_auto_update_batch(provisioning_ids, workers))
+        elif client:
+            try:
+                # El daemon lanza los logins en tandas de AUTO_WORKERS si no se indica --workers
+                rounds = math.ceil(len(provisioning_ids) / (workers or self.config.auto_workers))
+                results = client.auto_update_batch(
+                    provisioning_ids,
+                    workers,
+                    timeout=rounds * self.config.daemon_request_timeout,
+                )
+            except OSError as e:
+                self._print_daemon_fallback(e)
+            except DaemonError as e:
+                print(f"❌ Error en modo automático: {e}")
                 sys.exit(1)
+        if results is None:
+            results = self.token_service.auto_update_batch(provisioning_ids, max_workers=workers)
+        print_results_table(results)
 
-            self.run_auto_mode(provisioning_id)
-        else:
+        failed = [result for result in results if not result.ok]
+        if failed:
+            print(f"❌ {len(failed)} de {len(results)} provisioning IDs fallaron")
+            sys.exit(1)
+
+        print(f"✅ {len(results)} tokens refrescados (los archivos locales no se modifican en modo lote)")
+
+    @staticmethod
+    def _print_daemon_fallback(error: OSError):
+        """Avisa de que se ha perdido la conexión con el daemon y se sigue en este proceso."""
+        print(f"⚠️  Se perdió la conexión con el daemon ({error}); se continúa en este proceso")
+
+    async def _async_auto_update(self, provisioning_id: str):
+        """Modo automático de un ID con la variante asyncio."""
+        service = AsyncTokenService(self.token_service)
+        try:
+            print("🤖 Modo automático asíncrono activado")
+            print(f"📌 Provisioning ID: {provisioning_id}")
+            await service.auto_update(provisioning_id)
+            print("✅ Token obtenido y actualizado correctamente")
+        finally:
+            await service.close()
+
+    async def _async_auto_update_batch(
+        self,
+        provisioning_ids: list[str],
+        workers: Optional[int],
+    ) -> list[AutoUpdateResult]:
+        """Modo automático por lotes con la variante asyncio."""
+        service = AsyncTokenService(self.token_service, max_concurrency=workers)
+        try:
+            return await service.auto_update_batch(provisioning_ids)
+        finally:
+            await service.close()
+
+    def run(self):
+        """Ejecuta la aplicación según los argumentos de línea de comandos."""
+        provisioning_ids = list(self.args.auto or [])
+        if self.args.auto_file:
+            provisioning_ids.extend(read_provisioning_ids(self.args.auto_file))
+
+        if self.args.daemon:
+            self.run_daemon()
+        elif self.args.auto is None and not self.args.auto_file:
             self.run_web_server()
+        elif not provisioning_ids:
+            print("❌ Falta provisioning ID")
+            print("   Uso: python main.py --auto <provisioning_id> [<provisioning_id> ...]")
+            sys.exit(1)
+        elif len(provisioning_ids) == 1:
+            with tracing.trace("auto", provisioning_id=provisioning_ids[0]):
+                self.run_auto_mode(provisioning_ids[0])
+        else:
+            with tracing.trace("auto_batch", provisioning_ids=len(provisioning_ids)):
+                self.run_batch_auto_mode(provisioning_ids, self.args.workers)
+
+
+def positive_int(value: str) -> int:
+    """Tipo de argparse para enteros mayores que 0."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' no es un número entero")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1 (recibido {number})")
+    return number
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Interpreta los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Token Helper - Gestor de Tokens JWT para desarrollo",
+    )
+    parser.add_argument(
+        "--auto",
+        nargs="*",
+        metavar="PROVISIONING_ID",
+        help="Modo automático para uno o varios provisioning IDs",
+    )
+    parser.add_argument(
+        "--auto-file",
+        metavar="RUTA",
+        help="Archivo con provisioning IDs para el modo automático ('-' para stdin)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        metavar="N",
+        help="Logins simultáneos en modo automático por lotes "
+             "(por defecto AUTO_WORKERS, o ASYNC_MAX_CONCURRENCY con --async)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Inicia el daemon residente que atiende el modo automático por un socket Unix",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Ejecuta el modo automático en este proceso aunque haya un daemon en marcha",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="Ejecuta el modo automático en este proceso con asyncio (login asíncrono, "
+             "consultas a la BD en un pool de hilos acotado)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Guarda una traza por petición web o ejecución de --auto, con un volcado "
+             "de cProfile (como TRACE_ENABLED=true y TRACE_PROFILE=true)",
+    )
+    return parser.parse_args(argv)
+
+
+def read_provisioning_ids(path: str) -> list[str]:
+    """
+    Lee provisioning IDs de un archivo o de stdin.
+
+    Los IDs se separan por espacios, comas o saltos de línea; lo que sigue a
+    `#` se ignora.
+
+    Args:
+        path: Ruta del archivo o '-' para stdin
+
+    Returns:
+        Lista de IDs
+    """
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    provisioning_ids = []
+    for line in lines:
+        line = line.split("#", 1)[0]
+        provisioning_ids.extend(value for value in re.split(r"[\s,]+", line) if value)
+    return provisioning_ids
+
+
+def print_results_table(results: list[AutoUpdateResult]):
+    """Muestra una tabla con el resultado de cada provisioning ID."""
+    headers = ("Provisioning ID", "Estado", "Usuario", "Refrescado", "Login (ms)", "Total (ms)", "Detalle")
+    rows = []
+    for result in results:
+        refreshed = {True: "sí", False: "no", None: "-"}[result.refreshed]
+        detail = result.error.strip().splitlines()[-1] if result.error.strip() else result.token[:40]
+        rows.append((
+            str(result.provisioning_id),
+            "✅ OK" if result.ok else "❌ ERROR",
+            result.username or "-",
+            refreshed if result.ok else "-",
+            f"{result.login_ms:.0f}",
+            f"{result.total_ms:.0f}",
+            detail,
+        ))
+
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    separator = "  ".join("-" * width for width in widths)
+
+    print()
+    print("  ".join(header.ljust(width) for header, width in zip(headers, widths)))
+    print(separator)
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+    print()
 
 
 def main():
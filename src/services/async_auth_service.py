@@ -0,0 +1,352 @@
+"""
+Servicio de login con E/S asíncrona (asyncio), sin un hilo por petición.
+"""
+import asyncio
+import ssl
+import time
+import urllib.parse
+from typing import Optional
+
+from .auth_service import LoginService
+from .metrics import LOGIN_CONNECTIONS, LOGIN_ERRORS, LOGIN_SECONDS
+from .tracing import annotate, traced
+
+
+class _StaleConnectionError(ConnectionError):
+    """Una conexión keep-alive reutilizada estaba cerrada por el servidor."""
+
+
+class AsyncLoginService:
+    """Equivalente asíncrono de LoginService (HTTP/1.1 con keep-alive)."""
+
+    REDIRECT_CODES = LoginService.REDIRECT_CODES
+    METHOD_PRESERVING_CODES = LoginService.METHOD_PRESERVING_CODES
+    MAX_REDIRECTS = LoginService.MAX_REDIRECTS
+
+    def __init__(
+        self,
+        login_url: str,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        max_body_bytes: int = 2000,
+        max_idle_per_host: int = 16,
+    ):
+        """
+        Inicializa el servicio de login.
+
+        Args:
+            login_url: URL del endpoint de login
+            connect_timeout: Segundos máximos para establecer la conexión
+            read_timeout: Segundos máximos de espera de datos del servidor
+            max_body_bytes: Bytes del cuerpo de la respuesta que se leen como máximo
+            max_idle_per_host: Conexiones keep-alive que se conservan por host
+        """
+        self.login_url = login_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_body_bytes = max_body_bytes
+        self.max_idle_per_host = max_idle_per_host
+        self.ssl_context = ssl._create_unverified_context()
+
+        # (scheme, host, port) -> conexiones ociosas (reader, writer)
+        self._idle: dict[tuple[str, str, int], list[tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+
+    @traced("login.perform_login")
+    async def perform_login(
+        self,
+        provisioning_id: str,
+        section: str = "none",
+        locale: str = "af_AF"
+    ) -> tuple[int, dict, str]:
+        """
+        Realiza un POST al formulario de login.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            section: Sección del panel a cargar
+            locale: Configuración regional
+
+        Returns:
+            Tupla (status_code, headers, body)
+
+        Raises:
+            RuntimeError: Si falla la petición
+        """
+        annotate(provisioning_id=provisioning_id)
+        encoded, headers = LoginService.build_login_request(provisioning_id, section, locale)
+
+        start = time.perf_counter()
+        try:
+            method, url, body = "POST", self.login_url, encoded
+
+            for _ in range(self.MAX_REDIRECTS + 1):
+                status, reason, response_headers, raw_body, complete = await self._request(
+                    method, url, body, headers
+                )
+
+                location = _header(response_headers, "Location")
+                if status not in self.REDIRECT_CODES or not location:
+                    break
+
+                url = urllib.parse.urljoin(url, location)
+                if status not in self.METHOD_PRESERVING_CODES:
+                    method, body = "GET", None
+                    headers = {"User-Agent": headers["User-Agent"]}
+            else:
+                raise RuntimeError(f"Demasiadas redirecciones ({self.MAX_REDIRECTS})")
+
+            if status >= 400:
+                raise RuntimeError(f"HTTP Error {status}: {reason}")
+
+            body_text = raw_body.decode("utf-8", errors="replace")
+
+            # El cuerpo se ha leído solo hasta max_body_bytes
+            if not complete:
+                body_text += "\n\n...[truncado]..."
+
+            return status, response_headers, body_text
+
+        except asyncio.TimeoutError:
+            LOGIN_ERRORS.inc()
+            raise RuntimeError("Error al hacer login: timed out")
+        except Exception as e:
+            LOGIN_ERRORS.inc()
+            raise RuntimeError(f"Error al hacer login: {e}")
+        finally:
+            LOGIN_SECONDS.observe(time.perf_counter() - start)
+
+    async def close(self) -> None:
+        """Cierra las conexiones keep-alive ociosas."""
+        connections = [conn for pool in self._idle.values() for conn in pool]
+        self._idle.clear()
+
+        for _, writer in connections:
+            writer.close()
+        for _, writer in connections:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    @traced("login.request")
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes],
+        headers: dict,
+    ) -> tuple[int, str, dict, bytes, bool]:
+        """
+        Envía una petición reutilizando una conexión keep-alive si hay alguna.
+
+        Returns:
+            Tupla (status, reason, headers, body, complete)
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"URL no soportada: {url}")
+
+        default_port = 443 if parts.scheme == "https" else 80
+        key = (parts.scheme, parts.hostname, parts.port or default_port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        host_header = parts.hostname if key[2] == default_port else f"{parts.hostname}:{key[2]}"
+        request = self._encode_request(method, path, host_header, body, headers)
+
+        # Una conexión reutilizada puede haber sido cerrada por el servidor:
+        # en ese caso se reintenta una vez con una conexión nueva
+        for attempt in range(2):
+            reader, writer, reused = await self._acquire(key)
+            LOGIN_CONNECTIONS.inc(reused=str(reused).lower())
+            annotate(method=method, host=parts.hostname, reused=reused)
+            try:
+                writer.write(request)
+                await asyncio.wait_for(writer.drain(), self.read_timeout)
+                status, reason, response_headers, raw_body, complete, keep_alive = (
+                    await self._read_response(reader, method, reused)
+                )
+            except (_StaleConnectionError, ConnectionResetError, BrokenPipeError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+
+            if complete and keep_alive:
+                self._release(key, reader, writer)
+            else:
+                writer.close()
+
+            annotate(status=status)
+            return status, reason, response_headers, raw_body, complete
+
+        raise RuntimeError("No se pudo enviar la petición")
+
+    @staticmethod
+    def _encode_request(method: str, path: str, host: str, body: Optional[bytes], headers: dict) -> bytes:
+        """Serializa la línea de petición, las cabeceras y el cuerpo."""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Accept-Encoding: identity"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+    async def _read_response(
+        self,
+        reader: asyncio.StreamReader,
+        method: str,
+        reused: bool,
+    ) -> tuple[int, str, dict, bytes, bool, bool]:
+        """
+        Lee la respuesta completa o hasta max_body_bytes del cuerpo.
+
+        Returns:
+            Tupla (status, reason, headers, body, complete, keep_alive)
+        """
+        # Las respuestas provisionales 1xx (100 Continue, 103 Early Hints)
+        # preceden a la respuesta final y se descartan
+        status = 100
+        while 100 <= status < 200:
+            version, status, reason, headers = await self._read_head(reader, reused)
+            reused = False
+
+        connection_header = (_header(headers, "Connection") or "").lower()
+        keep_alive = version == "HTTP/1.1" and connection_header != "close"
+
+        if method == "HEAD" or status in (204, 304):
+            return status, reason, headers, b"", True, keep_alive
+
+        if (_header(headers, "Transfer-Encoding") or "").lower() == "chunked":
+            body, complete = await self._read_chunked(reader)
+        elif _header(headers, "Content-Length") is not None:
+            length = int(_header(headers, "Content-Length"))
+            body = await self._read_exactly(reader, min(length, self.max_body_bytes))
+            complete = length <= self.max_body_bytes
+        else:
+            # Sin longitud: el cuerpo termina al cerrarse la conexión
+            body, complete = await self._read_until_eof(reader)
+            keep_alive = False
+
+        return status, reason, headers, body, complete, keep_alive
+
+    async def _read_head(
+        self,
+        reader: asyncio.StreamReader,
+        reused: bool,
+    ) -> tuple[str, int, str, dict]:
+        """
+        Lee la línea de estado y las cabeceras de una respuesta.
+
+        Returns:
+            Tupla (version, status, reason, headers)
+        """
+        status_line = await self._readline(reader)
+        if not status_line:
+            if reused:
+                raise _StaleConnectionError("Conexión cerrada por el servidor")
+            raise ConnectionError("El servidor cerró la conexión sin responder")
+
+        version, _, rest = status_line.decode("latin-1").strip().partition(" ")
+        code, _, reason = rest.partition(" ")
+
+        headers = {}
+        while True:
+            line = await self._readline(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip()] = value.strip()
+
+        return version, int(code), reason, headers
+
+    async def _read_until_eof(self, reader: asyncio.StreamReader) -> tuple[bytes, bool]:
+        """
+        Lee hasta que el servidor cierre la conexión o hasta max_body_bytes.
+
+        `StreamReader.read(n)` devuelve en cuanto llegan datos, así que se lee
+        en bucle como hace `AuthService._read_limited` con `HTTPResponse.read`.
+        """
+        body = bytearray()
+        while len(body) < self.max_body_bytes:
+            data = await asyncio.wait_for(reader.read(self.max_body_bytes - len(body)), self.read_timeout)
+            if not data:
+                return bytes(body), True
+            body.extend(data)
+
+        # Comprobar si queda algo más sin leerlo entero
+        return bytes(body), not await asyncio.wait_for(reader.read(1), self.read_timeout)
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> tuple[bytes, bool]:
+        """Lee un cuerpo chunked hasta max_body_bytes."""
+        body = bytearray()
+        while True:
+            size_line = await self._readline(reader)
+            size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                # Trailers hasta la línea vacía
+                while (await self._readline(reader)) not in (b"\r\n", b"\n", b""):
+                    pass
+                return bytes(body), True
+
+            if len(body) + size > self.max_body_bytes:
+                body.extend(await self._read_exactly(reader, self.max_body_bytes - len(body)))
+                return bytes(body), False
+
+            body.extend(await self._read_exactly(reader, size))
+            await self._readline(reader)
+
+    async def _readline(self, reader: asyncio.StreamReader) -> bytes:
+        return await asyncio.wait_for(reader.readline(), self.read_timeout)
+
+    async def _read_exactly(self, reader: asyncio.StreamReader, size: int) -> bytes:
+        return await asyncio.wait_for(reader.readexactly(size), self.read_timeout)
+
+    async def _acquire(
+        self,
+        key: tuple[str, str, int],
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Obtiene una conexión ociosa del host o abre una nueva."""
+        pool = self._idle.get(key)
+        while pool:
+            reader, writer = pool.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        scheme, host, port = key
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host,
+                port,
+                ssl=self.ssl_context if scheme == "https" else None,
+                server_hostname=host if scheme == "https" else None,
+            ),
+            self.connect_timeout,
+        )
+        return reader, writer, False
+
+    def _release(
+        self,
+        key: tuple[str, str, int],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Devuelve una conexión al pool del host o la cierra si está lleno."""
+        pool = self._idle.setdefault(key, [])
+        if len(pool) < self.max_idle_per_host:
+            pool.append((reader, writer))
+        else:
+            writer.close()
+
+
+def _header(headers: dict, name: str) -> Optional[str]:
+    """Busca una cabecera sin distinguir mayúsculas."""
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
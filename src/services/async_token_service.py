@@ -0,0 +1,339 @@
+"""
+Variante asyncio del modo automático de TokenService.
+
+El login HTTP es asíncrono nativo (AsyncLoginService); las consultas a la BD,
+que son bloqueantes (JDBC o pytds), se ejecutan en un pool de hilos acotado
+y las escrituras de archivos en un hilo propio. Así un solo proceso puede
+llevar cientos de refrescos simultáneos sin un hilo por trabajo.
+"""
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from .async_auth_service import AsyncLoginService
+from .database import TokenRepository
+from .file_manager import FileWriteResult
+from .metrics import COALESCED_CALLS
+from .token_service import AutoUpdateResult, TokenService, flight_key
+from .tracing import annotate, traced
+
+
+class _RefreshStateBatcher:
+    """
+    Agrupa en una sola consulta por lotes las lecturas de ACUT_LAST_RESFRESH
+    que piden a la vez muchos refrescos en curso.
+    """
+
+    def __init__(self, service: "AsyncTokenService"):
+        self._service = service
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def get(self, provisioning_id: int | str) -> Optional[tuple]:
+        """
+        Obtiene (last_refresh, username, jwt_token) del ID o None si no tiene fila.
+
+        Raises:
+            RuntimeError: Si falla la consulta
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(flight_key(provisioning_id), []).append(future)
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self) -> None:
+        """Espera a que se acumulen peticiones y lanza la consulta por lotes."""
+        # Un ciclo del bucle basta para recoger las peticiones del mismo instante
+        await asyncio.sleep(0)
+        pending, self._pending, self._flush_task = self._pending, {}, None
+
+        try:
+            states = await self._service.run_in_database(
+                self._service.repository.get_token_refresh_states, list(pending)
+            )
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(states.get(key))
+
+
+class AsyncTokenService:
+    """Refrescos de token concurrentes sobre asyncio a partir de un TokenService."""
+
+    POLL_INITIAL_DELAY = 0.05
+    POLL_MAX_DELAY = 1.0
+
+    def __init__(
+        self,
+        token_service: TokenService,
+        max_concurrency: Optional[int] = None,
+        db_workers: Optional[int] = None,
+    ):
+        """
+        Inicializa el servicio.
+
+        Args:
+            token_service: Servicio síncrono del que se reutilizan repositorio,
+                caché de tokens y gestor de archivos
+            max_concurrency: Refrescos simultáneos (por defecto, ASYNC_MAX_CONCURRENCY)
+            db_workers: Hilos para las consultas bloqueantes (por defecto, ASYNC_DB_WORKERS)
+        """
+        config = token_service.config
+        self.config = config
+        self.token_service = token_service
+        self.repository: TokenRepository = token_service.repository
+        self.max_concurrency = max_concurrency or config.async_max_concurrency
+        self.auth_service = AsyncLoginService(
+            config.login_url,
+            connect_timeout=config.login_connect_timeout,
+            read_timeout=config.login_read_timeout,
+            max_body_bytes=config.login_max_body_bytes,
+            max_idle_per_host=self.max_concurrency,
+        )
+
+        self._db_executor = ThreadPoolExecutor(
+            max_workers=db_workers or config.async_db_workers,
+            thread_name_prefix="token-async-db",
+        )
+        # Un único hilo: las escrituras de archivos quedan serializadas
+        self._file_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="token-async-files")
+
+        # Se crean dentro del bucle de eventos (ver _ensure_loop_state)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[_RefreshStateBatcher] = None
+        self._flights: dict[str, asyncio.Task] = {}
+
+    async def close(self) -> None:
+        """Cierra las conexiones HTTP y los pools de hilos (no el TokenService)."""
+        await self.auth_service.close()
+        self._db_executor.shutdown(wait=True)
+        self._file_executor.shutdown(wait=True)
+
+    async def run_in_database(self, function: Callable, *args) -> Any:
+        """Ejecuta una llamada bloqueante al repositorio en el pool acotado."""
+        # run_in_executor no propaga las ContextVar (trazas) al hilo
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db_executor, context.run, function, *args
+        )
+
+    async def refresh_token(
+        self,
+        provisioning_id: int | str,
+        wait_for_refresh: Optional[bool] = None,
+    ) -> str:
+        """
+        Hace login para forzar un token nuevo y lo obtiene de la BD sin tocar los archivos.
+
+        Las llamadas simultáneas con el mismo ID comparten un único login.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            wait_for_refresh: Si se espera a que cambie ACUT_LAST_RESFRESH en lugar
+                de una pausa fija (por defecto, según la configuración)
+
+        Returns:
+            Token JWT con prefijo Bearer
+
+        Raises:
+            RuntimeError: Si falla el login o la consulta
+        """
+        _, token, _, _ = await self._single_flight(provisioning_id, wait_for_refresh)
+        return token
+
+    @traced("async_token_service.auto_update")
+    async def auto_update(
+        self,
+        provisioning_id: int | str,
+        wait_for_refresh: Optional[bool] = None,
+    ) -> tuple[str, list[FileWriteResult]]:
+        """
+        Modo automático: refresca el token y lo escribe en los archivos.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            wait_for_refresh: Si se espera a que cambie ACUT_LAST_RESFRESH en lugar
+                de una pausa fija (por defecto, según la configuración)
+
+        Returns:
+            Tupla (token, resultado de la escritura de cada archivo)
+        """
+        token = await self.refresh_token(provisioning_id, wait_for_refresh)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self._file_executor,
+            contextvars.copy_context().run,
+            self.token_service.file_manager.update_token,
+            token,
+        )
+        return token, results
+
+    @traced("async_token_service.auto_update_batch")
+    async def auto_update_batch(
+        self,
+        provisioning_ids: list[int | str],
+        wait_for_refresh: Optional[bool] = None,
+    ) -> list[AutoUpdateResult]:
+        """
+        Modo automático para varios IDs, con hasta max_concurrency refrescos a la vez.
+
+        No modifica los archivos locales, ya que solo pueden contener un token.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+            wait_for_refresh: Si se espera a que cambie ACUT_LAST_RESFRESH en lugar
+                de una pausa fija (por defecto, según la configuración)
+
+        Returns:
+            Resultado de cada ID, en el orden recibido
+        """
+        results: dict[str, AutoUpdateResult] = {}
+        for provisioning_id in provisioning_ids:
+            results.setdefault(flight_key(provisioning_id), AutoUpdateResult(provisioning_id))
+
+        if not results:
+            return []
+
+        print(
+            f"🤖 Modo automático asíncrono: {len(results)} provisioning IDs "
+            f"({self.max_concurrency} en paralelo)"
+        )
+        start = time.perf_counter()
+
+        async def run(result: AutoUpdateResult) -> None:
+            try:
+                result.username, result.token, result.refreshed, result.login_ms = (
+                    await self._single_flight(result.provisioning_id, wait_for_refresh)
+                )
+            except Exception as e:
+                result.error = str(e)
+            result.total_ms = (time.perf_counter() - start) * 1000
+
+        await asyncio.gather(*(run(result) for result in results.values()))
+        return list(results.values())
+
+    @traced("async_token_service.refresh")
+    async def _refresh(
+        self,
+        provisioning_id: int | str,
+        wait_for_refresh: Optional[bool],
+    ) -> tuple[str, str, Optional[bool], float]:
+        """
+        Login y lectura del token nuevo (sin agrupar llamadas).
+
+        Returns:
+            Tupla (username, token, refreshed, login_ms); refreshed es None
+            sin espera al refresco
+        """
+        if wait_for_refresh is None:
+            wait_for_refresh = self.config.auto_wait_for_refresh
+
+        annotate(provisioning_id=provisioning_id)
+        self._ensure_loop_state()
+        async with self._semaphore:
+            previous_refresh = None
+            if wait_for_refresh:
+                # Se compara con el refresco previo al login (no con la hora local)
+                # para no depender del desfase de reloj con SQL Server
+                state = await self._batcher.get(provisioning_id)
+                previous_refresh = state[0] if state else None
+
+            login_start = time.perf_counter()
+            try:
+                await self.auth_service.perform_login(str(provisioning_id))
+            finally:
+                # Igual que TokenService.perform_login: el login renueva el token en la BD
+                self.token_service.forget_token(provisioning_id)
+            login_ms = (time.perf_counter() - login_start) * 1000
+
+            if wait_for_refresh:
+                username, token, refreshed = await self._wait_for_refresh(provisioning_id, previous_refresh)
+            else:
+                await asyncio.sleep(2)
+                username, token = await self.run_in_database(
+                    self.repository.get_token_by_provisioning_id, provisioning_id
+                )
+                refreshed = None
+
+        self.token_service.remember_token(provisioning_id, username, token)
+        self.token_service.publish_refresh([provisioning_id])
+        return username, token, refreshed, login_ms
+
+    async def _wait_for_refresh(
+        self,
+        provisioning_id: int | str,
+        previous_refresh: Any,
+    ) -> tuple[str, str, bool]:
+        """
+        Consulta ACUT_LAST_RESFRESH con backoff exponencial hasta que cambie.
+
+        Cada consulta se agrupa con las de los demás refrescos en curso.
+
+        Returns:
+            Tupla (username, jwt_token, refreshed); refreshed es False si vence
+            el plazo y se devuelve el último token conocido
+
+        Raises:
+            RuntimeError: Si falla la consulta o no se encuentra el token
+        """
+        deadline = time.monotonic() + self.config.auto_refresh_timeout
+        delay = self.POLL_INITIAL_DELAY
+
+        while True:
+            state = await self._batcher.get(provisioning_id)
+            refreshed = (
+                state is not None
+                and state[0] is not None
+                and state[0] != previous_refresh
+            )
+            remaining = deadline - time.monotonic()
+            if refreshed or remaining <= 0:
+                break
+
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.POLL_MAX_DELAY)
+
+        if not state:
+            raise RuntimeError(f"No se encontró ningún token para provisioning ID {provisioning_id}")
+
+        _, username, jwt_token = state
+        if not jwt_token:
+            raise RuntimeError(f"El usuario {username} no tiene ACUT_JWT_TOKEN")
+
+        return username, TokenRepository.normalize_token(jwt_token), refreshed
+
+    async def _single_flight(
+        self,
+        provisioning_id: int | str,
+        wait_for_refresh: Optional[bool],
+    ) -> tuple[str, str, Optional[bool], float]:
+        """Comparte el refresco en curso con el mismo ID (equivalente asyncio de SingleFlight)."""
+        key = flight_key(provisioning_id)
+        task = self._flights.get(key)
+
+        if task is not None:
+            COALESCED_CALLS.inc(operation="async_refresh_token", role="follower")
+            # shield: cancelar a un seguidor no cancela el refresco compartido
+            return await asyncio.shield(task)
+
+        COALESCED_CALLS.inc(operation="async_refresh_token", role="leader")
+        task = self._flights[key] = asyncio.ensure_future(self._refresh(provisioning_id, wait_for_refresh))
+        task.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _ensure_loop_state(self) -> None:
+        """Crea el semáforo y el agrupador de consultas en el bucle en curso."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._batcher = _RefreshStateBatcher(self)
@@ -1,25 +1,56 @@
 """
 Servicio para autenticación mediante login.
 """
-import urllib.request
+import http.client
 import urllib.parse
 import ssl
+import threading
+import time
 from typing import Optional
 
+from .metrics import LOGIN_CONNECTIONS, LOGIN_ERRORS, LOGIN_SECONDS
+from .tracing import annotate, traced
+
 
 class LoginService:
     """Servicio para realizar login en el panel."""
 
-    def __init__(self, login_url: str):
+    # Códigos de redirección que se siguen: con 301/302/303 el POST pasa a GET
+    # (como urllib); con 307/308 se repite el POST con el mismo cuerpo
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+    METHOD_PRESERVING_CODES = (307, 308)
+    MAX_REDIRECTS = 10
+
+    def __init__(
+        self,
+        login_url: str,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        max_body_bytes: int = 2000,
+        max_idle_per_host: int = 4,
+    ):
         """
         Inicializa el servicio de login.
 
         Args:
             login_url: URL del endpoint de login
+            connect_timeout: Segundos máximos para establecer la conexión
+            read_timeout: Segundos máximos de espera de datos del servidor
+            max_body_bytes: Bytes del cuerpo de la respuesta que se leen como máximo
+            max_idle_per_host: Conexiones keep-alive que se conservan por host
         """
         self.login_url = login_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_body_bytes = max_body_bytes
+        self.max_idle_per_host = max_idle_per_host
         self.ssl_context = ssl._create_unverified_context()
 
+        # (scheme, host, port) -> conexiones ociosas reutilizables
+        self._idle: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    @traced("login.perform_login")
     def perform_login(
         self,
         provisioning_id: str,
@@ -40,6 +71,54 @@ class LoginService:
         Raises:
             RuntimeError: Si falla la petición
         """
+        annotate(provisioning_id=provisioning_id)
+        encoded, headers = self.build_login_request(provisioning_id, section, locale)
+
+        start = time.perf_counter()
+        try:
+            method, url, body = "POST", self.login_url, encoded
+
+            for _ in range(self.MAX_REDIRECTS + 1):
+                status, reason, response_headers, raw_body, complete = self._request(
+                    method, url, body, headers
+                )
+
+                location = response_headers.get("Location")
+                if status not in self.REDIRECT_CODES or not location:
+                    break
+
+                url = urllib.parse.urljoin(url, location)
+                if status not in self.METHOD_PRESERVING_CODES:
+                    method, body = "GET", None
+                    headers = {"User-Agent": headers["User-Agent"]}
+            else:
+                raise RuntimeError(f"Demasiadas redirecciones ({self.MAX_REDIRECTS})")
+
+            if status >= 400:
+                raise RuntimeError(f"HTTP Error {status}: {reason}")
+
+            body_text = raw_body.decode("utf-8", errors="replace")
+
+            # El cuerpo se ha leído solo hasta max_body_bytes
+            if not complete:
+                body_text += "\n\n...[truncado]..."
+
+            return status, response_headers, body_text
+
+        except Exception as e:
+            LOGIN_ERRORS.inc()
+            raise RuntimeError(f"Error al hacer login: {e}")
+        finally:
+            LOGIN_SECONDS.observe(time.perf_counter() - start)
+
+    @staticmethod
+    def build_login_request(provisioning_id: str, section: str, locale: str) -> tuple[bytes, dict]:
+        """
+        Construye el cuerpo y las cabeceras del POST de login.
+
+        Returns:
+            Tupla (cuerpo codificado, cabeceras)
+        """
         data = {
             "provisioningId": provisioning_id,
             "dcdjwt": "",
@@ -51,23 +130,114 @@ class LoginService:
         }
 
         encoded = urllib.parse.urlencode(data).encode("utf-8")
-        request = urllib.request.Request(self.login_url, data=encoded, method="POST")
-        request.add_header("User-Agent", "Mozilla/5.0 (TokenUpdaterBot)")
-        request.add_header("Content-Type", "application/x-www-form-urlencoded")
+        headers = {
+            "User-Agent": "Mozilla/5.0 (TokenUpdaterBot)",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        return encoded, headers
 
-        try:
-            with urllib.request.urlopen(request, context=self.ssl_context) as response:
-                body = response.read().decode("utf-8", errors="replace")
-                status = response.status
-                headers = dict(response.getheaders())
+    def close(self) -> None:
+        """Cierra las conexiones keep-alive ociosas."""
+        with self._lock:
+            connections = [conn for pool in self._idle.values() for conn in pool]
+            self._idle.clear()
 
-            # Truncar body si es muy largo
-            max_len = 2000
-            if len(body) > max_len:
-                body = body[:max_len] + "\n\n...[truncado]..."
+        for connection in connections:
+            connection.close()
 
-            return status, headers, body
+    @traced("login.request")
+    def _request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes],
+        headers: dict,
+    ) -> tuple[int, str, dict, bytes, bool]:
+        """
+        Envía una petición reutilizando una conexión keep-alive si hay alguna.
 
-        except Exception as e:
-            raise RuntimeError(f"Error al hacer login: {e}")
+        Returns:
+            Tupla (status, reason, headers, body, complete)
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"URL no soportada: {url}")
+
+        default_port = 443 if parts.scheme == "https" else 80
+        key = (parts.scheme, parts.hostname, parts.port or default_port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        # Una conexión reutilizada puede haber sido cerrada por el servidor:
+        # en ese caso se reintenta una vez con una conexión nueva
+        for attempt in range(2):
+            connection, reused = self._acquire(key)
+            LOGIN_CONNECTIONS.inc(reused=str(reused).lower())
+            annotate(method=method, host=parts.hostname, reused=reused)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+            try:
+                raw_body, complete = self._read_limited(response)
+            except Exception:
+                connection.close()
+                raise
+
+            if complete and not response.will_close:
+                self._release(key, connection)
+            else:
+                connection.close()
+
+            annotate(status=response.status)
+            return response.status, response.reason, dict(response.getheaders()), raw_body, complete
+
+        raise RuntimeError("No se pudo enviar la petición")
+
+    def _read_limited(self, response: http.client.HTTPResponse) -> tuple[bytes, bool]:
+        """Lee como máximo max_body_bytes e indica si se ha leído la respuesta completa."""
+        data = response.read(self.max_body_bytes)
+
+        if response.isclosed():
+            return data, True
+
+        # Comprobar si queda algo más sin leerlo entero
+        return data, response.read(1) == b""
+
+    def _acquire(self, key: tuple[str, str, int]) -> tuple[http.client.HTTPConnection, bool]:
+        """Obtiene una conexión ociosa del host o crea una nueva."""
+        with self._lock:
+            pool = self._idle.get(key)
+            if pool:
+                return pool.pop(), True
+
+        scheme, host, port = key
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(
+                host, port, timeout=self.connect_timeout, context=self.ssl_context
+            )
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        return connection, False
+
+    def _release(self, key: tuple[str, str, int], connection: http.client.HTTPConnection) -> None:
+        """Devuelve una conexión al pool del host o la cierra si está lleno."""
+        with self._lock:
+            pool = self._idle.setdefault(key, [])
+            if len(pool) < self.max_idle_per_host:
+                pool.append(connection)
+                return
 
+        connection.close()
@@ -1,26 +1,303 @@
 """
 Repositorio para operaciones con la base de datos.
 """
-from typing import Optional
-import jaydebeapi
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
 
 from ..config.settings import DatabaseConfig
+from .db_backends import DatabaseBackend, create_backend
+from .metrics import DB_CONNECT_SECONDS, DB_ERRORS, DB_POOL_CONNECTIONS, DB_QUERY_SECONDS
+from .tracing import annotate, traced
+
+
+class ConnectionPool:
+    """Pool de conexiones DB-API reutilizables y thread-safe."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        min_size: int = 0,
+        max_size: int = 4,
+        idle_timeout: float = 300.0,
+        validate_on_borrow: bool = True,
+        validation_interval: float = 5.0,
+        acquire_timeout: float = 30.0,
+        validation_query: str = "SELECT 1",
+    ):
+        """
+        Inicializa el pool (sin abrir conexiones todavía).
+
+        Args:
+            factory: Función que crea una conexión nueva
+            min_size: Conexiones ociosas que se conservan aunque expiren
+            max_size: Máximo de conexiones abiertas a la vez
+            idle_timeout: Segundos que una conexión puede estar ociosa antes de cerrarse
+            validate_on_borrow: Si se valida la conexión antes de entregarla
+            validation_interval: Segundos tras su devolución en los que no se revalida
+            acquire_timeout: Segundos máximos de espera por una conexión libre
+            validation_query: Consulta usada para validar la conexión
+        """
+        if max_size < 1:
+            raise ValueError("max_size debe ser al menos 1")
+        if not 0 <= min_size <= max_size:
+            raise ValueError("min_size debe estar entre 0 y max_size")
+
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.validate_on_borrow = validate_on_borrow
+        self.validation_interval = validation_interval
+        self.acquire_timeout = acquire_timeout
+        self.validation_query = validation_query
+
+        # Conexiones ociosas como (conexión, instante de devolución); LIFO
+        self._idle: deque[tuple[Any, float]] = deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        """Número de conexiones abiertas (ociosas + prestadas)."""
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        """Número de conexiones ociosas disponibles."""
+        return len(self._idle)
+
+    def prefill(self) -> None:
+        """Abre conexiones hasta alcanzar min_size."""
+        while True:
+            with self._condition:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                connection = self._factory()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+
+    @traced("db.pool.acquire")
+    def acquire(self) -> Any:
+        """
+        Obtiene una conexión del pool, creando una nueva si hace falta.
+
+        Returns:
+            Conexión DB-API lista para usarse
+
+        Raises:
+            RuntimeError: Si el pool está cerrado o se agota el tiempo de espera
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("El pool de conexiones está cerrado")
+
+                expired = self._pop_expired()
+                entry = self._idle.pop() if self._idle else None
+                create = entry is None and self._size < self.max_size
+                if create:
+                    self._size += 1
+                elif entry is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RuntimeError(
+                            f"Tiempo de espera agotado esperando una conexión del pool "
+                            f"({self.max_size} conexiones en uso)"
+                        )
+                    self._condition.wait(remaining)
+
+            self._close_quietly(*expired)
+
+            if create:
+                annotate(new_connection=True)
+                try:
+                    return self._factory()
+                except Exception:
+                    self._discard_slot()
+                    raise
+
+            if entry is None:
+                continue
+
+            connection, released_at = entry
+            if self._needs_validation(released_at) and not self._is_valid(connection):
+                self._close_quietly(connection)
+                self._discard_slot()
+                continue
+
+            return connection
+
+    def release(self, connection: Any, broken: bool = False) -> None:
+        """
+        Devuelve una conexión al pool.
+
+        Args:
+            connection: Conexión obtenida con acquire()
+            broken: Si la conexión falló y debe descartarse
+        """
+        with self._condition:
+            if not broken and not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+                return
+
+        self._close_quietly(connection)
+        self._discard_slot()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Context manager que presta una conexión y la descarta si hubo error."""
+        connection = self.acquire()
+        try:
+            yield connection
+        except Exception:
+            self.release(connection, broken=True)
+            raise
+        else:
+            self.release(connection)
+
+    def close(self) -> None:
+        """Cierra todas las conexiones ociosas y rechaza nuevos préstamos."""
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+
+        self._close_quietly(*idle)
+
+    def _pop_expired(self) -> list:
+        """Extrae las conexiones ociosas caducadas por encima de min_size (con lock)."""
+        expired = []
+        now = time.monotonic()
+
+        # Las más antiguas están al principio de la cola
+        while (
+            self._idle
+            and self._size - len(expired) > self.min_size
+            and now - self._idle[0][1] > self.idle_timeout
+        ):
+            expired.append(self._idle.popleft()[0])
+
+        self._size -= len(expired)
+        return expired
+
+    def _needs_validation(self, released_at: float) -> bool:
+        """Indica si una conexión ociosa debe validarse antes de prestarse."""
+        if not self.validate_on_borrow:
+            return False
+        return time.monotonic() - released_at >= self.validation_interval
+
+    def _is_valid(self, connection: Any) -> bool:
+        """Comprueba que la conexión sigue viva con una consulta trivial."""
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(self.validation_query)
+            cursor.fetchone()
+            return True
+        except Exception:
+            return False
+        finally:
+            if cursor:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    def _discard_slot(self) -> None:
+        """Libera el hueco de una conexión cerrada o que no se pudo crear."""
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _close_quietly(*connections: Any) -> None:
+        """Cierra conexiones ignorando errores."""
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+# Pools de los repositorios vivos: el gauge suma todos sin mantenerlos vivos
+_POOLS: "weakref.WeakSet[ConnectionPool]" = weakref.WeakSet()
+_POOLS_LOCK = threading.Lock()
+
+
+def _track_pool(pool: ConnectionPool) -> None:
+    """Incluye un pool en el gauge DB_POOL_CONNECTIONS."""
+    with _POOLS_LOCK:
+        _POOLS.add(pool)
+
+
+def _pool_connections(state: str) -> int:
+    """Conexiones abiertas u ociosas del conjunto de pools vivos."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS)
+    if state == "idle":
+        return sum(pool.idle_count for pool in pools)
+    return sum(pool.size for pool in pools)
+
+
+DB_POOL_CONNECTIONS.set_function(lambda: _pool_connections("open"), state="open")
+DB_POOL_CONNECTIONS.set_function(lambda: _pool_connections("idle"), state="idle")
 
 
 class TokenRepository:
     """Repositorio para obtener tokens desde SQL Server."""
 
-    def __init__(self, config: DatabaseConfig, jtds_jar_path: str):
+    # SQL Server admite como máximo 2100 parámetros por sentencia
+    BATCH_CHUNK_SIZE = 1000
+
+    def __init__(
+        self,
+        config: DatabaseConfig,
+        jtds_jar_path: str,
+        backend: Optional[DatabaseBackend] = None,
+    ):
         """
         Inicializa el repositorio.
 
         Args:
             config: Configuración de la base de datos
             jtds_jar_path: Ruta al archivo JAR del driver jTDS
+            backend: Driver de la base de datos; por defecto, el indicado en
+                config.backend (DB_BACKEND)
         """
         self.config = config
         self.jtds_jar_path = jtds_jar_path
+        self.backend = backend or create_backend(config, jtds_jar_path)
+        self.pool = ConnectionPool(
+            self._create_connection,
+            min_size=config.pool_min_size,
+            max_size=config.pool_max_size,
+            idle_timeout=config.pool_idle_timeout,
+            validate_on_borrow=config.pool_validate_on_borrow,
+            validation_interval=config.pool_validation_interval,
+        )
+        _track_pool(self.pool)
 
+    @traced("db.get_token_by_provisioning_id")
     def get_token_by_provisioning_id(self, provisioning_id: int | str) -> tuple[str, str]:
         """
         Obtiene el token JWT más reciente para un provisioning ID.
@@ -34,55 +311,437 @@ class TokenRepository:
         Raises:
             RuntimeError: Si no se puede conectar o no se encuentra el token
         """
-        print(f"\n🔌 Conectando a SQL Server con jTDS...")
+        print(f"\n🔌 Obteniendo conexión a SQL Server (pool {self.backend.label})...")
         print(f"📍 Host: {self.config.host}:{self.config.port}/{self.config.name}")
 
-        connection = None
-        cursor = None
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    token_data = self._execute_token_query(cursor, provisioning_id)
+                finally:
+                    cursor.close()
+
+            return self._process_token_result(token_data)
+
+        except Exception as e:
+            raise self._create_connection_error(e)
+
+    @traced("db.get_tokens_by_provisioning_ids")
+    def get_tokens_by_provisioning_ids(
+        self,
+        provisioning_ids: list[int | str],
+    ) -> tuple[dict[int | str, tuple[str, str]], list[int | str]]:
+        """
+        Obtiene el token JWT más reciente de varios provisioning IDs.
+
+        Usa una única conexión y una consulta por bloque de BATCH_CHUNK_SIZE IDs.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+
+        Returns:
+            Tupla (tokens, missing): tokens mapea cada ID encontrado a
+            (username, jwt_token); missing lista los IDs sin token
+
+        Raises:
+            RuntimeError: Si no se puede conectar o falla la consulta
+        """
+        requested = self._deduplicate_ids(provisioning_ids)
+        if not requested:
+            return {}, []
+
+        print(f"\n🔌 Obteniendo conexión a SQL Server (pool {self.backend.label})...")
+        print(f"📍 Host: {self.config.host}:{self.config.port}/{self.config.name}")
+
+        print(f"  📊 Consultando tokens para {len(requested)} CPPR_PROVISIONINGID")
 
         try:
-            connection = self._create_connection()
-            print(f"  ✅ Conexión exitosa!")
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    states = self._query_latest_tokens(cursor, requested)
+                finally:
+                    cursor.close()
+        except Exception as e:
+            raise self._create_connection_error(e)
 
-            cursor = connection.cursor()
-            token_data = self._execute_token_query(cursor, provisioning_id)
+        tokens = {
+            provisioning_id: (username, self.normalize_token(jwt_token))
+            for provisioning_id, (_, username, jwt_token) in states.items()
+            if jwt_token
+        }
 
-            return self._process_token_result(token_data)
+        missing = [provisioning_id for provisioning_id in requested.values() if provisioning_id not in tokens]
+        print(f"  ✅ Tokens encontrados: {len(tokens)} | Sin token: {len(missing)}")
+
+        return tokens, missing
 
+    @traced("db.get_token_refresh_state")
+    def get_token_refresh_state(self, provisioning_id: int | str) -> Optional[tuple]:
+        """
+        Obtiene la fila del token más reciente junto con su fecha de refresco.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+
+        Returns:
+            Tupla (last_refresh, username, jwt_token) o None si no hay fila
+
+        Raises:
+            RuntimeError: Si no se puede conectar o falla la consulta
+        """
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    return self._execute_refresh_state_query(cursor, provisioning_id)
+                finally:
+                    cursor.close()
         except Exception as e:
             raise self._create_connection_error(e)
-        finally:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
 
+    @traced("db.wait_for_token_refresh")
+    def wait_for_token_refresh(
+        self,
+        provisioning_id: int | str,
+        previous_refresh,
+        timeout: float = 15.0,
+        initial_delay: float = 0.05,
+        max_delay: float = 1.0,
+    ) -> tuple[str, str, bool]:
+        """
+        Espera a que ACUT_LAST_RESFRESH cambie respecto a un valor anterior.
+
+        Consulta sobre una misma conexión con backoff exponencial hasta que
+        aparece un refresco distinto de `previous_refresh` o vence el plazo.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            previous_refresh: ACUT_LAST_RESFRESH leído antes de hacer login
+            timeout: Segundos máximos de espera
+            initial_delay: Espera inicial entre consultas
+            max_delay: Espera máxima entre consultas
+
+        Returns:
+            Tupla (username, jwt_token, refreshed); refreshed es False si vence
+            el plazo y se devuelve el último token conocido
+
+        Raises:
+            RuntimeError: Si no se puede conectar o no se encuentra el token
+        """
+        print(f"  ⏳ Esperando refresco del token (máx. {timeout:g}s)...")
+
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        attempts = 0
+
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    while True:
+                        state = self._execute_refresh_state_query(cursor, provisioning_id)
+                        attempts += 1
+
+                        refreshed = (
+                            state is not None
+                            and state[0] is not None
+                            and state[0] != previous_refresh
+                        )
+                        remaining = deadline - time.monotonic()
+                        if refreshed or remaining <= 0:
+                            break
+
+                        time.sleep(min(delay, remaining))
+                        delay = min(delay * 2, max_delay)
+                finally:
+                    cursor.close()
+        except Exception as e:
+            raise self._create_connection_error(e)
+
+        if refreshed:
+            print(f"  ✅ Token refrescado tras {attempts} consulta(s)")
+        else:
+            print(f"  ⚠️  El token no cambió en {timeout:g}s, se usa el último disponible")
+
+        token_data = state[1:] if state else None
+        username, jwt_token = self._process_token_result(token_data)
+        return username, jwt_token, refreshed
+
+    @traced("db.get_token_refresh_states")
+    def get_token_refresh_states(self, provisioning_ids: list[int | str]) -> dict[int | str, tuple]:
+        """
+        Obtiene la fila del token más reciente de varios provisioning IDs.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+
+        Returns:
+            Diccionario ID -> (last_refresh, username, jwt_token); los IDs sin
+            fila no aparecen
+
+        Raises:
+            RuntimeError: Si no se puede conectar o falla la consulta
+        """
+        requested = self._deduplicate_ids(provisioning_ids)
+        if not requested:
+            return {}
+
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    return self._query_latest_tokens(cursor, requested)
+                finally:
+                    cursor.close()
+        except Exception as e:
+            raise self._create_connection_error(e)
+
+    @traced("db.wait_for_tokens_refresh")
+    def wait_for_tokens_refresh(
+        self,
+        provisioning_ids: list[int | str],
+        previous_refresh: dict,
+        timeout: float = 15.0,
+        initial_delay: float = 0.05,
+        max_delay: float = 1.0,
+    ) -> dict[int | str, tuple[str, str, bool, float]]:
+        """
+        Espera a que ACUT_LAST_RESFRESH cambie para varios provisioning IDs.
+
+        Cada consulta solo incluye los IDs que aún no se han refrescado.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+            previous_refresh: ID -> ACUT_LAST_RESFRESH leído antes del login
+            timeout: Segundos máximos de espera
+            initial_delay: Espera inicial entre consultas
+            max_delay: Espera máxima entre consultas
+
+        Returns:
+            Diccionario ID -> (username, jwt_token, refreshed, segundos de espera);
+            los IDs sin token no aparecen
+
+        Raises:
+            RuntimeError: Si no se puede conectar o falla la consulta
+        """
+        pending = self._deduplicate_ids(provisioning_ids)
+        print(f"  ⏳ Esperando refresco de {len(pending)} token(s) (máx. {timeout:g}s)...")
+
+        start = time.monotonic()
+        deadline = start + timeout
+        delay = initial_delay
+        latest: dict = {}
+        refreshed_at: dict = {}
+
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    while pending:
+                        states = self._query_latest_tokens(cursor, pending)
+                        latest.update(states)
+
+                        elapsed = time.monotonic() - start
+                        for key, provisioning_id in list(pending.items()):
+                            state = states.get(provisioning_id)
+                            if (
+                                state is not None
+                                and state[0] is not None
+                                and state[0] != previous_refresh.get(provisioning_id)
+                            ):
+                                refreshed_at[provisioning_id] = elapsed
+                                del pending[key]
+
+                        remaining = deadline - time.monotonic()
+                        if not pending or remaining <= 0:
+                            break
+
+                        time.sleep(min(delay, remaining))
+                        delay = min(delay * 2, max_delay)
+                finally:
+                    cursor.close()
+        except Exception as e:
+            raise self._create_connection_error(e)
+
+        print(f"  ✅ Refrescados: {len(refreshed_at)} | Sin cambios: {len(latest) - len(refreshed_at)}")
+
+        elapsed = time.monotonic() - start
+        return {
+            provisioning_id: (
+                username,
+                self.normalize_token(jwt_token),
+                provisioning_id in refreshed_at,
+                refreshed_at.get(provisioning_id, elapsed),
+            )
+            for provisioning_id, (_, username, jwt_token) in latest.items()
+            if jwt_token
+        }
+
+    @traced("db.warm_up")
+    def warm_up(self) -> dict[str, float]:
+        """
+        Importa el driver y abre una primera conexión, que queda ociosa en el pool,
+        y después las necesarias hasta DB_POOL_MIN_SIZE.
+
+        Con el backend JDBC la primera conexión arranca la JVM, por lo que
+        conviene llamarlo en segundo plano antes de la primera consulta.
+
+        Returns:
+            Milisegundos de cada fase: "driver" (import del driver),
+            "connection" (primera conexión, incluido el arranque de la JVM) y
+            "pool" (resto de conexiones hasta el mínimo del pool)
+
+        Raises:
+            Exception: Error del driver si no se puede conectar
+        """
+        timings = {}
+
+        start = time.perf_counter()
+        self.backend.load_driver()
+        timings["driver"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with self.pool.connection():
+            pass
+        timings["connection"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        self.pool.prefill()
+        timings["pool"] = (time.perf_counter() - start) * 1000
+
+        return timings
+
+    def close(self) -> None:
+        """Cierra las conexiones abiertas del pool."""
+        self.pool.close()
+
+    @traced("db.connect")
     def _create_connection(self):
-        """Crea la conexión JDBC a la base de datos."""
+        """Crea una conexión a la base de datos con el backend configurado."""
         print(f"  → Usuario: {self.config.domain}\\{self.config.user}")
+        annotate(backend=self.backend.name)
 
-        return jaydebeapi.connect(
-            "net.sourceforge.jtds.jdbc.Driver",
-            self.config.jdbc_url,
-            self.config.connection_properties,
-            self.jtds_jar_path
-        )
+        start = time.perf_counter()
+        try:
+            connection = self.backend.connect()
+        except Exception:
+            DB_ERRORS.inc(stage="connect")
+            raise
+        DB_CONNECT_SECONDS.observe(time.perf_counter() - start)
+        print(f"  ✅ Conexión exitosa!")
+        return connection
 
     def _execute_token_query(self, cursor, provisioning_id: int | str):
         """Ejecuta la consulta SQL para obtener el token."""
         print(f"  📊 Consultando token para CPPR_PROVISIONINGID = {provisioning_id}")
 
-        sql = """
+        sql = f"""
         SELECT TOP 1 ACUS_USERNAME, ACUT_JWT_TOKEN
         FROM ngcs..CORE_PROVISIONED_PRODUCTS
             JOIN ngcs..ACL_USERS ON CORE_PROVISIONED_PRODUCTS.CPPR_ID = ACL_USERS.ACUS_PROVISIONEDPRODUCTID
             LEFT JOIN ngcs..ACL_USER_TOKENS ON ACL_USERS.ACUS_ID = ACL_USER_TOKENS.ACUT_USERID
-        WHERE CPPR_PROVISIONINGID = ?
+        WHERE CPPR_PROVISIONINGID = {self.backend.placeholder}
+        ORDER BY ACL_USER_TOKENS.ACUT_LAST_RESFRESH DESC
+        """
+
+        return self._run_query(cursor, "token", sql, (provisioning_id,))
+
+    def _execute_refresh_state_query(self, cursor, provisioning_id: int | str):
+        """Ejecuta la consulta del token más reciente incluyendo su fecha de refresco."""
+        sql = f"""
+        SELECT TOP 1 ACL_USER_TOKENS.ACUT_LAST_RESFRESH, ACUS_USERNAME, ACUT_JWT_TOKEN
+        FROM ngcs..CORE_PROVISIONED_PRODUCTS
+            JOIN ngcs..ACL_USERS ON CORE_PROVISIONED_PRODUCTS.CPPR_ID = ACL_USERS.ACUS_PROVISIONEDPRODUCTID
+            LEFT JOIN ngcs..ACL_USER_TOKENS ON ACL_USERS.ACUS_ID = ACL_USER_TOKENS.ACUT_USERID
+        WHERE CPPR_PROVISIONINGID = {self.backend.placeholder}
         ORDER BY ACL_USER_TOKENS.ACUT_LAST_RESFRESH DESC
         """
 
-        cursor.execute(sql, (provisioning_id,))
-        return cursor.fetchone()
+        return self._run_query(cursor, "refresh_state", sql, (provisioning_id,))
+
+    def _query_latest_tokens(self, cursor, requested: dict[str, int | str]) -> dict[int | str, tuple]:
+        """
+        Consulta en bloques de BATCH_CHUNK_SIZE el último token de cada ID.
+
+        Args:
+            cursor: Cursor de la conexión
+            requested: ID normalizado -> ID original
+
+        Returns:
+            Diccionario ID original -> (last_refresh, username, jwt_token)
+        """
+        keys = list(requested)
+        states = {}
+
+        for start in range(0, len(keys), self.BATCH_CHUNK_SIZE):
+            chunk = [requested[key] for key in keys[start:start + self.BATCH_CHUNK_SIZE]]
+            for row_id, last_refresh, username, jwt_token in self._execute_batch_token_query(cursor, chunk):
+                key = self._normalize_id(row_id)
+                if key in requested:
+                    states[requested[key]] = (last_refresh, username, jwt_token)
+
+        return states
+
+    def _execute_batch_token_query(self, cursor, provisioning_ids: list[int | str]) -> list:
+        """Ejecuta la consulta SQL del último token para un bloque de IDs."""
+        placeholders = ", ".join(self.backend.placeholder for _ in provisioning_ids)
+        sql = f"""
+        SELECT CPPR_PROVISIONINGID, ACUT_LAST_RESFRESH, ACUS_USERNAME, ACUT_JWT_TOKEN
+        FROM (
+            SELECT CPPR_PROVISIONINGID, ACL_USER_TOKENS.ACUT_LAST_RESFRESH, ACUS_USERNAME, ACUT_JWT_TOKEN,
+                ROW_NUMBER() OVER (
+                    PARTITION BY CPPR_PROVISIONINGID
+                    ORDER BY ACL_USER_TOKENS.ACUT_LAST_RESFRESH DESC
+                ) AS RN
+            FROM ngcs..CORE_PROVISIONED_PRODUCTS
+                JOIN ngcs..ACL_USERS ON CORE_PROVISIONED_PRODUCTS.CPPR_ID = ACL_USERS.ACUS_PROVISIONEDPRODUCTID
+                LEFT JOIN ngcs..ACL_USER_TOKENS ON ACL_USERS.ACUS_ID = ACL_USER_TOKENS.ACUT_USERID
+            WHERE CPPR_PROVISIONINGID IN ({placeholders})
+        ) AS LATEST
+        WHERE RN = 1
+        """
+
+        return self._run_query(cursor, "batch", sql, tuple(provisioning_ids), fetch_all=True)
+
+    @staticmethod
+    @traced("db.query")
+    def _run_query(cursor, query: str, sql: str, params: tuple, fetch_all: bool = False):
+        """Ejecuta una consulta registrando su duración y sus errores."""
+        annotate(query=query, params=len(params))
+        start = time.perf_counter()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if fetch_all else cursor.fetchone()
+        except Exception:
+            DB_ERRORS.inc(stage="query")
+            raise
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, query=query)
+
+    @classmethod
+    def _deduplicate_ids(cls, provisioning_ids: list[int | str]) -> dict[str, int | str]:
+        """Deduplica IDs conservando el orden y el valor original de cada uno."""
+        requested = {}
+        for provisioning_id in provisioning_ids:
+            requested.setdefault(cls._normalize_id(provisioning_id), provisioning_id)
+        return requested
+
+    @staticmethod
+    def _normalize_id(provisioning_id: int | str) -> str:
+        """Normaliza un provisioning ID para comparar valores de Python y de la BD."""
+        if isinstance(provisioning_id, float) and provisioning_id.is_integer():
+            provisioning_id = int(provisioning_id)
+        return str(provisioning_id).strip()
+
+    @staticmethod
+    def normalize_token(jwt_token) -> str:
+        """Asegura que el token lleva el prefijo Bearer."""
+        jwt_token = str(jwt_token)
+        if not jwt_token.startswith("Bearer "):
+            jwt_token = "Bearer " + jwt_token
+        return jwt_token
 
     def _process_token_result(self, token_data) -> tuple[str, str]:
         """Procesa el resultado de la consulta."""
@@ -97,11 +756,7 @@ class TokenRepository:
         if not jwt_token:
             raise RuntimeError(f"El usuario {username} no tiene ACUT_JWT_TOKEN")
 
-        jwt_token = str(jwt_token)
-        if not jwt_token.startswith("Bearer "):
-            jwt_token = "Bearer " + jwt_token
-
-        return username, jwt_token
+        return username, self.normalize_token(jwt_token)
 
     def _create_connection_error(self, original_error: Exception) -> RuntimeError:
         """Crea un mensaje de error detallado para problemas de conexión."""
@@ -0,0 +1,139 @@
+"""
+Drivers con los que TokenRepository se conecta a SQL Server.
+"""
+import threading
+from abc import ABC, abstractmethod
+from typing import Any
+
+from ..config.settings import DatabaseConfig
+
+
+class DatabaseBackend(ABC):
+    """Driver DB-API para SQL Server."""
+
+    name = ""
+    label = ""
+    # Marcador de parámetro del paramstyle del driver
+    placeholder = "?"
+
+    @abstractmethod
+    def load_driver(self) -> None:
+        """Importa el módulo del driver (se hace en la primera conexión si no se llama antes)."""
+
+    @abstractmethod
+    def connect(self) -> Any:
+        """
+        Abre una conexión DB-API.
+
+        Returns:
+            Conexión con autocommit activado
+        """
+
+
+# jaydebeapi arranca la JVM en la primera conexión y no admite que dos hilos
+# lo hagan a la vez: la primera conexión se serializa
+_jvm_lock = threading.Lock()
+_jvm_started = threading.Event()
+
+
+class JdbcBackend(DatabaseBackend):
+    """jaydebeapi + driver JDBC jTDS (requiere JVM)."""
+
+    name = "jdbc"
+    label = "jTDS"
+    placeholder = "?"
+
+    def __init__(self, config: DatabaseConfig, jtds_jar_path: str):
+        """
+        Inicializa el backend.
+
+        Args:
+            config: Configuración de la base de datos
+            jtds_jar_path: Ruta al archivo JAR del driver jTDS
+        """
+        self.config = config
+        self.jtds_jar_path = jtds_jar_path
+
+    def load_driver(self) -> None:
+        import jaydebeapi  # noqa: F401
+
+    def connect(self) -> Any:
+        import jaydebeapi
+
+        def connect():
+            return jaydebeapi.connect(
+                "net.sourceforge.jtds.jdbc.Driver",
+                self.config.jdbc_url,
+                self.config.connection_properties,
+                self.jtds_jar_path
+            )
+
+        if _jvm_started.is_set():
+            return connect()
+
+        with _jvm_lock:
+            connection = connect()
+            _jvm_started.set()
+            return connection
+
+
+class PytdsBackend(DatabaseBackend):
+    """Driver TDS en Python puro (python-tds), sin JVM."""
+
+    name = "pytds"
+    label = "pytds"
+    placeholder = "%s"
+
+    def __init__(self, config: DatabaseConfig, login_timeout: float = 15.0):
+        """
+        Inicializa el backend.
+
+        Args:
+            config: Configuración de la base de datos
+            login_timeout: Segundos máximos para conectar y autenticarse
+        """
+        self.config = config
+        self.login_timeout = login_timeout
+
+    def load_driver(self) -> None:
+        import pytds  # noqa: F401
+        from pytds.login import NtlmAuth  # noqa: F401
+
+    def connect(self) -> Any:
+        import pytds
+        from pytds.login import NtlmAuth
+
+        # Autenticación de Windows (NTLM) con DOMINIO\usuario, como jTDS
+        auth = NtlmAuth(
+            user_name=f"{self.config.domain}\\{self.config.user}",
+            password=self.config.password,
+        )
+        return pytds.connect(
+            dsn=self.config.host,
+            port=self.config.port,
+            database=self.config.name,
+            auth=auth,
+            autocommit=True,
+            login_timeout=self.login_timeout,
+        )
+
+
+def create_backend(config: DatabaseConfig, jtds_jar_path: str) -> DatabaseBackend:
+    """
+    Crea el backend indicado en la configuración (DB_BACKEND).
+
+    Args:
+        config: Configuración de la base de datos
+        jtds_jar_path: Ruta al archivo JAR del driver jTDS
+
+    Returns:
+        Backend de base de datos
+
+    Raises:
+        ValueError: Si el backend no está soportado
+    """
+    if config.backend == JdbcBackend.name:
+        return JdbcBackend(config, jtds_jar_path)
+    if config.backend == PytdsBackend.name:
+        return PytdsBackend(config)
+    raise ValueError(f"Backend de base de datos no soportado: {config.backend}")
@@ -1,115 +1,280 @@
 """
 Servicio para gestión de archivos de tokens.
 """
-import json
-import re
+import os
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
+
+from .metrics import FILE_READ_CACHE_REQUESTS, FILE_WRITE_SECONDS
+from .token_targets import TokenTarget
+from .tracing import annotate, in_current_context, traced
+
+
+@dataclass
+class FileWriteResult:
+    """Resultado de actualizar el token en un archivo."""
+    path: Path
+    status: str
+    elapsed_ms: float
+    error: str = ""
+
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+    FAILED = "error"
+
+    @property
+    def ok(self) -> bool:
+        """Indica si la actualización no ha fallado."""
+        return self.status != self.FAILED
 
 
 class TokenFileManager:
     """Gestor de archivos de configuración de tokens."""
 
-    def __init__(self, json_path: str, js_path: str):
+    def __init__(self, targets: list[TokenTarget], max_workers: int = 8):
         """
         Inicializa el gestor de archivos.
 
         Args:
-            json_path: Ruta al archivo JSON de configuración
-            js_path: Ruta al archivo JavaScript de configuración
+            targets: Archivos de destino del token, en orden de prioridad de lectura
+            max_workers: Máximo de archivos escritos en paralelo
         """
-        self.json_path = Path(json_path)
-        self.js_path = Path(js_path)
+        self.targets = list(targets)
+        self.max_workers = max_workers
+        # Serializa las escrituras concurrentes (servidor web multihilo)
+        self._write_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # destino -> ((st_ino, st_size, st_mtime_ns), token leído)
+        self._token_cache: dict[TokenTarget, tuple[tuple[int, int, int], str]] = {}
+        # Protege _token_cache: lo usan los hilos del servidor web y los de
+        # escritura (estos con _write_lock tomado por update_token)
+        self._cache_lock = threading.Lock()
+        self._cached_token = ""
+        # Funciones a las que se avisa tras escribir un token nuevo
+        self._listeners: list[Callable[[str], None]] = []
+
+    @property
+    def cached_token(self) -> str:
+        """Último token obtenido por get_current_token(), sin acceder al disco."""
+        return self._cached_token
 
+    @traced("files.get_current_token")
     def get_current_token(self) -> str:
         """
         Obtiene el token actual de los archivos de configuración.
-        Intenta primero desde JSON, luego desde JS.
+        Devuelve el del primer destino que lo contenga (JSON, luego JS, ...).
+
+        Cada archivo solo se vuelve a leer si su stat (inodo, tamaño, mtime)
+        ha cambiado desde la última lectura.
 
         Returns:
             Token actual o cadena vacía si no se encuentra
         """
-        token = self._get_token_from_json()
-        if token:
-            return token
+        token = ""
+        for target in self.targets:
+            token = self._read_cached(target)
+            if token:
+                break
 
-        return self._get_token_from_js()
+        self._cached_token = token
+        return token
 
-    def update_token(self, new_token: str) -> None:
+    def add_listener(self, listener: Callable[[str], None]) -> None:
         """
-        Actualiza el token en ambos archivos de configuración.
+        Registra una función a la que se avisa tras cada escritura correcta.
+
+        Args:
+            listener: Recibe el token escrito; se invoca en el hilo que escribe
+        """
+        self._listeners.append(listener)
+
+    @traced("files.update_token")
+    def update_token(self, new_token: str) -> list[FileWriteResult]:
+        """
+        Actualiza el token en todos los archivos de destino.
+
+        Los archivos se escriben en paralelo y de forma atómica (archivo
+        temporal + rename); los que ya contienen el token no se reescriben.
 
         Args:
             new_token: Nuevo token JWT a guardar
 
+        Returns:
+            Resultado de cada archivo (estado y tiempo empleado)
+
         Raises:
             RuntimeError: Si no se puede actualizar algún archivo
         """
-        self._update_json_token(new_token)
-        self._update_js_token(new_token)
+        # Los destinos que comparten archivo se procesan juntos para no
+        # escribir el mismo archivo desde dos hilos
+        targets_by_path: dict[Path, list[TokenTarget]] = {}
+        for target in self.targets:
+            targets_by_path.setdefault(target.path, []).append(target)
 
-    def _get_token_from_json(self) -> str:
-        """Obtiene el token desde el archivo JSON."""
-        try:
-            if not self.json_path.exists():
-                return ""
+        with self._write_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="token-files",
+                )
 
-            with open(self.json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            futures = [
+                self._executor.submit(in_current_context(self._update_file), path, targets, new_token)
+                for path, targets in targets_by_path.items()
+            ]
+            results = [future.result() for future in futures]
 
-            return data.get("dev", {}).get("panel_token", "")
-        except Exception:
-            return ""
+            if all(result.ok for result in results):
+                self._cached_token = new_token
 
-    def _get_token_from_js(self) -> str:
-        """Obtiene el token desde el archivo JavaScript."""
-        try:
-            if not self.js_path.exists():
-                return ""
+        for result in results:
+            self.print_result(result)
 
-            with open(self.js_path, "r", encoding="utf-8") as f:
-                content = f.read()
+        errors = [f"{result.path}: {result.error}" for result in results if not result.ok]
+        if errors:
+            raise RuntimeError("No se pudo actualizar el token en: " + "; ".join(errors))
 
-            match = re.search(r'const\s+auth\s*=\s*"(.*?)";', content, re.DOTALL)
-            return match.group(1) if match else ""
-        except Exception:
-            return ""
+        if any(result.status == FileWriteResult.UPDATED for result in results):
+            for listener in self._listeners:
+                listener(new_token)
 
-    def _update_json_token(self, new_token: str) -> None:
-        """Actualiza el token en el archivo JSON."""
-        with open(self.json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        return results
 
-        if "dev" not in data:
-            data["dev"] = {}
+    def close(self) -> None:
+        """Detiene el pool de hilos de escritura."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
 
-        data["dev"]["panel_token"] = new_token
+    @traced("files.write")
+    def _update_file(
+        self,
+        path: Path,
+        targets: list[TokenTarget],
+        new_token: str,
+    ) -> FileWriteResult:
+        """Actualiza el token en un archivo y mide el tiempo empleado."""
+        start = time.perf_counter()
 
-        with open(self.json_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        try:
+            version = self._file_version(path)
+            with open(path, "r", encoding="utf-8") as f:
+                original = f.read()
+
+            content = original
+            for target in targets:
+                # La versión solo identifica el contenido mientras no se ha modificado
+                rendered = target.render(content, new_token, version if content is original else None)
+                if rendered is not None:
+                    content = rendered
+
+            if content == original:
+                status = FileWriteResult.UNCHANGED
+            else:
+                self._write_atomic(path, content)
+                status = FileWriteResult.UPDATED
 
-    def _update_js_token(self, new_token: str) -> None:
-        """Actualiza el token en el archivo JavaScript."""
-        with open(self.js_path, "r", encoding="utf-8") as f:
-            content = f.read()
+            self._remember_token(targets, new_token, content)
+            error = ""
+        except Exception as e:
+            status = FileWriteResult.FAILED
+            error = str(e)
 
-        pattern = r'(^\s*(?:export\s+)?(?:const|let|var)\s+auth\s*=\s*)(["\']).*?\2\s*;?\s*$'
-        new_content, num_replacements = re.subn(
-            pattern,
-            lambda m: f'{m.group(1)}"{new_token}";',
-            content,
-            count=1,
-            flags=re.MULTILINE | re.DOTALL,
+        elapsed = time.perf_counter() - start
+        FILE_WRITE_SECONDS.observe(elapsed, status=status)
+        annotate(path=str(path), status=status)
+        return FileWriteResult(path, status, elapsed * 1000, error)
+
+    @staticmethod
+    def _write_atomic(path: Path, content: str) -> None:
+        """Escribe un archivo mediante un temporal en el mismo directorio y rename."""
+        # Si la ruta es un enlace simbólico se sustituye el archivo apuntado
+        target = path.resolve()
+        mode = stat.S_IMODE(os.stat(target).st_mode)
+
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{target.name}.",
+            suffix=".tmp",
+            dir=target.parent,
         )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
 
-        if num_replacements == 0:
-            raise RuntimeError(
-                'No se encontró una asignación a "auth" en config.js '
-                '(const/let/var auth = "...")'
-            )
+    @staticmethod
+    def print_result(result: FileWriteResult) -> None:
+        """Muestra el resultado de la actualización de un archivo."""
+        if result.status == FileWriteResult.UPDATED:
+            print(f"  💾 {result.path} actualizado ({result.elapsed_ms:.1f} ms)")
+        elif result.status == FileWriteResult.UNCHANGED:
+            print(f"  ⏭️  {result.path} sin cambios ({result.elapsed_ms:.1f} ms)")
+        else:
+            print(f"  ❌ {result.path}: {result.error} ({result.elapsed_ms:.1f} ms)")
 
-        with open(self.js_path, "w", encoding="utf-8") as f:
-            f.write(new_content)
+    def _read_cached(self, target: TokenTarget) -> str:
+        """Devuelve el token de un destino, leyendo el archivo solo si ha cambiado."""
+        path = target.path
+        try:
+            version = self._file_version(path)
+        except OSError:
+            with self._cache_lock:
+                self._token_cache.pop(target, None)
+            return ""
+
+        with self._cache_lock:
+            cached = self._token_cache.get(target)
+        if cached and cached[0] == version:
+            FILE_READ_CACHE_REQUESTS.inc(result="hit")
+            return cached[1]
+
+        FILE_READ_CACHE_REQUESTS.inc(result="miss")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                token = target.read_token(f.read(), version)
+        except Exception:
+            token = ""
+
+        with self._cache_lock:
+            self._token_cache[target] = (version, token)
+        return token
+
+    def _remember_token(self, targets: list[TokenTarget], token: str, content: str) -> None:
+        """Registra en la caché el token y el contenido recién escritos en un archivo."""
+        try:
+            version = self._file_version(targets[0].path)
+        except OSError:
+            with self._cache_lock:
+                for target in targets:
+                    self._token_cache.pop(target, None)
+            return
+
+        with self._cache_lock:
+            for target in targets:
+                self._token_cache[target] = (version, token)
+        for target in targets:
+            target.written(content, version)
+
+    @staticmethod
+    def _file_version(path: Path) -> tuple[int, int, int]:
+        """Identifica el contenido de un archivo por su stat."""
+        stat_result = os.stat(path)
+        return stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns
 
     def validate_paths(self) -> list[str]:
         """
@@ -118,13 +283,8 @@ class TokenFileManager:
         Returns:
             Lista de mensajes de advertencia
         """
-        warnings = []
-
-        if not self.json_path.exists():
-            warnings.append(f"No existe el archivo JSON: {self.json_path}")
-
-        if not self.js_path.exists():
-            warnings.append(f"No existe el archivo JS: {self.js_path}")
-
-        return warnings
-
+        return [
+            f"No existe el archivo {target.kind.upper()}: {target.path}"
+            for target in self.targets
+            if not target.path.exists()
+        ]
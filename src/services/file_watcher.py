@@ -0,0 +1,224 @@
+"""
+Vigilancia de los archivos de token: inotify en Linux, consulta de stat en el resto.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+# Escrituras directas, renombrados (escritura atómica y editores) y borrados
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Acceso mínimo a inotify mediante ctypes (sin dependencias externas)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._add_watch.restype = ctypes.c_int
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        """Vigila un directorio y devuelve su descriptor de vigilancia."""
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        return wd
+
+    def read_events(self) -> list[tuple[int, str]]:
+        """Lee los eventos pendientes como (descriptor, nombre de archivo)."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].split(b"\0", 1)[0]
+            offset += length
+            events.append((wd, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class TokenFileWatcher:
+    """
+    Avisa cuando cambia alguno de los archivos de token.
+
+    Con inotify se vigilan los directorios de los archivos (las escrituras
+    atómicas sustituyen el archivo, así que vigilar el propio archivo perdería
+    los cambios); sin inotify se compara su stat cada `poll_interval` segundos.
+    """
+
+    BACKENDS = ("auto", "inotify", "poll")
+
+    # Espera tras un cambio para agrupar las ráfagas de eventos de una escritura
+    DEBOUNCE_SECONDS = 0.05
+
+    def __init__(
+        self,
+        paths: Iterable[str | Path],
+        callback: Callable[[], None],
+        backend: str = "auto",
+        poll_interval: float = 1.0,
+    ):
+        """
+        Inicializa el vigilante.
+
+        Args:
+            paths: Archivos a vigilar
+            callback: Función que se invoca (en el hilo del vigilante) tras un cambio
+            backend: `inotify`, `poll` o `auto` (inotify si está disponible)
+            poll_interval: Segundos entre comprobaciones en modo `poll`
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend de vigilancia no soportado: {backend}")
+
+        self.paths = list(dict.fromkeys(Path(path) for path in paths))
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.backend = backend
+
+        self._inotify: Optional[_Inotify] = None
+        self._watched_names: dict[int, set[str]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._wake_r, self._wake_w = os.pipe()
+        self._stopped = False
+
+    def start(self) -> str:
+        """
+        Arranca el hilo de vigilancia.
+
+        Returns:
+            Backend utilizado (`inotify` o `poll`)
+        """
+        if self.backend in ("auto", "inotify"):
+            try:
+                self._start_inotify()
+                self.backend = "inotify"
+            except (OSError, AttributeError) as e:
+                if self.backend == "inotify":
+                    raise
+                print(f"⚠️  inotify no disponible ({e}); se comprobarán los archivos cada {self.poll_interval:g}s")
+                self.backend = "poll"
+        else:
+            self.backend = "poll"
+
+        target = self._run_inotify if self.backend == "inotify" else self._run_poll
+        self._thread = threading.Thread(target=target, name="token-file-watcher", daemon=True)
+        self._thread.start()
+        return self.backend
+
+    def stop(self) -> None:
+        """Detiene el hilo de vigilancia."""
+        if self._stopped:
+            return
+        self._stopped = True
+        os.write(self._wake_w, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._inotify is not None:
+            self._inotify.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _start_inotify(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("solo disponible en Linux")
+
+        inotify = _Inotify()
+        try:
+            # Los enlaces simbólicos se vigilan en su directorio y en el del destino
+            watched: dict[Path, set[str]] = {}
+            for path in self.paths:
+                for candidate in {path.absolute(), path.resolve()}:
+                    watched.setdefault(candidate.parent, set()).add(candidate.name)
+
+            for directory, names in watched.items():
+                try:
+                    wd = inotify.add_watch(directory, WATCH_MASK)
+                except FileNotFoundError:
+                    print(f"⚠️  No existe el directorio {directory}; sus archivos no se vigilan")
+                    continue
+                self._watched_names.setdefault(wd, set()).update(names)
+        except BaseException:
+            inotify.close()
+            raise
+
+        self._inotify = inotify
+
+    def _run_inotify(self) -> None:
+        fd = self._inotify.fd
+        while True:
+            readable, _, _ = select.select([fd, self._wake_r], [], [])
+            if self._wake_r in readable:
+                return
+            if not self._relevant(self._inotify.read_events()):
+                continue
+
+            # Agrupa el resto de eventos de la misma escritura
+            while select.select([fd, self._wake_r], [], [], self.DEBOUNCE_SECONDS)[0]:
+                if self._stopped:
+                    return
+                self._inotify.read_events()
+
+            self._notify()
+
+    def _relevant(self, events: list[tuple[int, str]]) -> bool:
+        return any(name in self._watched_names.get(wd, ()) for wd, name in events)
+
+    def _run_poll(self) -> None:
+        versions = self._versions()
+        while not select.select([self._wake_r], [], [], self.poll_interval)[0]:
+            current = self._versions()
+            if current != versions:
+                versions = current
+                self._notify()
+
+    def _versions(self) -> list[Optional[tuple[int, int, int]]]:
+        """Stat (inodo, tamaño, mtime) de cada archivo, o None si no existe."""
+        versions = []
+        for path in self.paths:
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                versions.append(None)
+            else:
+                versions.append((stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns))
+        return versions
+
+    def _notify(self) -> None:
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"⚠️  Error al procesar el cambio de los archivos de token: {e}")
@@ -0,0 +1,285 @@
+"""
+Localización de asignaciones de cadenas en código JavaScript sin expresiones
+regulares con retroceso sobre el archivo completo.
+
+El escáner busca el nombre de la variable con `str.find` y solo analiza
+léxicamente las líneas que contienen un candidato o el inicio de una
+construcción que puede ocupar varias líneas (comentario de bloque, template
+literal o cadena con continuación `\\`). El resto del archivo se salta a
+velocidad de C, así que el coste es lineal en el tamaño del archivo y no
+depende de cuántas cadenas o comentarios contenga.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+
+# Cadenas entre comillas; `\\[\s\S]` admite la continuación de línea con `\`
+_STRINGS = {
+    '"': re.compile(r'"[^"\\\n]*(?:\\[\s\S][^"\\\n]*)*"'),
+    "'": re.compile(r"'[^'\\\n]*(?:\\[\s\S][^'\\\n]*)*'"),
+}
+# Texto de un template literal hasta el cierre o la siguiente interpolación
+_TEMPLATE_TEXT = re.compile(r"[^`\\$]*(?:(?:\\[\s\S]|\$(?!\{))[^`\\$]*)*")
+_REGEX_LITERAL = re.compile(r"/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*")
+
+# Caracteres que pueden abrir una cadena, comentario, template o regex
+_SPECIAL = re.compile(r"[\"'`/]")
+_EXPRESSION_SPECIAL = re.compile(r"[\"'`/{}]")
+# Construcciones que pueden continuar en la línea siguiente
+_MULTILINE_START = re.compile(r"/\*|`|\\\r?\n")
+
+# Lo que puede seguir a la cadena asignada: fin de sentencia o comentario
+_ASSIGNMENT_END = re.compile(r"[ \t]*(?:[;,}\r\n]|//|/\*|$)")
+
+_DECLARATION_KEYWORDS = ("const", "let", "var")
+# Palabras tras las que `/` abre una expresión regular y no es una división
+_REGEX_KEYWORDS = frozenset((
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+    "throw", "case", "do", "else", "yield", "await",
+))
+
+
+@dataclass(frozen=True)
+class JsAssignment:
+    """Posición de una asignación `const/let/var <variable> = "<valor>"`."""
+    start: int
+    value_start: int
+    value_end: int
+    prefix: str
+
+    @property
+    def quote(self) -> str:
+        """Comilla del literal."""
+        return self.prefix[-1]
+
+    def value(self, content: str) -> str:
+        """Valor de la cadena (sin comillas) en el contenido."""
+        return content[self.value_start + 1:self.value_end - 1]
+
+    def matches(self, content: str) -> bool:
+        """Comprueba que la asignación sigue en la misma posición del contenido."""
+        return (
+            content.startswith(self.prefix, self.start)
+            and content[self.value_end - 1:self.value_end] == self.quote
+        )
+
+    def replace(self, content: str, value: str) -> tuple[str, "JsAssignment"]:
+        """
+        Sustituye el valor de la cadena conservando el resto del contenido.
+
+        Args:
+            content: Contenido en el que está la asignación
+            value: Nuevo valor (sin comillas)
+
+        Returns:
+            Nuevo contenido y posición de la asignación en él
+        """
+        literal = f"{self.quote}{value}{self.quote}"
+        new_content = content[:self.value_start] + literal + content[self.value_end:]
+        return new_content, JsAssignment(
+            self.start,
+            self.value_start,
+            self.value_start + len(literal),
+            self.prefix,
+        )
+
+
+def find_string_assignment(content: str, variable: str) -> Optional[JsAssignment]:
+    """
+    Localiza la primera asignación de una cadena a una variable en código.
+
+    Se ignoran las apariciones dentro de comentarios, cadenas, templates y
+    expresiones regulares, y las asignaciones cuyo valor no es una cadena
+    simple (`auth = "a" + b`).
+
+    Args:
+        content: Código JavaScript
+        variable: Nombre de la variable
+
+    Returns:
+        Posición de la asignación, o None si no hay ninguna
+    """
+    code_pos = 0
+    candidate = _next_candidate(content, variable, 0)
+
+    while candidate is not None:
+        start, value_start = candidate
+
+        multiline = _MULTILINE_START.search(content, code_pos, start)
+        if multiline is not None:
+            # Se resuelve antes la construcción, que puede ocultar el candidato
+            position = multiline.start()
+            resume = _lex_until(content, _line_start(content, code_pos, position), position)
+            if resume == position and content[position] != "\\":
+                resume = _skip_token(content, position)
+            code_pos = max(resume, position + 1)
+            if start < code_pos:
+                candidate = _next_candidate(content, variable, code_pos)
+            continue
+
+        # Sin construcciones multilínea pendientes, la línea empieza en código
+        resume = _lex_until(content, _line_start(content, code_pos, start), start)
+        if resume == start:
+            string = _STRINGS[content[value_start]].match(content, value_start)
+            if string is not None and _ASSIGNMENT_END.match(content, string.end()):
+                return JsAssignment(start, value_start, string.end(), content[start:value_start + 1])
+            resume = string.end() if string is not None else value_start + 1
+
+        code_pos = resume
+        candidate = _next_candidate(content, variable, code_pos)
+
+    return None
+
+
+def _next_candidate(content: str, variable: str, pos: int) -> Optional[tuple[int, int]]:
+    """
+    Siguiente `const/let/var <variable> = "` a partir de una posición.
+
+    Returns:
+        (inicio de la declaración, posición de la comilla) o None
+    """
+    pattern = _assignment_pattern(variable)
+    match = pattern.search(content, pos)
+    while match is not None:
+        start = _declaration_start(content, match.start())
+        if start >= pos:
+            return start, match.start(1)
+        match = pattern.search(content, match.start() + 1)
+    return None
+
+
+@lru_cache(maxsize=32)
+def _assignment_pattern(variable: str) -> re.Pattern:
+    """`<variable> = "` (empieza por un literal, que `re` busca sin retroceso)."""
+    return re.compile(rf"{re.escape(variable)}(?![\w$])\s*=\s*([\"'])")
+
+
+def _declaration_start(content: str, index: int) -> int:
+    """Inicio de la palabra clave que declara el identificador en `index`, o -1."""
+    end = index
+    while end > 0 and content[end - 1].isspace():
+        end -= 1
+    if end == index:
+        return -1
+
+    for keyword in _DECLARATION_KEYWORDS:
+        start = end - len(keyword)
+        if start >= 0 and content.startswith(keyword, start):
+            if start == 0 or not (_is_identifier_char(content[start - 1]) or content[start - 1] == "."):
+                return start
+    return -1
+
+
+def _lex_until(content: str, pos: int, target: int) -> int:
+    """
+    Avanza token a token desde una posición en código hasta `target`.
+
+    Returns:
+        `target` si está en código; si cae dentro de una cadena, comentario,
+        template o regex, la posición en la que termina ese token
+    """
+    while True:
+        match = _SPECIAL.search(content, pos, target)
+        if match is None:
+            return target
+        end = _skip_token(content, match.start())
+        if end > target:
+            return end
+        pos = end
+
+
+def _skip_token(content: str, pos: int) -> int:
+    """
+    Salta el token que empieza en `pos` (uno de `"`, `'`, `` ` `` o `/`).
+
+    Returns:
+        Posición siguiente al token; `pos + 1` si `/` es una división
+    """
+    char = content[pos]
+    if char in _STRINGS:
+        match = _STRINGS[char].match(content, pos)
+        return match.end() if match else _line_end(content, pos)
+    if char == "`":
+        return _skip_template(content, pos)
+
+    following = content[pos + 1:pos + 2]
+    if following == "/":
+        return _line_end(content, pos)
+    if following == "*":
+        end = content.find("*/", pos + 2)
+        return len(content) if end == -1 else end + 2
+    if _regex_allowed(content, pos):
+        match = _REGEX_LITERAL.match(content, pos)
+        if match:
+            return match.end()
+    return pos + 1
+
+
+def _skip_template(content: str, pos: int) -> int:
+    """Salta un template literal, incluidas sus interpolaciones `${...}`."""
+    pos += 1
+    while True:
+        pos = _TEMPLATE_TEXT.match(content, pos).end()
+        if pos >= len(content):
+            return len(content)
+        if content[pos] == "`":
+            return pos + 1
+        if content[pos] != "$":
+            # `\\` al final del archivo
+            return len(content)
+        pos = _skip_expression(content, pos + 2)
+
+
+def _skip_expression(content: str, pos: int) -> int:
+    """Salta el código de una interpolación hasta su `}` de cierre."""
+    depth = 0
+    while True:
+        match = _EXPRESSION_SPECIAL.search(content, pos)
+        if match is None:
+            return len(content)
+        pos = match.start()
+        char = content[pos]
+        if char == "{":
+            depth += 1
+            pos += 1
+        elif char == "}":
+            if depth == 0:
+                return pos + 1
+            depth -= 1
+            pos += 1
+        else:
+            pos = _skip_token(content, pos)
+
+
+def _regex_allowed(content: str, pos: int) -> bool:
+    """Indica si un `/` en `pos` abre una expresión regular según lo que le precede."""
+    index = pos - 1
+    while index >= 0 and content[index].isspace():
+        index -= 1
+    if index < 0:
+        return True
+
+    char = content[index]
+    if not _is_identifier_char(char):
+        return char not in ")]"
+
+    end = index + 1
+    while index >= 0 and _is_identifier_char(content[index]):
+        index -= 1
+    return content[index + 1:end] in _REGEX_KEYWORDS
+
+
+def _is_identifier_char(char: str) -> bool:
+    return char.isalnum() or char in "_$"
+
+
+def _line_start(content: str, code_pos: int, pos: int) -> int:
+    """Inicio de la línea de `pos`, o `code_pos` si está en la misma línea."""
+    return max(code_pos, content.rfind("\n", code_pos, pos) + 1)
+
+
+def _line_end(content: str, pos: int) -> int:
+    end = content.find("\n", pos)
+    return len(content) if end == -1 else end
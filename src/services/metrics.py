@@ -0,0 +1,322 @@
+"""
+Métricas en memoria con exportación en formato de texto de Prometheus.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+# Límites superiores (segundos) de los buckets de los histogramas
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    """Formatea un valor numérico para la exposición."""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    """Formatea las etiquetas `{a="x",b="y"}`."""
+    pairs = [
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    """Base de las métricas con etiquetas."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict) -> tuple[str, ...]:
+        """Ordena los valores de las etiquetas según label_names."""
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"Etiquetas de {self.name} no válidas: {sorted(labels)} "
+                f"(se esperaban {list(self.label_names)})"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        """Líneas de exposición de la métrica."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    @abstractmethod
+    def _render_samples(self) -> list[str]:
+        """Líneas de las muestras (sin HELP ni TYPE)."""
+
+
+class Counter(_Metric):
+    """Contador monótono."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Incrementa el contador."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Valor actual del contador."""
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """Valor instantáneo, fijado directamente o calculado al exportar."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        """Fija el valor."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """Calcula el valor con una función cada vez que se exporta."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+
+        values = sorted(values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma de duraciones con buckets acumulados."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> (conteo por bucket, suma, total)
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Registra una observación."""
+        key = self._label_values(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Context manager que observa la duración del bloque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """Número de observaciones."""
+        with self._lock:
+            entry = self._values.get(self._label_values(labels))
+            return entry[2] if entry else 0
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+
+        lines = []
+        for key, (bucket_counts, total_sum, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas de la aplicación."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        """Obtiene (o crea) un contador."""
+        return self._register(Counter, name, documentation, label_names)
+
+    def gauge(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        """Obtiene (o crea) un gauge."""
+        return self._register(Gauge, name, documentation, label_names)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: Optional[tuple[float, ...]] = None,
+    ) -> Histogram:
+        """Obtiene (o crea) un histograma."""
+        if buckets is None:
+            return self._register(Histogram, name, documentation, label_names)
+        return self._register(Histogram, name, documentation, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """Exporta todas las métricas en formato de texto de Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric_type, name: str, documentation: str, label_names, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_type(name, documentation, tuple(label_names), **kwargs)
+            elif not isinstance(metric, metric_type):
+                raise ValueError(f"La métrica {name} ya existe con otro tipo")
+            return metric
+
+
+# Registro compartido por todos los servicios
+REGISTRY = MetricsRegistry()
+
+LOGIN_SECONDS = REGISTRY.histogram(
+    "token_helper_login_seconds", "Duración del POST de login (incluye redirecciones)"
+)
+LOGIN_ERRORS = REGISTRY.counter("token_helper_login_errors_total", "Logins fallidos")
+LOGIN_CONNECTIONS = REGISTRY.counter(
+    "token_helper_login_connections_total", "Conexiones HTTP usadas en el login", ("reused",)
+)
+
+DB_CONNECT_SECONDS = REGISTRY.histogram(
+    "token_helper_db_connect_seconds", "Duración de la apertura de conexiones a SQL Server"
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "token_helper_db_query_seconds", "Duración de las consultas a SQL Server", ("query",)
+)
+DB_ERRORS = REGISTRY.counter(
+    "token_helper_db_errors_total", "Errores de conexión o consulta a SQL Server", ("stage",)
+)
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    "token_helper_db_pool_connections", "Conexiones del pool de SQL Server", ("state",)
+)
+
+COALESCED_CALLS = REGISTRY.counter(
+    "token_helper_coalesced_calls_total",
+    "Llamadas por provisioning ID: líderes que ejecutan y seguidores que comparten su resultado",
+    ("operation", "role"),
+)
+
+TOKEN_CACHE_REQUESTS = REGISTRY.counter(
+    "token_helper_token_cache_requests_total", "Consultas a la caché de tokens", ("result",)
+)
+TOKEN_STORE_REQUESTS = REGISTRY.counter(
+    "token_helper_token_store_requests_total", "Consultas al almacén persistente de tokens", ("result",)
+)
+TOKEN_STORE_PRUNED = REGISTRY.counter(
+    "token_helper_token_store_pruned_total", "Tokens caducados eliminados del almacén persistente"
+)
+
+FILE_WRITE_SECONDS = REGISTRY.histogram(
+    "token_helper_file_write_seconds", "Duración de la actualización de cada archivo", ("status",)
+)
+FILE_READ_CACHE_REQUESTS = REGISTRY.counter(
+    "token_helper_file_read_cache_requests_total",
+    "Lecturas del token actual servidas desde la caché por stat",
+    ("result",),
+)
+
+TEMPLATE_RENDER_SECONDS = REGISTRY.histogram(
+    "token_helper_template_render_seconds", "Duración del renderizado HTML", ("template",)
+)
+TEMPLATE_CACHE_REQUESTS = REGISTRY.counter(
+    "token_helper_template_cache_requests_total", "Consultas a la caché de templates", ("result",)
+)
+
+WEB_RESPONSE_BYTES = REGISTRY.counter(
+    "token_helper_web_response_bytes_total",
+    "Bytes de cuerpo enviados por la interfaz web",
+    ("encoding",),
+)
+WEB_REUSED_CONNECTIONS = REGISTRY.counter(
+    "token_helper_web_reused_connections_total",
+    "Peticiones web atendidas sobre una conexión keep-alive ya abierta",
+)
+
+TOKEN_EVENTS = REGISTRY.counter(
+    "token_helper_token_events_total", "Eventos de cambio de token publicados", ("type",)
+)
+WEB_EVENT_CLIENTS = REGISTRY.gauge(
+    "token_helper_web_event_clients", "Clientes conectados al stream de eventos (/events)"
+)
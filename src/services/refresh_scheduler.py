@@ -0,0 +1,230 @@
+"""
+Planificador de refrescos de tokens antes de su expiración.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .token_cache import get_jwt_expiry
+
+
+class TokenRefreshScheduler:
+    """Refresca en segundo plano los tokens vigilados antes de que caduquen."""
+
+    CHECK = "check"
+    REFRESH = "refresh"
+
+    def __init__(
+        self,
+        token_service,
+        lead_time: float = 300.0,
+        jitter: float = 60.0,
+        max_concurrency: int = 2,
+        retry_delay: float = 60.0,
+    ):
+        """
+        Inicializa el planificador.
+
+        Args:
+            token_service: Servicio de tokens (TokenService)
+            lead_time: Segundos antes de `exp` en los que se refresca el token
+            jitter: Segundos aleatorios máximos que se adelanta cada refresco
+            max_concurrency: Refrescos simultáneos como máximo
+            retry_delay: Segundos de espera tras un error o un token sin `exp`
+        """
+        self.token_service = token_service
+        self.lead_time = lead_time
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.retry_delay = retry_delay
+
+        # Cola de prioridad de (instante, secuencia, provisioning ID, acción, generación)
+        self._queue: list[tuple[float, int, str, str, int]] = []
+        self._sequence = itertools.count()
+        # provisioning ID -> estado (generación, token conocido, próximo refresco, último error)
+        self._watched: dict[str, dict] = {}
+        self._in_flight: set[str] = set()
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self) -> None:
+        """Arranca el hilo planificador."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="token-refresh",
+        )
+        self._thread = threading.Thread(target=self._run, name="token-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el planificador y espera a los refrescos en curso."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def watch(self, provisioning_id: int | str) -> None:
+        """
+        Añade un provisioning ID al conjunto vigilado.
+
+        La primera comprobación se reparte aleatoriamente dentro del jitter
+        para no lanzar todas a la vez.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+        """
+        key = str(provisioning_id).strip()
+        with self._condition:
+            if key in self._watched:
+                return
+            self._watched[key] = {
+                "generation": 0,
+                "token": "",
+                "next_run": None,
+                "expires_at": None,
+                "last_error": "",
+            }
+            self._push(key, self.CHECK, time.time() + random.uniform(0, self.jitter))
+
+    def unwatch(self, provisioning_id: int | str) -> None:
+        """
+        Deja de vigilar un provisioning ID.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+        """
+        with self._condition:
+            self._watched.pop(str(provisioning_id).strip(), None)
+
+    @property
+    def watched(self) -> list[str]:
+        """Provisioning IDs vigilados."""
+        with self._condition:
+            return list(self._watched)
+
+    def status(self) -> list[dict]:
+        """Estado de cada provisioning ID vigilado."""
+        with self._condition:
+            return [
+                {
+                    "provisioning_id": key,
+                    "next_run": state["next_run"],
+                    "expires_at": state["expires_at"],
+                    "in_flight": key in self._in_flight,
+                    "last_error": state["last_error"],
+                }
+                for key, state in self._watched.items()
+            ]
+
+    def _push(self, key: str, action: str, when: float) -> None:
+        """Programa una acción (con el lock adquirido)."""
+        state = self._watched[key]
+        state["generation"] += 1
+        state["next_run"] = when
+        heapq.heappush(self._queue, (when, next(self._sequence), key, action, state["generation"]))
+        self._condition.notify()
+
+    def _run(self) -> None:
+        """Bucle del planificador: lanza cada acción cuando vence."""
+        while True:
+            with self._condition:
+                while self._running:
+                    if self._queue:
+                        delay = self._queue[0][0] - time.time()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+
+                if not self._running:
+                    return
+
+                _, _, key, action, generation = heapq.heappop(self._queue)
+                state = self._watched.get(key)
+                # Entradas obsoletas: ID desvigilado o reprogramado
+                if state is None or state["generation"] != generation or key in self._in_flight:
+                    continue
+
+                self._in_flight.add(key)
+                state["next_run"] = None
+
+            self._executor.submit(self._execute, key, action)
+
+    def _execute(self, key: str, action: str) -> None:
+        """Ejecuta una comprobación o un refresco y programa el siguiente."""
+        with self._condition:
+            state = self._watched.get(key)
+            previous_token = state["token"] if state else ""
+
+        token = ""
+        error = ""
+        try:
+            if action == self.CHECK:
+                token = self.token_service.get_token_from_database(key)
+            else:
+                print(f"🔄 Refresco programado del token de provisioning ID {key}")
+                token = self.token_service.refresh_token(key)
+                self._update_files_if_current(previous_token, token)
+        except Exception as e:
+            error = str(e).strip().splitlines()[-1] if str(e).strip() else repr(e)
+            print(f"⚠️  Error refrescando provisioning ID {key}: {error}")
+
+        with self._condition:
+            self._in_flight.discard(key)
+            state = self._watched.get(key)
+            if state is None or not self._running:
+                return
+
+            state["last_error"] = error
+            if token:
+                state["token"] = token
+                state["expires_at"] = get_jwt_expiry(token)
+
+            next_run = self._next_refresh_time(
+                state["expires_at"],
+                failed=bool(error),
+                just_refreshed=action == self.REFRESH,
+            )
+            self._push(key, self.REFRESH, next_run)
+
+    def _next_refresh_time(
+        self,
+        expires_at: Optional[float],
+        failed: bool,
+        just_refreshed: bool,
+    ) -> float:
+        """Calcula cuándo refrescar: antes de `exp`, adelantado un jitter aleatorio."""
+        now = time.time()
+        if failed or expires_at is None:
+            return now + self.retry_delay + random.uniform(0, self.jitter)
+
+        due = expires_at - self.lead_time - random.uniform(0, self.jitter)
+
+        # Un token recién emitido con vida menor que lead_time no debe
+        # provocar refrescos en bucle
+        earliest = now + self.retry_delay if just_refreshed else now
+        return max(due, earliest)
+
+    def _update_files_if_current(self, previous_token: str, new_token: str) -> None:
+        """Actualiza los archivos locales si contienen el token anterior de este ID."""
+        if previous_token and new_token != previous_token:
+            if self.token_service.get_current_token() == previous_token:
+                self.token_service.file_manager.update_token(new_token)
@@ -0,0 +1,98 @@
+"""
+Agrupación de llamadas concurrentes con la misma clave (single-flight).
+"""
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+from .metrics import COALESCED_CALLS
+
+
+class _Call:
+    """Llamada en curso compartida por el líder y sus seguidores."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez cada operación con la misma clave mientras está en curso.
+
+    La primera llamada (líder) ejecuta la función; las que llegan con la misma
+    clave antes de que termine (seguidores) esperan y reciben su resultado o
+    su excepción. Al terminar, la clave queda libre para una ejecución nueva.
+    """
+
+    def __init__(self, name: str):
+        """
+        Inicializa el grupo.
+
+        Args:
+            name: Nombre de la operación (etiqueta de las métricas)
+        """
+        self.name = name
+        self.executions = 0
+        self.deduplicated = 0
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Any],
+        on_wait: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """
+        Ejecuta la función o espera a la ejecución en curso con la misma clave.
+
+        Args:
+            key: Clave de la operación
+            function: Función sin argumentos a ejecutar
+            on_wait: Función que se llama si se va a esperar a otra ejecución
+
+        Returns:
+            Resultado de la función
+
+        Raises:
+            Exception: La excepción de la ejecución compartida
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.deduplicated += 1
+
+        COALESCED_CALLS.inc(operation=self.name, role="leader" if leader else "follower")
+
+        if not leader:
+            if on_wait:
+                on_wait()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Ejecuciones reales, llamadas deduplicadas y claves en curso."""
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "deduplicated": self.deduplicated,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,157 @@
+"""
+Caché en memoria de tokens JWT con caducidad según el claim `exp`.
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .metrics import TOKEN_CACHE_REQUESTS
+
+
+def get_jwt_expiry(token: str) -> Optional[float]:
+    """
+    Obtiene el instante de expiración (epoch) de un token JWT.
+
+    Args:
+        token: Token JWT, con o sin prefijo Bearer
+
+    Returns:
+        Valor del claim `exp` o None si no se puede decodificar
+    """
+    if token.startswith("Bearer "):
+        token = token[len("Bearer "):]
+
+    parts = token.strip().split(".")
+    if len(parts) < 2:
+        return None
+
+    payload = parts[1]
+    try:
+        decoded = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        exp = json.loads(decoded).get("exp")
+    except (ValueError, AttributeError):
+        return None
+
+    if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+        return None
+    return float(exp)
+
+
+class TokenCache:
+    """Caché LRU y thread-safe de tokens por provisioning ID."""
+
+    def __init__(self, max_size: int = 256, expiry_margin: float = 60.0):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_size: Máximo de tokens almacenados (0 desactiva la caché)
+            expiry_margin: Segundos antes de `exp` a partir de los que el token
+                se considera caducado
+        """
+        self.max_size = max_size
+        self.expiry_margin = expiry_margin
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # provisioning ID -> (token, exp)
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, provisioning_id: int | str) -> Optional[str]:
+        """
+        Obtiene un token vigente de la caché.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+
+        Returns:
+            Token o None si no está o está a punto de caducar
+        """
+        key = self._key(provisioning_id)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                TOKEN_CACHE_REQUESTS.inc(result="miss")
+                return None
+
+            token, exp = entry
+            if time.time() >= exp - self.expiry_margin:
+                del self._entries[key]
+                self.misses += 1
+                TOKEN_CACHE_REQUESTS.inc(result="expired")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            TOKEN_CACHE_REQUESTS.inc(result="hit")
+            return token
+
+    def put(self, provisioning_id: int | str, token: str) -> bool:
+        """
+        Guarda un token si tiene claim `exp` y aún no está caducado.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            token: Token JWT
+
+        Returns:
+            True si el token se ha guardado
+        """
+        if self.max_size <= 0:
+            return False
+
+        exp = get_jwt_expiry(token)
+        if exp is None or time.time() >= exp - self.expiry_margin:
+            self.invalidate(provisioning_id)
+            return False
+
+        key = self._key(provisioning_id)
+
+        with self._lock:
+            self._entries[key] = (token, exp)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return True
+
+    def invalidate(self, provisioning_id: Optional[int | str] = None) -> None:
+        """
+        Elimina un token de la caché, o todos si no se indica ID.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+        """
+        with self._lock:
+            if provisioning_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(provisioning_id), None)
+
+    def stats(self) -> dict:
+        """Devuelve los contadores de la caché."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    @staticmethod
+    def _key(provisioning_id: int | str) -> str:
+        """Normaliza el provisioning ID usado como clave."""
+        return str(provisioning_id).strip()
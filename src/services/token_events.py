@@ -0,0 +1,112 @@
+"""
+Eventos de cambio de token dentro del proceso (para la interfaz web en directo).
+"""
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .metrics import TOKEN_EVENTS
+
+
+@dataclass
+class TokenEvent:
+    """Evento publicado: tipo, datos JSON e identificador creciente."""
+    id: int
+    type: str
+    data: dict
+
+    def encode(self) -> bytes:
+        """Serializa el evento en formato Server-Sent Events."""
+        payload = json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class TokenEventHub:
+    """
+    Publica eventos a los suscriptores y conserva los últimos para reenviarlos.
+
+    Los identificadores parten de la hora de arranque en milisegundos, así que
+    un cliente que reconecta tras un reinicio del proceso presenta un ID
+    anterior a todos los nuevos y recibe el estado completo.
+    """
+
+    def __init__(self, history_size: int = 64):
+        """
+        Inicializa el hub.
+
+        Args:
+            history_size: Eventos que se conservan para los clientes que reconectan
+        """
+        self._history: deque[TokenEvent] = deque(maxlen=history_size)
+        self._subscribers: list[Callable[[TokenEvent], None]] = []
+        self._last_id = int(time.time() * 1000)
+        self._lock = threading.Lock()
+
+    @property
+    def last_id(self) -> int:
+        """Identificador del último evento publicado."""
+        return self._last_id
+
+    @property
+    def has_subscribers(self) -> bool:
+        """Indica si alguien escucha los eventos."""
+        return bool(self._subscribers)
+
+    def subscribe(self, callback: Callable[[TokenEvent], None]) -> None:
+        """
+        Registra un suscriptor.
+
+        El callback se invoca en el hilo que publica: debe ser rápido y no bloquear.
+        """
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback: Callable[[TokenEvent], None]) -> None:
+        """Elimina un suscriptor."""
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber != callback]
+
+    def publish(self, event_type: str, **data) -> TokenEvent:
+        """
+        Publica un evento.
+
+        Args:
+            event_type: Tipo del evento (`token`, `refresh`...)
+            **data: Datos del evento (serializables a JSON)
+
+        Returns:
+            Evento publicado
+        """
+        with self._lock:
+            self._last_id += 1
+            event = TokenEvent(self._last_id, event_type, data)
+            self._history.append(event)
+            subscribers = self._subscribers
+
+        TOKEN_EVENTS.inc(type=event_type)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️  Error en un suscriptor de eventos: {e}")
+        return event
+
+    def since(self, last_id: int) -> Optional[list[TokenEvent]]:
+        """
+        Eventos posteriores a un identificador.
+
+        Args:
+            last_id: Último evento recibido por el cliente
+
+        Returns:
+            Eventos pendientes, o None si ya no están todos en el historial
+        """
+        with self._lock:
+            if last_id >= self._last_id:
+                return []
+            if not self._history or last_id < self._history[0].id - 1:
+                return None
+            return [event for event in self._history if event.id > last_id]
@@ -1,66 +1,303 @@
 """
 Servicio de aplicación que coordina las operaciones.
 """
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+
 from ..config.settings import AppConfig
 from .database import TokenRepository
-from .file_manager import TokenFileManager
+from .file_manager import FileWriteResult, TokenFileManager
 from .auth_service import LoginService
+from .single_flight import SingleFlight
+from .token_cache import TokenCache, get_jwt_expiry
+from .token_events import TokenEvent, TokenEventHub
+from .token_store import TokenStore
+from .token_targets import build_token_targets
+from .tracing import annotate, in_current_context, traced
+
+
+def flight_key(provisioning_id: int | str) -> str:
+    """Clave de agrupación: el mismo ID como entero o texto es la misma clave."""
+    return str(provisioning_id).strip()
+
+
+@dataclass
+class AutoUpdateResult:
+    """Resultado del modo automático para un provisioning ID."""
+    provisioning_id: int | str
+    username: str = ""
+    token: str = ""
+    refreshed: Optional[bool] = None
+    login_ms: float = 0.0
+    total_ms: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        """Indica si se ha obtenido el token."""
+        return not self.error and bool(self.token)
 
 
 class TokenService:
     """Servicio principal para gestión de tokens."""
 
-    def __init__(self, config: AppConfig):
+    def __init__(self, config: AppConfig, repository: Optional[TokenRepository] = None):
         """
         Inicializa el servicio con la configuración.
 
         Args:
             config: Configuración de la aplicación
+            repository: Repositorio de tokens; por defecto, SQL Server vía jTDS
         """
         self.config = config
-        self.repository = TokenRepository(config.database, config.jtds_jar_path)
-        self.file_manager = TokenFileManager(config.json_path, config.js_path)
-        self.auth_service = LoginService(config.login_url)
+        self.repository = repository or TokenRepository(config.database, config.jtds_jar_path)
+        self.file_manager = TokenFileManager(
+            build_token_targets(config),
+            max_workers=config.file_write_workers,
+        )
+        self.auth_service = LoginService(
+            config.login_url,
+            connect_timeout=config.login_connect_timeout,
+            read_timeout=config.login_read_timeout,
+            max_body_bytes=config.login_max_body_bytes,
+        )
+        self.token_cache = TokenCache(
+            max_size=config.token_cache_size,
+            expiry_margin=config.token_cache_expiry_margin,
+        )
+        # Copia en disco de los tokens para arrancar con ellos tras un reinicio
+        self.token_store = TokenStore.from_config(config)
+
+        # Cambios del token de los archivos y refrescos, para la interfaz web en directo
+        self.events = TokenEventHub()
+        self._published_token: Optional[str] = None
+        self._publish_lock = threading.Lock()
+        self.file_manager.add_listener(lambda _: self.publish_current_token("write"))
+
+        # Llamadas concurrentes con el mismo provisioning ID comparten una ejecución
+        self._database_flights = SingleFlight("update_token_from_database")
+        self._refresh_flights = SingleFlight("refresh_token")
+        self._auto_update_flights = SingleFlight("auto_update")
+
+    def close(self) -> None:
+        """Libera los recursos de los servicios (conexiones y pools de hilos)."""
+        self.repository.close()
+        self.auth_service.close()
+        self.file_manager.close()
+        if self.token_store is not None:
+            self.token_store.close()
+
+    def warm_up_database(self) -> bool:
+        """
+        Arranca la JVM y abre la primera conexión a SQL Server, mostrando los tiempos.
+
+        Pensado para ejecutarse en un hilo en segundo plano al arrancar un
+        proceso de larga duración (servidor web o daemon).
+
+        Returns:
+            True si la conexión quedó abierta
+        """
+        print("🔥 Pre-calentando la conexión a SQL Server en segundo plano...")
+        try:
+            timings = self.repository.warm_up()
+        except Exception as e:
+            detail = str(e).strip().splitlines()[-1] if str(e).strip() else repr(e)
+            print(f"⚠️  No se pudo pre-calentar la conexión a SQL Server: {detail}")
+            print("   Se reintentará en la primera consulta")
+            return False
+
+        message = (
+            f"🔥 SQL Server listo: driver {timings['driver']:.1f} ms | "
+            f"JVM + primera conexión {timings['connection']:.1f} ms"
+        )
+        if self.repository.pool.min_size > 1:
+            message += f" | {self.repository.pool.min_size} conexiones en el pool {timings['pool']:.1f} ms"
+        print(message)
+        return True
 
     def get_current_token(self) -> str:
         """Obtiene el token actual de los archivos de configuración."""
         return self.file_manager.get_current_token()
 
-    def update_token_manually(self, new_token: str) -> None:
+    def publish_current_token(self, source: str) -> Optional[TokenEvent]:
+        """
+        Publica un evento `token` si el token de los archivos ha cambiado.
+
+        Args:
+            source: Origen del aviso (`write` si lo ha escrito este proceso,
+                `file` si lo ha detectado el vigilante de archivos)
+
+        Returns:
+            Evento publicado o None si no hay suscriptores o no ha cambiado
+        """
+        if not self.events.has_subscribers:
+            return None
+
+        with self._publish_lock:
+            token = self.get_current_token()
+            if token == self._published_token:
+                return None
+            self._published_token = token
+            return self.events.publish("token", token=token, exp=get_jwt_expiry(token), source=source)
+
+    def publish_refresh(self, provisioning_ids: list[int | str]) -> None:
+        """
+        Publica un evento `refresh` con los IDs cuyo token se ha refrescado.
+
+        Args:
+            provisioning_ids: IDs refrescados
+        """
+        if provisioning_ids and self.events.has_subscribers:
+            self.events.publish("refresh", provisioning_ids=[flight_key(value) for value in provisioning_ids])
+
+    @traced("token_service.update_token_manually")
+    def update_token_manually(self, new_token: str) -> list[FileWriteResult]:
         """
         Actualiza el token manualmente en los archivos.
 
         Args:
             new_token: Nuevo token JWT
+
+        Returns:
+            Resultado de la escritura de cada archivo
         """
-        self.file_manager.update_token(new_token)
+        return self.file_manager.update_token(new_token)
 
-    def get_token_from_database(self, provisioning_id: int | str) -> str:
+    @traced("token_service.get_token_from_database")
+    def get_token_from_database(self, provisioning_id: int | str, use_cache: bool = True) -> str:
         """
         Obtiene el token desde la base de datos.
 
+        Si hay en caché (en memoria o en el almacén local) un token que no está
+        a punto de caducar, se devuelve sin consultar la base de datos.
+
         Args:
             provisioning_id: ID de aprovisionamiento
+            use_cache: Si se permite servir el token desde la caché
 
         Returns:
             Token JWT con prefijo Bearer
         """
+        annotate(provisioning_id=provisioning_id)
+        if use_cache:
+            token = self.token_cache.get(provisioning_id)
+            if token:
+                print(f"⚡ Token servido desde caché para provisioning ID {provisioning_id}")
+                annotate(cache="hit")
+                return token
+
+            entry = self.token_store.get(provisioning_id) if self.token_store is not None else None
+            if entry:
+                print(f"💾 Token servido desde el almacén local para provisioning ID {provisioning_id}")
+                annotate(cache="store")
+                self.token_cache.put(provisioning_id, entry[1])
+                return entry[1]
+
         username, token = self.repository.get_token_by_provisioning_id(provisioning_id)
+        self.remember_token(provisioning_id, username, token)
         return token
 
-    def update_token_from_database(self, provisioning_id: int | str) -> str:
+    @traced("token_service.get_tokens_by_provisioning_ids")
+    def get_tokens_by_provisioning_ids(
+        self,
+        provisioning_ids: list[int | str],
+    ) -> tuple[dict[int | str, str], list[int | str]]:
+        """
+        Obtiene desde la base de datos los tokens de varios provisioning IDs.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+
+        Returns:
+            Tupla (tokens, missing): tokens mapea cada ID a su token JWT con
+            prefijo Bearer; missing lista los IDs sin token
+        """
+        tokens = {}
+        pending = []
+        for provisioning_id in provisioning_ids:
+            token = self.token_cache.get(provisioning_id)
+            if token:
+                tokens[provisioning_id] = token
+            else:
+                pending.append(provisioning_id)
+
+        if pending and self.token_store is not None:
+            for provisioning_id, (_, token) in self.token_store.get_many(pending).items():
+                self.token_cache.put(provisioning_id, token)
+                tokens[provisioning_id] = token
+            pending = [provisioning_id for provisioning_id in pending if provisioning_id not in tokens]
+
+        if not pending:
+            return tokens, []
+
+        found, missing = self.repository.get_tokens_by_provisioning_ids(pending)
+        self.remember_tokens(found)
+        for provisioning_id, (_, token) in found.items():
+            tokens[provisioning_id] = token
+
+        return tokens, missing
+
+    def remember_token(self, provisioning_id: int | str, username: str, token: str) -> None:
+        """
+        Guarda un token recién obtenido de la BD en la caché y en el almacén local.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            username: Usuario del token
+            token: Token JWT
+        """
+        self.remember_tokens({provisioning_id: (username, token)})
+
+    def forget_token(self, provisioning_id: int | str) -> None:
+        """
+        Descarta el token de un ID de la caché y del almacén local.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+        """
+        self.token_cache.invalidate(provisioning_id)
+        if self.token_store is not None:
+            self.token_store.invalidate(provisioning_id)
+
+    def remember_tokens(self, entries: dict[int | str, tuple[str, str]]) -> None:
+        """
+        Guarda varios tokens en la caché y en el almacén local (una sola transacción).
+
+        Args:
+            entries: Mapa de ID a (username, token)
+        """
+        for provisioning_id, (_, token) in entries.items():
+            self.token_cache.put(provisioning_id, token)
+        if entries and self.token_store is not None:
+            self.token_store.put_many(entries)
+
+    @traced("token_service.update_token_from_database")
+    def update_token_from_database(self, provisioning_id: int | str, use_cache: bool = True) -> str:
         """
         Obtiene el token desde la base de datos y lo actualiza en los archivos.
 
+        Las llamadas simultáneas con el mismo ID comparten la consulta y la escritura.
+
         Args:
             provisioning_id: ID de aprovisionamiento
+            use_cache: Si se permite servir el token desde la caché
 
         Returns:
             Token obtenido
         """
-        token = self.get_token_from_database(provisioning_id)
-        self.file_manager.update_token(token)
-        return token
+        def update() -> str:
+            token = self.get_token_from_database(provisioning_id, use_cache=use_cache)
+            self.file_manager.update_token(token)
+            return token
+
+        return self._database_flights.do(
+            (flight_key(provisioning_id), use_cache),
+            update,
+            on_wait=lambda: self._print_waiting(provisioning_id),
+        )
 
     def perform_login(
         self,
@@ -71,6 +308,9 @@ class TokenService:
         """
         Realiza login en el panel.
 
+        El login renueva el token en la base de datos, así que se descarta el
+        que hubiera en caché o en el almacén local para ese ID.
+
         Args:
             provisioning_id: ID de aprovisionamiento
             section: Sección del panel
@@ -79,30 +319,227 @@ class TokenService:
         Returns:
             Tupla (status, headers, body)
         """
-        return self.auth_service.perform_login(provisioning_id, section, locale)
+        try:
+            return self.auth_service.perform_login(provisioning_id, section, locale)
+        finally:
+            self.forget_token(provisioning_id)
+
+    @traced("token_service.refresh_token")
+    def refresh_token(
+        self,
+        provisioning_id: int | str,
+        wait_for_refresh: Optional[bool] = None,
+    ) -> str:
+        """
+        Hace login para forzar un token nuevo y lo obtiene de la BD sin tocar los archivos.
+
+        Las llamadas simultáneas con el mismo ID comparten un único login y
+        reciben el mismo token.
 
-    def auto_update(self, provisioning_id: int | str) -> str:
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            wait_for_refresh: Si se espera a que cambie ACUT_LAST_RESFRESH en lugar
+                de una pausa fija (por defecto, según la configuración)
+
+        Returns:
+            Token JWT con prefijo Bearer
+        """
+        annotate(provisioning_id=provisioning_id)
+        return self._refresh_flights.do(
+            flight_key(provisioning_id),
+            lambda: self._refresh_token(provisioning_id, wait_for_refresh),
+            on_wait=lambda: self._print_waiting(provisioning_id),
+        )
+
+    def _refresh_token(self, provisioning_id: int | str, wait_for_refresh: Optional[bool]) -> str:
+        """Login y lectura del token nuevo (sin agrupar llamadas)."""
+        if wait_for_refresh is None:
+            wait_for_refresh = self.config.auto_wait_for_refresh
+
+        if not wait_for_refresh:
+            self.perform_login(str(provisioning_id))
+            time.sleep(2)
+            token = self.get_token_from_database(provisioning_id, use_cache=False)
+            self.publish_refresh([provisioning_id])
+            return token
+
+        # Se compara con el refresco previo al login (no con la hora local)
+        # para no depender del desfase de reloj con SQL Server
+        state = self.repository.get_token_refresh_state(provisioning_id)
+        previous_refresh = state[0] if state else None
+
+        self.perform_login(str(provisioning_id))
+
+        username, token, _ = self.repository.wait_for_token_refresh(
+            provisioning_id,
+            previous_refresh,
+            timeout=self.config.auto_refresh_timeout,
+        )
+        self.remember_token(provisioning_id, username, token)
+        self.publish_refresh([provisioning_id])
+        return token
+
+    @traced("token_service.auto_update")
+    def auto_update(
+        self,
+        provisioning_id: int | str,
+        wait_for_refresh: Optional[bool] = None,
+    ) -> str:
         """
         Modo automático: hace login y obtiene el token de la BD.
 
+        Las llamadas simultáneas con el mismo ID comparten el login y la
+        escritura de los archivos.
+
         Args:
             provisioning_id: ID de aprovisionamiento
+            wait_for_refresh: Si se espera a que cambie ACUT_LAST_RESFRESH en lugar
+                de una pausa fija (por defecto, según la configuración)
 
         Returns:
             Token actualizado
         """
-        print("🤖 Modo automático activado")
-        print(f"📌 Provisioning ID: {provisioning_id}")
+        def update() -> str:
+            print("🤖 Modo automático activado")
+            print(f"📌 Provisioning ID: {provisioning_id}")
 
-        # Realizar login
-        self.perform_login(str(provisioning_id))
+            token = self.refresh_token(provisioning_id, wait_for_refresh)
+            self.file_manager.update_token(token)
 
-        # Obtener y actualizar token
-        import time
-        time.sleep(2)
-        token = self.update_token_from_database(provisioning_id)
+            print("✅ Token obtenido y actualizado correctamente")
+            return token
 
-        print("✅ Token obtenido y actualizado correctamente")
-        return token
+        annotate(provisioning_id=provisioning_id)
+        return self._auto_update_flights.do(
+            flight_key(provisioning_id),
+            update,
+            on_wait=lambda: self._print_waiting(provisioning_id),
+        )
+
+    def coalescing_stats(self) -> dict[str, dict]:
+        """Ejecuciones y llamadas deduplicadas de cada operación agrupada por ID."""
+        return {
+            flights.name: flights.stats()
+            for flights in (self._database_flights, self._refresh_flights, self._auto_update_flights)
+        }
+
+    @traced("token_service.auto_update_batch")
+    def auto_update_batch(
+        self,
+        provisioning_ids: list[int | str],
+        max_workers: Optional[int] = None,
+        wait_for_refresh: Optional[bool] = None,
+    ) -> list[AutoUpdateResult]:
+        """
+        Modo automático para varios IDs: logins en paralelo y lectura por lotes de la BD.
+
+        No modifica los archivos locales, ya que solo pueden contener un token.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+            max_workers: Logins simultáneos (por defecto, AUTO_WORKERS)
+            wait_for_refresh: Si se espera a que cambie ACUT_LAST_RESFRESH en lugar
+                de una pausa fija (por defecto, según la configuración)
+
+        Returns:
+            Resultado de cada ID, en el orden recibido
+        """
+        if wait_for_refresh is None:
+            wait_for_refresh = self.config.auto_wait_for_refresh
+        if max_workers is None:
+            max_workers = self.config.auto_workers
+
+        results: dict[str, AutoUpdateResult] = {}
+        for provisioning_id in provisioning_ids:
+            results.setdefault(str(provisioning_id).strip(), AutoUpdateResult(provisioning_id))
+
+        if not results:
+            return []
+
+        print(f"🤖 Modo automático por lotes: {len(results)} provisioning IDs ({max_workers} en paralelo)")
+        start = time.perf_counter()
+        ids = [result.provisioning_id for result in results.values()]
+
+        previous_refresh = {}
+        if wait_for_refresh:
+            try:
+                states = self.repository.get_token_refresh_states(ids)
+            except Exception as e:
+                return self._fail_results(results.values(), str(e))
+            previous_refresh = {provisioning_id: state[0] for provisioning_id, state in states.items()}
+
+        # Logins en paralelo
+        def login(provisioning_id) -> float:
+            login_start = time.perf_counter()
+            self.perform_login(str(provisioning_id))
+            return (time.perf_counter() - login_start) * 1000
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="token-login") as executor:
+            futures = {
+                executor.submit(in_current_context(login), result.provisioning_id): result
+                for result in results.values()
+            }
+            for future in as_completed(futures):
+                result = futures[future]
+                try:
+                    result.login_ms = future.result()
+                except Exception as e:
+                    result.error = str(e)
+                    result.total_ms = (time.perf_counter() - start) * 1000
+
+        logged_in = [result for result in results.values() if not result.error]
+        if not logged_in:
+            return list(results.values())
+
+        # Lectura de todos los tokens en lote
+        logged_ids = [result.provisioning_id for result in logged_in]
+        resolve_start = time.perf_counter()
+        try:
+            if wait_for_refresh:
+                resolved = self.repository.wait_for_tokens_refresh(
+                    logged_ids,
+                    previous_refresh,
+                    timeout=self.config.auto_refresh_timeout,
+                )
+            else:
+                time.sleep(2)
+                found, _ = self.repository.get_tokens_by_provisioning_ids(logged_ids)
+                waited = time.perf_counter() - resolve_start
+                resolved = {
+                    provisioning_id: (username, token, None, waited)
+                    for provisioning_id, (username, token) in found.items()
+                }
+        except Exception as e:
+            self._fail_results(logged_in, str(e))
+            return list(results.values())
+
+        for result in logged_in:
+            entry = resolved.get(result.provisioning_id)
+            if entry is None:
+                result.error = "No se encontró ningún token"
+                result.total_ms = (time.perf_counter() - start) * 1000
+                continue
+
+            result.username, result.token, result.refreshed, waited = entry
+            result.total_ms = (resolve_start - start + waited) * 1000
+
+        self.remember_tokens({
+            result.provisioning_id: (result.username, result.token)
+            for result in logged_in
+            if result.token
+        })
+        self.publish_refresh([result.provisioning_id for result in logged_in if result.token])
+        return list(results.values())
 
+    @staticmethod
+    def _fail_results(results, error: str) -> list[AutoUpdateResult]:
+        """Marca como fallidos los resultados indicados."""
+        results = list(results)
+        for result in results:
+            result.error = error
+        return results
 
+    @staticmethod
+    def _print_waiting(provisioning_id: int | str) -> None:
+        """Indica que la llamada espera a otra en curso con el mismo ID."""
+        print(f"⏳ Ya hay una petición en curso para provisioning ID {provisioning_id}; se comparte su resultado")
@@ -0,0 +1,276 @@
+"""
+Almacén persistente (SQLite) de los tokens obtenidos de SQL Server.
+
+Complementa a TokenCache: sobrevive a los reinicios, de modo que un proceso
+nuevo (servidor web, daemon o una ejecución corta de la CLI) puede servir
+los tokens aún vigentes sin volver a consultar SQL Server por la VPN.
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .metrics import TOKEN_STORE_PRUNED, TOKEN_STORE_REQUESTS
+from .token_cache import get_jwt_expiry
+from .tracing import annotate, traced
+
+
+class TokenStore:
+    """Tokens por provisioning ID en SQLite, con limpieza periódica de los caducados."""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS tokens (
+            provisioning_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            token TEXT NOT NULL,
+            exp REAL NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS tokens_exp ON tokens (exp)",
+    )
+
+    # Límite de variables por sentencia en versiones antiguas de SQLite
+    MAX_PARAMS = 900
+
+    def __init__(self, path: str | Path, expiry_margin: float = 60.0, prune_interval: float = 300.0):
+        """
+        Abre (o crea) el almacén.
+
+        Args:
+            path: Archivo SQLite (se crea el directorio si no existe)
+            expiry_margin: Segundos antes de `exp` a partir de los que el token
+                se considera caducado
+            prune_interval: Segundos entre limpiezas en segundo plano (0 las desactiva)
+        """
+        self.path = Path(path)
+        self.expiry_margin = expiry_margin
+        self.prune_interval = prune_interval
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Una sola conexión compartida: las operaciones son de una fila y muy cortas
+        self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Los tokens dan acceso al panel: solo el usuario puede leer el archivo
+        # (SQLite crea los archivos -wal y -shm con los mismos permisos)
+        os.chmod(self.path, 0o600)
+
+        with self._lock:
+            # WAL: varios procesos (web, daemon, CLI) pueden leer mientras otro escribe
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+
+        self.prune()
+
+        self._stop = threading.Event()
+        self._pruner: Optional[threading.Thread] = None
+        if prune_interval > 0:
+            self._pruner = threading.Thread(target=self._prune_loop, name="token-store-pruner", daemon=True)
+            self._pruner.start()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["TokenStore"]:
+        """
+        Crea el almacén con la configuración de la aplicación (TOKEN_STORE_*).
+
+        Returns:
+            Almacén o None si está desactivado o no se puede abrir
+        """
+        if not config.token_store_enabled:
+            return None
+        try:
+            return cls(
+                config.token_store_path,
+                expiry_margin=config.token_cache_expiry_margin,
+                prune_interval=config.token_store_prune_interval,
+            )
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️  No se pudo abrir el almacén de tokens {config.token_store_path}: {e}")
+            return None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+    @traced("token_store.get")
+    def get(self, provisioning_id: int | str) -> Optional[tuple[str, str]]:
+        """
+        Obtiene un token vigente del almacén.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+
+        Returns:
+            Tupla (username, token) o None si no está o está a punto de caducar
+        """
+        found = self.get_many([provisioning_id])
+        annotate(result="hit" if found else "miss")
+        return next(iter(found.values()), None)
+
+    def get_many(self, provisioning_ids: list[int | str]) -> dict[int | str, tuple[str, str]]:
+        """
+        Obtiene los tokens vigentes de varios IDs.
+
+        Args:
+            provisioning_ids: IDs de aprovisionamiento
+
+        Returns:
+            Mapa de cada ID encontrado (tal como se recibió) a (username, token)
+        """
+        keys: dict[str, int | str] = {}
+        for provisioning_id in provisioning_ids:
+            keys.setdefault(self._key(provisioning_id), provisioning_id)
+
+        rows = []
+        try:
+            with self._lock:
+                key_list = list(keys)
+                for i in range(0, len(key_list), self.MAX_PARAMS):
+                    chunk = key_list[i:i + self.MAX_PARAMS]
+                    placeholders = ", ".join("?" * len(chunk))
+                    rows.extend(self._conn.execute(
+                        f"SELECT provisioning_id, username, token, exp FROM tokens "
+                        f"WHERE provisioning_id IN ({placeholders})",
+                        chunk,
+                    ).fetchall())
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo leer el almacén de tokens: {e}")
+            TOKEN_STORE_REQUESTS.inc(len(keys), result="error")
+            return {}
+
+        now = time.time()
+        found = {}
+        for key, username, token, exp in rows:
+            if now >= exp - self.expiry_margin:
+                TOKEN_STORE_REQUESTS.inc(result="expired")
+                continue
+            found[keys[key]] = (username, token)
+
+        TOKEN_STORE_REQUESTS.inc(len(found), result="hit")
+        TOKEN_STORE_REQUESTS.inc(len(keys) - len(rows), result="miss")
+        return found
+
+    @traced("token_store.put")
+    def put(self, provisioning_id: int | str, username: str, token: str) -> bool:
+        """
+        Guarda un token si tiene claim `exp` y aún no está caducado.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+            username: Usuario del token
+            token: Token JWT
+
+        Returns:
+            True si el token se ha guardado
+        """
+        return self.put_many({provisioning_id: (username, token)}) == 1
+
+    def put_many(self, entries: dict[int | str, tuple[str, str]]) -> int:
+        """
+        Guarda varios tokens en una sola transacción.
+
+        Los tokens sin `exp` o ya caducados eliminan la entrada previa del ID.
+
+        Args:
+            entries: Mapa de ID a (username, token)
+
+        Returns:
+            Número de tokens guardados
+        """
+        now = time.time()
+        rows, stale = [], []
+        for provisioning_id, (username, token) in entries.items():
+            exp = get_jwt_expiry(token)
+            if exp is None or now >= exp - self.expiry_margin:
+                stale.append((self._key(provisioning_id),))
+            else:
+                rows.append((self._key(provisioning_id), username or "", token, exp, now))
+
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany("DELETE FROM tokens WHERE provisioning_id = ?", stale)
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO tokens (provisioning_id, username, token, exp, fetched_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo guardar en el almacén de tokens: {e}")
+            return 0
+
+        return len(rows)
+
+    def invalidate(self, provisioning_id: Optional[int | str] = None) -> None:
+        """
+        Elimina un token del almacén, o todos si no se indica ID.
+
+        Args:
+            provisioning_id: ID de aprovisionamiento
+        """
+        try:
+            with self._lock:
+                if provisioning_id is None:
+                    self._conn.execute("DELETE FROM tokens")
+                else:
+                    self._conn.execute("DELETE FROM tokens WHERE provisioning_id = ?", (self._key(provisioning_id),))
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo borrar del almacén de tokens: {e}")
+
+    def prune(self) -> int:
+        """
+        Elimina los tokens caducados (o dentro del margen de expiración).
+
+        Returns:
+            Número de filas eliminadas
+        """
+        try:
+            with self._lock:
+                deleted = self._conn.execute(
+                    "DELETE FROM tokens WHERE exp <= ?", (time.time() + self.expiry_margin,)
+                ).rowcount
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo limpiar el almacén de tokens: {e}")
+            return 0
+
+        if deleted:
+            TOKEN_STORE_PRUNED.inc(deleted)
+        return deleted
+
+    def stats(self) -> dict:
+        """Devuelve el tamaño del almacén y la expiración más próxima."""
+        with self._lock:
+            size, next_expiry = self._conn.execute("SELECT COUNT(*), MIN(exp) FROM tokens").fetchone()
+        return {"path": str(self.path), "size": size, "next_expiry": next_expiry}
+
+    def close(self) -> None:
+        """Detiene la limpieza en segundo plano y cierra la base de datos."""
+        self._stop.set()
+        if self._pruner is not None:
+            self._pruner.join(timeout=5)
+
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._conn.close()
+
+    def _prune_loop(self) -> None:
+        while not self._stop.wait(self.prune_interval):
+            self.prune()
+
+    @staticmethod
+    def _key(provisioning_id: int | str) -> str:
+        """Normaliza el provisioning ID usado como clave."""
+        return str(provisioning_id).strip()
@@ -0,0 +1,315 @@
+"""
+Formatos de archivo en los que se guarda el token.
+"""
+import json
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+from ..config.settings import AppConfig, TokenTargetConfig
+from .js_scanner import JsAssignment, find_string_assignment
+
+
+# Valor entre comillas de dotenv (admite comillas escapadas con `\`)
+_DOTENV_QUOTED = re.compile(r"""(["'])((?:\\.|(?!\1)[^\\])*)\1""")
+# Comentario tras un valor sin comillas: `#` precedido de espacios
+_DOTENV_COMMENT = re.compile(r"[ \t]+#")
+
+
+class TokenTarget(ABC):
+    """Archivo de destino del token con un formato concreto."""
+
+    kind = ""
+
+    def __init__(self, path: str | Path):
+        """
+        Inicializa el destino.
+
+        Args:
+            path: Ruta del archivo
+        """
+        self.path = Path(path)
+
+    @abstractmethod
+    def read_token(self, content: str, version: Optional[tuple] = None) -> str:
+        """
+        Extrae el token del contenido del archivo.
+
+        Args:
+            content: Contenido del archivo
+            version: Stat (inodo, tamaño, mtime) del archivo leído, si se conoce
+
+        Returns:
+            Token o cadena vacía si no está
+        """
+
+    @abstractmethod
+    def render(self, content: str, new_token: str, version: Optional[tuple] = None) -> Optional[str]:
+        """
+        Genera el contenido del archivo con el nuevo token.
+
+        Args:
+            content: Contenido actual del archivo
+            new_token: Token a guardar
+            version: Stat del archivo si `content` es su contenido sin modificar
+
+        Returns:
+            Nuevo contenido, o None si el archivo ya contiene el token
+
+        Raises:
+            RuntimeError: Si el contenido no tiene el formato esperado
+        """
+
+    def written(self, content: str, version: tuple) -> None:
+        """
+        Avisa de que se ha escrito el archivo.
+
+        Args:
+            content: Contenido escrito
+            version: Stat del archivo tras la escritura
+        """
+
+    def describe(self) -> str:
+        """Descripción legible del destino."""
+        return f"{self.path} ({self.kind})"
+
+
+class JsonTokenTarget(TokenTarget):
+    """Token guardado en una clave (posiblemente anidada) de un JSON."""
+
+    kind = "json"
+
+    def __init__(self, path: str | Path, key_path: str = "dev.panel_token"):
+        """
+        Inicializa el destino.
+
+        Args:
+            path: Ruta del archivo
+            key_path: Ruta de claves separadas por puntos
+        """
+        super().__init__(path)
+        self.keys = key_path.split(".")
+
+    def read_token(self, content: str, version: Optional[tuple] = None) -> str:
+        """Valor de la clave anidada, o cadena vacía si falta o no es texto."""
+        data = json.loads(content)
+        for key in self.keys:
+            if not isinstance(data, dict):
+                return ""
+            data = data.get(key, {})
+        return data if isinstance(data, str) else ""
+
+    def render(self, content: str, new_token: str, version: Optional[tuple] = None) -> Optional[str]:
+        """Vuelca el JSON con la clave actualizada, creando los objetos intermedios."""
+        data = json.loads(content)
+
+        node = data
+        for key in self.keys[:-1]:
+            node = node.setdefault(key, {})
+            if not isinstance(node, dict):
+                raise RuntimeError(f'La clave "{key}" de {self.path.name} no es un objeto')
+
+        if node.get(self.keys[-1]) == new_token:
+            return None
+
+        node[self.keys[-1]] = new_token
+        return json.dumps(data, indent=2, ensure_ascii=False)
+
+    def describe(self) -> str:
+        """Ruta y claves del destino."""
+        return f"{self.path} (json: {'.'.join(self.keys)})"
+
+
+class JsTokenTarget(TokenTarget):
+    """
+    Token guardado en una asignación `const/let/var <variable> = "..."`.
+
+    La asignación se localiza con un escáner léxico lineal (ignora comentarios,
+    cadenas y templates) y el token se sustituye en su posición sin tocar el
+    resto del archivo. La posición se recuerda por versión del archivo, así
+    que con el archivo sin cambios externos no se vuelve a recorrer.
+    """
+
+    kind = "js"
+
+    def __init__(self, path: str | Path, variable: str = "auth"):
+        """
+        Inicializa el destino.
+
+        Args:
+            path: Ruta del archivo
+            variable: Nombre de la variable JavaScript
+        """
+        super().__init__(path)
+        self.variable = variable
+        # (versión del archivo, posición de la asignación)
+        self._located: Optional[tuple[tuple, JsAssignment]] = None
+        # (contenido generado por render(), posición de la asignación en él)
+        self._rendered: Optional[tuple[str, JsAssignment]] = None
+
+    def read_token(self, content: str, version: Optional[tuple] = None) -> str:
+        """Cadena asignada a la variable, o cadena vacía si no hay asignación."""
+        assignment = self._locate(content, version)
+        return assignment.value(content) if assignment else ""
+
+    def render(self, content: str, new_token: str, version: Optional[tuple] = None) -> Optional[str]:
+        """Sustituye la cadena asignada sin tocar el resto del archivo."""
+        assignment = self._locate(content, version)
+        if assignment is None:
+            raise RuntimeError(
+                f'No se encontró una asignación a "{self.variable}" en {self.path.name} '
+                f'(const/let/var {self.variable} = "...")'
+            )
+
+        if assignment.value(content) == new_token:
+            return None
+
+        new_content, new_assignment = assignment.replace(content, new_token)
+        self._rendered = (new_content, new_assignment)
+        return new_content
+
+    def written(self, content: str, version: tuple) -> None:
+        """Recuerda la posición de la asignación para la versión escrita."""
+        rendered, self._rendered = self._rendered, None
+        if rendered is not None and rendered[0] is content:
+            self._located = (version, rendered[1])
+
+    def _locate(self, content: str, version: Optional[tuple]) -> Optional[JsAssignment]:
+        """Posición de la asignación, recorriendo el contenido solo si la versión es otra."""
+        located = self._located
+        if version is not None and located and located[0] == version and located[1].matches(content):
+            return located[1]
+
+        assignment = find_string_assignment(content, self.variable)
+        if version is not None and assignment is not None:
+            self._located = (version, assignment)
+        return assignment
+
+    def describe(self) -> str:
+        """Ruta y variable del destino."""
+        return f"{self.path} (js: {self.variable})"
+
+
+def _split_dotenv_value(raw: str) -> tuple[str, str]:
+    """
+    Separa el valor de una línea `CLAVE=valor` de su comentario final.
+
+    Como en python-dotenv, un valor entre comillas termina en la comilla de
+    cierre y, sin comillas, `#` precedido de espacios abre un comentario.
+
+    Args:
+        raw: Texto que sigue al `=` (sin espacios al principio ni al final)
+
+    Returns:
+        Tupla (valor sin comillas, resto de la línea tras el valor)
+    """
+    quoted = _DOTENV_QUOTED.match(raw)
+    if quoted:
+        return quoted.group(2), raw[quoted.end():]
+
+    comment = _DOTENV_COMMENT.search(raw)
+    if comment:
+        return raw[:comment.start()], raw[comment.start():]
+    return raw, ""
+
+
+class DotenvTokenTarget(TokenTarget):
+    """Token guardado en una variable de un archivo .env."""
+
+    kind = "dotenv"
+
+    def __init__(self, path: str | Path, key: str = "PANEL_TOKEN"):
+        """
+        Inicializa el destino.
+
+        Args:
+            path: Ruta del archivo
+            key: Nombre de la variable
+        """
+        super().__init__(path)
+        self.key = key
+        self._pattern = re.compile(
+            rf'^([ \t]*(?:export[ \t]+)?{re.escape(key)}[ \t]*=)[ \t]*(.*?)[ \t]*$',
+            re.MULTILINE,
+        )
+
+    def read_token(self, content: str, version: Optional[tuple] = None) -> str:
+        """Valor de la variable sin comillas ni comentario final."""
+        match = self._pattern.search(content)
+        if not match:
+            return ""
+        return _split_dotenv_value(match.group(2))[0]
+
+    def render(self, content: str, new_token: str, version: Optional[tuple] = None) -> Optional[str]:
+        """Sustituye el valor conservando el comentario final, o añade la variable al final."""
+        if self.read_token(content) == new_token:
+            return None
+
+        line = f'{self.key}="{new_token}"'
+        new_content, num_replacements = self._pattern.subn(
+            lambda m: f'{m.group(1)}"{new_token}"{_split_dotenv_value(m.group(2))[1]}',
+            content,
+            count=1,
+        )
+
+        if num_replacements:
+            return new_content
+
+        if content and not content.endswith("\n"):
+            content += "\n"
+        return f"{content}{line}\n"
+
+    def describe(self) -> str:
+        """Ruta y variable del destino."""
+        return f"{self.path} (dotenv: {self.key})"
+
+
+TARGET_TYPES: dict[str, type[TokenTarget]] = {
+    JsonTokenTarget.kind: JsonTokenTarget,
+    JsTokenTarget.kind: JsTokenTarget,
+    DotenvTokenTarget.kind: DotenvTokenTarget,
+}
+
+
+def create_token_target(config: TokenTargetConfig) -> TokenTarget:
+    """
+    Crea el destino correspondiente a una entrada de configuración.
+
+    Args:
+        config: Tipo, ruta y opción del destino
+
+    Returns:
+        Destino del token
+
+    Raises:
+        ValueError: Si el tipo no está soportado
+    """
+    target_type = TARGET_TYPES.get(config.kind)
+    if target_type is None:
+        raise ValueError(f"Tipo de destino no soportado: {config.kind}")
+
+    if config.option:
+        return target_type(config.path, config.option)
+    return target_type(config.path)
+
+
+def build_token_targets(config: AppConfig) -> list[TokenTarget]:
+    """
+    Construye la lista de destinos de la aplicación.
+
+    Los archivos JSON_PATH y JS_PATH van siempre primero, seguidos de los
+    definidos en TOKEN_TARGETS.
+
+    Args:
+        config: Configuración de la aplicación
+
+    Returns:
+        Destinos del token en orden de prioridad de lectura
+    """
+    targets: list[TokenTarget] = [
+        JsonTokenTarget(config.json_path),
+        JsTokenTarget(config.js_path),
+    ]
+    targets.extend(create_token_target(target) for target in config.token_targets)
+    return targets
@@ -0,0 +1,366 @@
+"""
+Trazas opcionales de cada petición web o ejecución de --auto.
+
+Cada traza es un árbol de spans (login, conexión y consultas a la BD,
+escritura de archivos...) con su duración, que se escribe como una línea
+JSON en un archivo rotativo. Opcionalmente se guarda además un volcado de
+cProfile por traza.
+
+Sin un Tracer configurado (TRACE_ENABLED / --profile), `span()` y `traced()`
+no hacen nada salvo consultar una ContextVar.
+
+Lectura offline de las trazas:
+    python3 -m src.services.tracing traces/traces.jsonl [--last N] [--slowest N]
+"""
+import argparse
+import contextvars
+import cProfile
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+
+class Span:
+    """Operación medida dentro de una traza."""
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.error = ""
+        self.children: list[Span] = []
+
+    def finish(self) -> None:
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def to_dict(self, origin: float) -> dict:
+        """
+        Serializa el span y sus hijos.
+
+        Args:
+            origin: perf_counter del inicio de la traza (para los desplazamientos)
+        """
+        data = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "thread": self.thread,
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            # Los hijos de hilos distintos pueden terminar en cualquier orden
+            data["children"] = [
+                child.to_dict(origin) for child in sorted(list(self.children), key=lambda s: s.start)
+            ]
+        return data
+
+
+# Span en curso del contexto actual (hilo o tarea de asyncio)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("token_helper_span", default=None)
+
+# Tracer activo del proceso
+_tracer: Optional["Tracer"] = None
+
+
+class Tracer:
+    """Registra trazas en un archivo JSON lines rotativo."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        profile: bool = False,
+        max_profiles: int = 100,
+    ):
+        """
+        Inicializa el tracer.
+
+        Args:
+            path: Archivo de trazas (se crea el directorio si no existe)
+            max_bytes: Tamaño a partir del cual se rota el archivo
+            backup_count: Archivos rotados que se conservan
+            profile: Si se guarda un volcado de cProfile por traza
+            max_profiles: Volcados de cProfile que se conservan
+        """
+        self.path = Path(path)
+        self.profile = profile
+        self.max_profiles = max_profiles
+        self.profile_dir = self.path.parent / "profiles"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if profile:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+
+        self._handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.getLogger(f"token_helper.trace.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(self._handler)
+
+        # cProfile no admite dos perfiles activos a la vez en el proceso
+        self._profile_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "Tracer":
+        """Crea el tracer con la configuración de la aplicación (TRACE_*)."""
+        return cls(
+            config.trace_file,
+            max_bytes=config.trace_max_bytes,
+            backup_count=config.trace_backup_count,
+            profile=config.trace_profile,
+            max_profiles=config.trace_max_profiles,
+        )
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Abre una traza nueva; los spans del contexto quedan por debajo de ella.
+
+        Args:
+            name: Nombre de la operación raíz
+            **attributes: Atributos de la raíz
+
+        Yields:
+            Span raíz
+        """
+        root = Span(name, attributes)
+        trace_id = uuid.uuid4().hex[:16]
+        started_at = datetime.now().isoformat(timespec="milliseconds")
+        token = _current_span.set(root)
+
+        profiler = None
+        if self.profile and self._profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Otro perfilador ajeno está activo
+                self._profile_lock.release()
+                profiler = None
+
+        try:
+            yield root
+        except BaseException as e:
+            root.error = _describe(e)
+            raise
+        finally:
+            root.finish()
+            _current_span.reset(token)
+
+            profile_path = ""
+            if profiler is not None:
+                profiler.disable()
+                self._profile_lock.release()
+                profile_path = self._dump_profile(profiler, trace_id)
+
+            self._write({
+                "trace_id": trace_id,
+                "started_at": started_at,
+                "profile": profile_path,
+                **root.to_dict(root.start),
+            })
+
+    def close(self) -> None:
+        """Cierra el archivo de trazas."""
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+    def _write(self, data: dict) -> None:
+        try:
+            self._logger.info(json.dumps(data, ensure_ascii=False, default=str))
+        except Exception as e:
+            print(f"⚠️  No se pudo escribir la traza: {e}")
+
+    def _dump_profile(self, profiler: cProfile.Profile, trace_id: str) -> str:
+        """Guarda el volcado de cProfile y elimina los más antiguos."""
+        path = self.profile_dir / f"{datetime.now():%Y%m%d-%H%M%S}-{trace_id}.prof"
+        try:
+            profiler.dump_stats(path)
+            profiles = sorted(self.profile_dir.glob("*.prof"))
+            for old in profiles[:max(0, len(profiles) - self.max_profiles)]:
+                old.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el perfil: {e}")
+            return ""
+        return str(path)
+
+
+def configure(tracer: Optional[Tracer]) -> None:
+    """Activa (o desactiva con None) el tracer del proceso."""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    if previous is not None and previous is not tracer:
+        previous.close()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Tracer activo o None si las trazas están desactivadas."""
+    return _tracer
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Abre una traza con el tracer activo; sin tracer no hace nada.
+
+    Dentro de otra traza se comporta como `span()`.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield None
+    elif _current_span.get() is not None:
+        with span(name, **attributes) as current:
+            yield current
+    else:
+        with tracer.trace(name, **attributes) as root:
+            yield root
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Mide una operación como hija del span en curso; fuera de una traza no hace nada.
+
+    Args:
+        name: Nombre de la operación
+        **attributes: Atributos del span
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    current = Span(name, attributes)
+    parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = _describe(e)
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+
+
+def traced(name: str) -> Callable:
+    """Decorador que mide la función como un span (sin coste fuera de una traza)."""
+    def decorator(function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await function(*args, **kwargs)
+                with span(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attributes) -> None:
+    """Añade atributos al span en curso, si lo hay."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def in_current_context(function: Callable) -> Callable:
+    """
+    Envuelve una función para ejecutarla en otro hilo dentro del contexto actual.
+
+    Los hilos de un ThreadPoolExecutor no heredan las ContextVar, así que sin
+    esto sus spans quedarían fuera de la traza.
+    """
+    if _current_span.get() is None:
+        return function
+    return functools.partial(contextvars.copy_context().run, function)
+
+
+def _describe(error: BaseException, limit: int = 2000) -> str:
+    """Tipo y mensaje completo del error (algunos mensajes ocupan varias líneas)."""
+    message = str(error).strip()
+    text = f"{type(error).__name__}: {message}" if message else type(error).__name__
+    return text[:limit]
+
+
+def _summarize_error(error: str, limit: int = 200) -> str:
+    """Error en una línea, sin los separadores decorativos."""
+    lines = [re.sub(r"={3,}", "", line).strip() for line in error.splitlines()]
+    summary = " ".join(line for line in lines if line)
+    return summary if len(summary) <= limit else summary[:limit - 1] + "…"
+
+
+def format_trace(data: dict) -> str:
+    """Representa una traza como un árbol de texto con duraciones."""
+    lines = [
+        f"{data.get('started_at', '')}  {data['name']}  {data.get('duration_ms') or 0:.1f} ms"
+        f"  [{data.get('trace_id', '')}]"
+    ]
+    if data.get("error"):
+        lines.append(f"  ❌ {_summarize_error(data['error'])}")
+    if data.get("profile"):
+        lines.append(f"  perfil: {data['profile']}")
+
+    def walk(node: dict, depth: int) -> None:
+        attributes = " ".join(f"{key}={value}" for key, value in node.get("attributes", {}).items())
+        error = f"  ❌ {_summarize_error(node['error'])}" if node.get("error") else ""
+        lines.append(
+            f"{'  ' * depth}{node.get('duration_ms') or 0:9.1f} ms  +{node['offset_ms']:.1f}  "
+            f"{node['name']} {attributes}{error}".rstrip()
+        )
+        for child in node.get("children", []):
+            walk(child, depth + 1)
+
+    for child in data.get("children", []):
+        walk(child, 1)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Muestra las trazas guardadas con TRACE_ENABLED o --profile")
+    parser.add_argument("path", help="Archivo de trazas (JSON lines)")
+    parser.add_argument("--last", type=int, default=10, metavar="N", help="Últimas N trazas")
+    parser.add_argument("--slowest", type=int, metavar="N", help="Las N trazas más lentas")
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        traces = [json.loads(line) for line in f if line.strip()]
+
+    if args.slowest:
+        selected = sorted(traces, key=lambda data: data.get("duration_ms") or 0, reverse=True)[:args.slowest]
+    else:
+        selected = traces[-args.last:]
+
+    for data in selected:
+        print(format_trace(data))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Endpoints JSON para scripts y plugins de editor.
+"""
+import hashlib
+import json
+import urllib.parse
+from typing import Any, Optional
+
+from .static_assets import gzip_etag
+
+
+API_PREFIX = "/api/"
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+def compute_etag(value: str) -> str:
+    """
+    Calcula el ETag (fuerte) de un valor.
+
+    Args:
+        value: Contenido de la respuesta
+
+    Returns:
+        ETag entrecomillado
+    """
+    return '"' + hashlib.sha256(value.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+class TokenApiMixin:
+    """
+    Endpoints JSON del manejador HTTP.
+
+    - GET  /api/token                 Token actual de los archivos
+    - GET  /api/token/<id>            Token de la BD para un provisioning ID
+    - POST /api/refresh               {"provisioning_id": ..., "login": false}
+    - POST /api/refresh/batch         {"provisioning_ids": [...], "login": false}
+
+    Las respuestas GET llevan ETag y devuelven 304 sin cuerpo si coincide con
+    If-None-Match.
+    """
+
+    def handle_api_get(self, path: str) -> None:
+        """Atiende un GET bajo /api/."""
+        # Se separa antes de decodificar para que un %2F no cree otro segmento
+        parts = [urllib.parse.unquote(part) for part in path[len(API_PREFIX):].split("/") if part]
+
+        if parts == ["token"]:
+            token = self.token_service.get_current_token()
+            self._send_json_with_etag({"token": token}, token)
+        elif len(parts) == 2 and parts[0] == "token":
+            provisioning_id = self._parse_provisioning_id(parts[1])
+            try:
+                token = self.token_service.get_token_from_database(provisioning_id)
+            except Exception as e:
+                self.send_json(502, {"error": str(e).strip()})
+                return
+            self._send_json_with_etag({"provisioning_id": provisioning_id, "token": token}, token)
+        else:
+            self.send_json(404, {"error": f"Ruta no encontrada: {path}"})
+
+    def handle_api_post(self, path: str, body: bytes) -> None:
+        """Atiende un POST bajo /api/."""
+        try:
+            data = json.loads(body or b"{}")
+            if not isinstance(data, dict):
+                raise ValueError("se esperaba un objeto JSON")
+        except ValueError as e:
+            self.send_json(400, {"error": f"JSON no válido: {e}"})
+            return
+
+        login = bool(data.get("login", False))
+
+        if path.rstrip("/") == "/api/refresh":
+            self._api_refresh(data, login)
+        elif path.rstrip("/") == "/api/refresh/batch":
+            self._api_refresh_batch(data, login)
+        else:
+            self.send_json(404, {"error": f"Ruta no encontrada: {path}"})
+
+    def _api_refresh(self, data: dict, login: bool) -> None:
+        """Obtiene el token de un ID (con login previo si se pide) y actualiza los archivos."""
+        raw_id = str(data.get("provisioning_id", "")).strip()
+        if not raw_id:
+            self.send_json(400, {"error": "Falta provisioning_id"})
+            return
+
+        provisioning_id = self._parse_provisioning_id(raw_id)
+        try:
+            if login:
+                token = self.token_service.auto_update(provisioning_id)
+            else:
+                token = self.token_service.update_token_from_database(provisioning_id)
+        except Exception as e:
+            self.send_json(502, {"error": str(e).strip()})
+            return
+
+        self.send_json(200, {"provisioning_id": provisioning_id, "token": token}, compute_etag(token))
+
+    def _api_refresh_batch(self, data: dict, login: bool) -> None:
+        """Obtiene los tokens de varios IDs sin modificar los archivos locales."""
+        raw_ids = data.get("provisioning_ids")
+        if not isinstance(raw_ids, list) or not raw_ids:
+            self.send_json(400, {"error": "provisioning_ids debe ser una lista no vacía"})
+            return
+
+        provisioning_ids = [self._parse_provisioning_id(str(value).strip()) for value in raw_ids]
+
+        if login:
+            results = self.token_service.auto_update_batch(provisioning_ids)
+            payload = {
+                "results": [
+                    {
+                        "provisioning_id": result.provisioning_id,
+                        "ok": result.ok,
+                        "token": result.token,
+                        "refreshed": result.refreshed,
+                        "login_ms": round(result.login_ms, 1),
+                        "total_ms": round(result.total_ms, 1),
+                        "error": result.error.strip(),
+                    }
+                    for result in results
+                ]
+            }
+            self.send_json(200, payload)
+            return
+
+        try:
+            tokens, missing = self.token_service.get_tokens_by_provisioning_ids(provisioning_ids)
+        except Exception as e:
+            self.send_json(502, {"error": str(e).strip()})
+            return
+
+        self.send_json(200, {
+            "tokens": {str(key): token for key, token in tokens.items()},
+            "missing": missing,
+        })
+
+    def _send_json_with_etag(self, payload: dict, etag_source: str) -> None:
+        """Envía la respuesta o un 304 si el cliente ya tiene esta versión."""
+        etag = compute_etag(etag_source)
+        body = self._json_body(payload)
+        # La variante comprimida tiene su propio ETag
+        variant_etag = gzip_etag(etag) if self._uses_gzip(JSON_CONTENT_TYPE, len(body)) else etag
+        if self._etag_matches(variant_etag):
+            self.send_response(304)
+            self.send_header("ETag", variant_etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        self.send_body(200, JSON_CONTENT_TYPE, body, {"Cache-Control": "no-cache", "ETag": etag})
+
+    def _etag_matches(self, etag: str) -> bool:
+        """Comprueba la cabecera If-None-Match."""
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        if header.strip() == "*":
+            return True
+
+        candidates = [value.strip() for value in header.split(",")]
+        # Comparación débil: W/"x" equivale a "x"
+        return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+    def send_json(self, status: int, payload: Any, etag: Optional[str] = None) -> None:
+        """
+        Envía una respuesta JSON.
+
+        Args:
+            status: Código HTTP
+            payload: Datos serializables a JSON
+            etag: ETag de la respuesta
+        """
+        headers = {"Cache-Control": "no-cache"}
+        if etag:
+            headers["ETag"] = etag
+        self.send_body(status, JSON_CONTENT_TYPE, self._json_body(payload), headers)
+
+    @staticmethod
+    def _json_body(payload: Any) -> bytes:
+        """Serializa la respuesta a JSON en UTF-8 (sin escapar los caracteres no ASCII)."""
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def _parse_provisioning_id(value: str) -> int | str:
+        """Convierte el ID a entero si es posible, como el formulario web."""
+        try:
+            return int(value)
+        except ValueError:
+            return value
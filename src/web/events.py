@@ -0,0 +1,230 @@
+"""
+Stream de eventos (Server-Sent Events) de cambios de token para la interfaz web.
+"""
+import selectors
+import socket
+import threading
+import time
+from typing import Optional
+
+from ..services.metrics import WEB_EVENT_CLIENTS
+from ..services.token_events import TokenEvent, TokenEventHub
+
+
+EVENTS_PATH = "/events"
+
+# Milisegundos que espera el navegador antes de reconectar
+RETRY_MS = 3000
+
+
+class _Client:
+    """Conexión SSE y los bytes pendientes de enviarle."""
+
+    def __init__(self, sock: socket.socket, last_id: int):
+        self.sock = sock
+        self.last_id = last_id
+        self.buffer = bytearray()
+
+
+class EventStream:
+    """
+    Reparte los eventos del TokenEventHub a los navegadores conectados.
+
+    Todas las conexiones las atiende un único hilo con `selectors`: una vez
+    enviadas las cabeceras, el manejador HTTP entrega el socket y libera su
+    hilo del pool, de modo que las pestañas abiertas no lo agotan.
+    """
+
+    def __init__(
+        self,
+        hub: TokenEventHub,
+        heartbeat_interval: float = 15.0,
+        max_clients: int = 50,
+        max_buffer_bytes: int = 256 * 1024,
+    ):
+        """
+        Inicializa el stream.
+
+        Args:
+            hub: Origen de los eventos
+            heartbeat_interval: Segundos entre comentarios de keep-alive (detectan
+                clientes desconectados y evitan cortes de proxies)
+            max_clients: Conexiones simultáneas admitidas
+            max_buffer_bytes: Bytes pendientes a partir de los que se desconecta
+                a un cliente que no lee
+        """
+        self.hub = hub
+        self.heartbeat_interval = heartbeat_interval
+        self.max_clients = max_clients
+        self.max_buffer_bytes = max_buffer_bytes
+
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+        self._clients: dict[socket.socket, _Client] = {}
+        self._new_clients: list[tuple[_Client, bytes]] = []
+        self._new_events: list[TokenEvent] = []
+        self._pending_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def has_capacity(self) -> bool:
+        """Indica si se admite otro cliente."""
+        with self._pending_lock:
+            return len(self._clients) + len(self._new_clients) < self.max_clients
+
+    def start(self) -> None:
+        """Arranca el hilo del stream y se suscribe al hub."""
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self.hub.subscribe(self._on_event)
+        self._thread = threading.Thread(target=self._run, name="web-events", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Cierra todas las conexiones y detiene el hilo."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.hub.unsubscribe(self._on_event)
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def add_client(self, sock: socket.socket, last_id: int, initial: bytes = b"") -> None:
+        """
+        Entrega una conexión cuyas cabeceras ya se han enviado.
+
+        Args:
+            sock: Socket del cliente (el stream pasa a ser su dueño)
+            last_id: Último evento que tiene el cliente; se le reenvían los posteriores
+            initial: Bytes que se envían antes que cualquier evento
+        """
+        with self._pending_lock:
+            self._new_clients.append((_Client(sock, last_id), initial))
+        self._wake()
+
+    def _on_event(self, event: TokenEvent) -> None:
+        """Callback del hub (hilo que publica): encola el evento."""
+        with self._pending_lock:
+            self._new_events.append(event)
+        self._wake()
+
+    def _wake(self) -> None:
+        try:
+            self._wake_w.send(b"x")
+        except (BlockingIOError, OSError):
+            # El búfer lleno ya garantiza que el hilo se despertará
+            pass
+
+    def _run(self) -> None:
+        next_heartbeat = time.monotonic() + self.heartbeat_interval
+        try:
+            while not self._stopped:
+                timeout = max(0.0, next_heartbeat - time.monotonic())
+                for key, mask in self._selector.select(timeout):
+                    if key.fileobj is self._wake_r:
+                        self._drain_wake()
+                    elif mask & selectors.EVENT_READ:
+                        self._read(key.data)
+                    elif mask & selectors.EVENT_WRITE:
+                        self._flush(key.data)
+
+                self._process_pending()
+
+                if time.monotonic() >= next_heartbeat:
+                    next_heartbeat = time.monotonic() + self.heartbeat_interval
+                    for client in list(self._clients.values()):
+                        self._send(client, b": ping\n\n")
+        finally:
+            for client in list(self._clients.values()):
+                self._drop(client)
+            self._selector.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def _drain_wake(self) -> None:
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _process_pending(self) -> None:
+        """Registra los clientes nuevos y reparte los eventos encolados."""
+        with self._pending_lock:
+            new_clients, self._new_clients = self._new_clients, []
+            events, self._new_events = self._new_events, []
+
+        for client, initial in new_clients:
+            client.sock.setblocking(False)
+            self._clients[client.sock] = client
+            self._selector.register(client.sock, selectors.EVENT_READ, client)
+            # Los eventos publicados desde que el cliente pidió la conexión
+            missed = self.hub.since(client.last_id) or []
+            self._send(client, initial + b"".join(event.encode() for event in missed))
+            if missed:
+                client.last_id = missed[-1].id
+
+        WEB_EVENT_CLIENTS.set(len(self._clients))
+
+        for event in events:
+            payload = event.encode()
+            for client in list(self._clients.values()):
+                if event.id > client.last_id:
+                    client.last_id = event.id
+                    self._send(client, payload)
+
+    def _send(self, client: _Client, data: bytes) -> None:
+        """Añade datos al búfer del cliente y envía lo que admita el socket."""
+        if client.sock not in self._clients:
+            return
+        client.buffer.extend(data)
+        if len(client.buffer) > self.max_buffer_bytes:
+            # El cliente no lee: se desconecta y el navegador reconectará
+            self._drop(client)
+            return
+        self._flush(client)
+
+    def _flush(self, client: _Client) -> None:
+        try:
+            while client.buffer:
+                sent = client.sock.send(client.buffer)
+                del client.buffer[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(client)
+            return
+
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.buffer else 0)
+        self._selector.modify(client.sock, events, client)
+
+    def _read(self, client: _Client) -> None:
+        """El navegador no envía nada más: datos vacíos o error indican cierre."""
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+
+    def _drop(self, client: _Client) -> None:
+        if self._clients.pop(client.sock, None) is None:
+            return
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            client.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client.sock.close()
+        WEB_EVENT_CLIENTS.set(len(self._clients))
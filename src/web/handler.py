@@ -1,36 +1,324 @@
 """
 Manejador HTTP para el servidor web.
 """
+import gzip
 import http.server
+import threading
 import urllib.parse
 from typing import Optional
 
+from ..services import tracing
+from ..services.metrics import REGISTRY, WEB_RESPONSE_BYTES, WEB_REUSED_CONNECTIONS
 from ..services.token_service import TokenService
+from ..services.token_cache import get_jwt_expiry
+from ..services.token_events import TokenEvent
+from .api import API_PREFIX, TokenApiMixin
+from .events import EVENTS_PATH, RETRY_MS, EventStream
+from .static_assets import STATIC_PREFIX, StaticAssets, gzip_etag, is_compressible
 from .template_renderer import TemplateRenderer
 
 
-class TokenRequestHandler(http.server.BaseHTTPRequestHandler):
+class TokenRequestHandler(TokenApiMixin, http.server.BaseHTTPRequestHandler):
     """Manejador de peticiones HTTP para la interfaz web."""
 
+    # Conexiones persistentes: toda respuesta lleva Content-Length
+    protocol_version = "HTTP/1.1"
+
     # Variables de clase compartidas
     token_service: TokenService = None
     renderer: TemplateRenderer = None
+    assets: StaticAssets = None
+    events: Optional[EventStream] = None
+    _services_lock = threading.Lock()
+
+    # Segundos máximos de inactividad de un cliente antes de liberar el hilo
+    timeout = 30
+
+    # Segundos que una conexión keep-alive puede esperar la siguiente petición;
+    # mientras tanto ocupa un hilo del pool
+    keepalive_timeout = 5.0
+
+    # Peticiones por conexión antes de cerrarla
+    keepalive_max_requests = 100
+    _last_request = False
+
+    # Respuestas más pequeñas no compensan el coste de gzip
+    gzip_min_bytes = 512
+
+    # Caché de los recursos pedidos con su versión en la URL (?v=...)
+    immutable_cache_control = "public, max-age=31536000, immutable"
 
     def __init__(self, *args, **kwargs):
         """Inicializa el manejador."""
+        # Cada petición trabaja con una instantánea coherente de los servicios
+        with self._services_lock:
+            self.token_service = type(self).token_service
+            self.renderer = type(self).renderer
+            self.assets = type(self).assets
+            self.events = type(self).events
         super().__init__(*args, **kwargs)
 
+    @classmethod
+    def configure(
+        cls,
+        token_service: TokenService,
+        renderer: TemplateRenderer,
+        assets: Optional[StaticAssets] = None,
+        keepalive_timeout: Optional[float] = None,
+        events: Optional[EventStream] = None,
+        keepalive_max_requests: Optional[int] = None,
+    ) -> None:
+        """
+        Establece los servicios compartidos por todas las peticiones.
+
+        Args:
+            token_service: Servicio de tokens
+            renderer: Renderizador de templates
+            assets: Recursos estáticos (por defecto, los de web/static)
+            keepalive_timeout: Segundos de espera de la siguiente petición en
+                una conexión persistente (0 la cierra tras cada respuesta)
+            events: Stream de eventos de /events (sin él, /events responde 404)
+            keepalive_max_requests: Peticiones por conexión persistente antes de cerrarla
+        """
+        with cls._services_lock:
+            cls.token_service = token_service
+            cls.renderer = renderer
+            cls.assets = assets or StaticAssets()
+            cls.events = events
+            if keepalive_timeout is not None:
+                cls.keepalive_timeout = keepalive_timeout
+            if keepalive_max_requests is not None:
+                cls.keepalive_max_requests = keepalive_max_requests
+
+    def handle(self):
+        """Atiende las peticiones de la conexión mientras el cliente la mantenga abierta."""
+        self.close_connection = True
+        handled = 0
+
+        while True:
+            self._last_request = handled + 1 >= self.keepalive_max_requests
+            self.handle_one_request()
+            handled += 1
+            if self.close_connection or self._last_request or not self._wait_for_next_request():
+                break
+            WEB_REUSED_CONNECTIONS.inc()
+
+    def _wait_for_next_request(self) -> bool:
+        """
+        Espera como máximo keepalive_timeout a que llegue otra petición.
+
+        Si el pool anda escaso de hilos, la conexión se cierra sin esperar
+        para no dejar sin hilo a las peticiones nuevas.
+
+        Returns:
+            True si hay datos que leer; False si el cliente cerró o no envió nada
+        """
+        if self.keepalive_timeout <= 0 or not self.server.keepalive_allowed():
+            return False
+
+        self.connection.settimeout(self.keepalive_timeout)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
     def do_GET(self):
         """Maneja peticiones GET."""
-        self.render_page()
+        parts = urllib.parse.urlsplit(self.path)
+        path = parts.path
+        if path.startswith(STATIC_PREFIX):
+            self.send_static(path[len(STATIC_PREFIX):], parts.query)
+            return
+        if path == "/metrics":
+            self.send_metrics()
+            return
+        if path == EVENTS_PATH:
+            self.send_event_stream()
+            return
+
+        with tracing.trace(f"GET {path}"):
+            if path.startswith(API_PREFIX):
+                self.handle_api_get(path)
+            else:
+                self.render_page()
+
+    def send_response(self, code, message=None):
+        """
+        Envía la línea de estado y la anota en la traza de la petición.
+
+        En la última petición permitida de la conexión avisa del cierre.
+        """
+        tracing.annotate(status=code)
+        super().send_response(code, message)
+        if self._last_request:
+            self.send_header("Connection", "close")
+
+    def send_metrics(self) -> None:
+        """Exporta las métricas en formato de texto de Prometheus."""
+        body = REGISTRY.render().encode("utf-8")
+        self.send_body(200, "text/plain; version=0.0.4; charset=utf-8", body)
+
+    def send_event_stream(self) -> None:
+        """
+        Abre un stream de Server-Sent Events con los cambios de token.
+
+        Tras las cabeceras, la conexión pasa al hilo de EventStream y el hilo
+        del pool queda libre. Un cliente que reconecta con Last-Event-ID recibe
+        los eventos que se perdió; uno nuevo (o con un ID que ya no está en el
+        historial) recibe primero el token actual.
+        """
+        stream = self.events
+        if stream is None:
+            self.send_error(404, "Eventos no disponibles")
+            return
+        if not stream.has_capacity():
+            self.send_body(503, "text/plain; charset=utf-8", "Demasiados clientes de eventos.".encode("utf-8"))
+            return
+
+        hub = stream.hub
+        try:
+            last_id = int(self.headers.get("Last-Event-ID", ""))
+        except ValueError:
+            last_id = None
+
+        snapshot = b""
+        if last_id is None or hub.since(last_id) is None:
+            last_id = hub.last_id
+            token = self.token_service.get_current_token()
+            snapshot = TokenEvent(
+                last_id, "token", {"token": token, "exp": get_jwt_expiry(token), "source": "snapshot"}
+            ).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("X-Accel-Buffering", "no")
+        # Sin Content-Length: el cuerpo termina al cerrarse la conexión
+        if not self._last_request:
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+        self.close_connection = True
+        self.server.detach_request(self.request)
+        stream.add_client(self.connection, last_id, f"retry: {RETRY_MS}\n\n".encode("ascii") + snapshot)
+
+    def send_static(self, name: str, query: str) -> None:
+        """
+        Sirve un recurso estático con ETag y Cache-Control.
+
+        Con la versión actual en la URL (`?v=...`) el navegador puede guardarlo
+        indefinidamente; sin ella, debe revalidarlo con If-None-Match.
+
+        Args:
+            name: Nombre del recurso
+            query: Query string de la petición
+        """
+        asset = self.assets.get(urllib.parse.unquote(name))
+        if asset is None:
+            self.send_error(404, "Recurso no encontrado")
+            return
+
+        version = urllib.parse.parse_qs(query).get("v", [""])[0]
+        cache_control = self.immutable_cache_control if version == asset.version else "no-cache"
+        headers = {"ETag": asset.etag, "Cache-Control": cache_control}
+
+        # El 304 lleva el ETag de la variante que se enviaría
+        compressed = asset.gzip_body is not None and self._uses_gzip(asset.content_type, len(asset.body))
+        if self._etag_matches(asset.gzip_etag if compressed else asset.etag):
+            if compressed:
+                headers["ETag"] = asset.gzip_etag
+            self.send_response(304)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        self.send_body(200, asset.content_type, asset.body, headers, gzip_body=asset.gzip_body)
+
+    def send_body(
+        self,
+        status: int,
+        content_type: str,
+        body: bytes,
+        headers: Optional[dict] = None,
+        gzip_body: Optional[bytes] = None,
+    ) -> None:
+        """
+        Envía una respuesta completa, comprimida con gzip si el cliente lo acepta.
+
+        La variante comprimida lleva su propio ETag (sufijo `-gz`).
+
+        Args:
+            status: Código HTTP
+            content_type: Cabecera Content-Type
+            body: Cuerpo sin comprimir
+            headers: Cabeceras adicionales
+            gzip_body: Cuerpo ya comprimido (recursos estáticos)
+        """
+        compressible = is_compressible(content_type) and len(body) >= self.gzip_min_bytes
+        encoding = "identity"
+        if compressible and self._accepts_gzip():
+            body = gzip_body if gzip_body is not None else gzip.compress(body, compresslevel=6)
+            encoding = "gzip"
+            if headers and "ETag" in headers:
+                headers = {**headers, "ETag": gzip_etag(headers["ETag"])}
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding == "gzip":
+            self.send_header("Content-Encoding", "gzip")
+        if compressible:
+            self.send_header("Vary", "Accept-Encoding")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        WEB_RESPONSE_BYTES.inc(len(body), encoding=encoding)
+
+    def _uses_gzip(self, content_type: str, size: int) -> bool:
+        """Indica si send_body() comprimiría una respuesta de ese tipo y tamaño."""
+        return is_compressible(content_type) and size >= self.gzip_min_bytes and self._accepts_gzip()
+
+    def _accepts_gzip(self) -> bool:
+        """Comprueba si Accept-Encoding admite gzip (q distinto de 0)."""
+        header = self.headers.get("Accept-Encoding", "")
+        for item in header.split(","):
+            coding, _, params = item.partition(";")
+            if coding.strip().lower() not in ("gzip", "*"):
+                continue
+            quality = params.strip().lower()
+            if quality.startswith("q="):
+                try:
+                    return float(quality[2:]) > 0
+                except ValueError:
+                    return False
+            return True
+        return False
 
     def do_POST(self):
         """Maneja peticiones POST."""
+        with tracing.trace(f"POST {urllib.parse.urlsplit(self.path).path}"):
+            self._dispatch_post()
+
+    def _dispatch_post(self):
+        """Atiende un POST del formulario o de la API JSON."""
         length = int(self.headers.get("Content-Length", "0"))
-        body = self.rfile.read(length).decode("utf-8")
+        raw_body = self.rfile.read(length)
+
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith(API_PREFIX):
+            self.handle_api_post(path, raw_body)
+            return
+
+        body = raw_body.decode("utf-8")
         data = urllib.parse.parse_qs(body)
 
         action = (data.get("action", [""])[0] or "").strip()
+        tracing.annotate(action=action)
 
         if action == "update_files":
             self._handle_update_files(data)
@@ -77,19 +365,23 @@ class TokenRequestHandler(http.server.BaseHTTPRequestHandler):
         context = {
             "msg_block": msg_html,
             "current_token": current_token,
-            "json_path": self.token_service.config.json_path,
-            "js_path": self.token_service.config.js_path,
+            "target_list": self._build_target_list(),
             "db_result_block": db_html,
             "login_result_block": login_html,
             "token_animation_class": token_animation_class,
+            "styles_css_url": self.assets.url("styles.css"),
+            "app_js_url": self.assets.url("app.js"),
         }
 
         html = self.renderer.render("index.html", context)
 
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
-        self.end_headers()
-        self.wfile.write(html.encode("utf-8"))
+        # La página muestra el token: no se guarda en cachés
+        self.send_body(
+            200,
+            "text/html; charset=utf-8",
+            html.encode("utf-8"),
+            {"Cache-Control": "no-store"},
+        )
 
     def _build_message_block(self, message: str, error: str) -> str:
         """Construye el bloque de mensajes."""
@@ -100,6 +392,13 @@ class TokenRequestHandler(http.server.BaseHTTPRequestHandler):
             msg_html += f'<div class="alert alert-error">❌ {error}</div>'
         return msg_html
 
+    def _build_target_list(self) -> str:
+        """Construye la lista de archivos que se actualizarán."""
+        return "".join(
+            f"<li>📄 {self.renderer.escape_html(target.describe())}</li>"
+            for target in self.token_service.file_manager.targets
+        )
+
     def _build_db_result_block(self, db_result: str) -> str:
         """Construye el bloque de resultados de la base de datos."""
         if not db_result:
@@ -135,9 +434,15 @@ class TokenRequestHandler(http.server.BaseHTTPRequestHandler):
             return
 
         try:
-            self.token_service.update_token_manually(new_token)
+            results = self.token_service.update_token_manually(new_token)
+            summary = ", ".join(
+                f"{result.path.name}: "
+                f"{'actualizado' if result.status == result.UPDATED else 'sin cambios'} "
+                f"({result.elapsed_ms:.1f} ms)"
+                for result in results
+            )
             self.render_page(
-                message="Token actualizado correctamente en ambos archivos.",
+                message=f"Token actualizado correctamente ({summary}).",
                 current_token_override=new_token,
             )
         except Exception as e:
@@ -159,7 +464,9 @@ class TokenRequestHandler(http.server.BaseHTTPRequestHandler):
             except ValueError:
                 prov_val = prov
 
-            db_token = self.token_service.update_token_from_database(prov_val)
+            # Acción explícita de consulta: siempre se lee de la base de datos
+            # (si falla, se conserva el token guardado en la caché y el almacén)
+            db_token = self.token_service.update_token_from_database(prov_val, use_cache=False)
             db_info = f"CPPR_PROVISIONINGID = {prov}\n\nToken devuelto por la DB:\n{db_token}"
 
             self.render_page(
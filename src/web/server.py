@@ -2,49 +2,229 @@
 Servidor HTTP para la interfaz web.
 """
 import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 from ..config.settings import AppConfig
+from ..services.file_watcher import TokenFileWatcher
+from ..services.refresh_scheduler import TokenRefreshScheduler
 from ..services.token_service import TokenService
+from .events import EventStream
 from .handler import TokenRequestHandler
+from .static_assets import StaticAssets
 from .template_renderer import TemplateRenderer
 
 
+class ThreadPoolHTTPServer(socketserver.TCPServer):
+    """TCPServer que atiende las peticiones en un pool de hilos acotado."""
+
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        max_workers: int = 8,
+        queue_size: int = 32,
+    ):
+        """
+        Inicializa el servidor.
+
+        Args:
+            server_address: Tupla (host, puerto)
+            handler_class: Clase manejadora de peticiones
+            max_workers: Hilos que atienden peticiones en paralelo
+            queue_size: Peticiones que pueden esperar a un hilo libre; el resto
+                se rechazan con 503
+        """
+        super().__init__(server_address, handler_class)
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="token-web",
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        # Hilos que se dejan libres para peticiones nuevas (no los retiene keep-alive)
+        self.keepalive_reserve = max(1, max_workers // 4)
+        self._busy = 0
+        self._queued = 0
+        self._load_lock = threading.Lock()
+        # Conexiones que el manejador ha entregado a otro hilo (stream de eventos)
+        self._detached: set = set()
+        self._detached_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        """Encola la petición en el pool o la rechaza si está saturado."""
+        if not self._slots.acquire(blocking=False):
+            self._reject_request(request)
+            return
+
+        with self._load_lock:
+            self._queued += 1
+        try:
+            self._executor.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:
+            # El executor ya se ha cerrado
+            with self._load_lock:
+                self._queued -= 1
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def keepalive_allowed(self) -> bool:
+        """
+        Indica si una conexión ociosa puede seguir esperando en su hilo.
+
+        No se permite si hay peticiones esperando hilo o si quedan menos de
+        `keepalive_reserve` hilos libres para las conexiones nuevas.
+        """
+        with self._load_lock:
+            return self._queued == 0 and self._busy <= self.max_workers - self.keepalive_reserve
+
+    def _process_request_worker(self, request, client_address):
+        """Atiende una petición dentro de un hilo del pool."""
+        with self._load_lock:
+            self._queued -= 1
+            self._busy += 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._load_lock:
+                self._busy -= 1
+            with self._detached_lock:
+                detached = request in self._detached
+                self._detached.discard(request)
+            if not detached:
+                self.shutdown_request(request)
+            self._slots.release()
+
+    def detach_request(self, request) -> None:
+        """Marca una conexión para no cerrarla al terminar su manejador."""
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def _reject_request(self, request):
+        """Responde 503 cuando no queda sitio en la cola."""
+        body = "Servidor ocupado, inténtalo de nuevo.".encode("utf-8")
+        response = (
+            b"HTTP/1.0 503 Service Unavailable\r\n"
+            b"Content-Type: text/plain; charset=utf-8\r\n"
+            b"Retry-After: 1\r\n"
+            b"Connection: close\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+            + body
+        )
+        try:
+            request.sendall(response)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        """Cierra el socket y espera a que terminen las peticiones en curso."""
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
 class TokenWebServer:
     """Servidor web para la interfaz de gestión de tokens."""
 
-    def __init__(self, config: AppConfig):
+    def __init__(self, config: AppConfig, token_service: Optional[TokenService] = None):
         """
         Inicializa el servidor web.
 
         Args:
             config: Configuración de la aplicación
+            token_service: Servicio de tokens de la aplicación (se crea uno si no
+                se indica); el servidor lo cierra al detenerse
         """
+        start = time.perf_counter()
         self.config = config
-        self.token_service = TokenService(config)
+        self.token_service = token_service or TokenService(config)
         self.renderer = TemplateRenderer()
+        self.assets = StaticAssets()
+        self.scheduler = TokenRefreshScheduler(
+            self.token_service,
+            lead_time=config.refresh_lead_time,
+            jitter=config.refresh_jitter,
+            max_concurrency=config.refresh_max_concurrency,
+            retry_delay=config.refresh_retry_delay,
+        )
+        self.events = EventStream(
+            self.token_service.events,
+            heartbeat_interval=config.web_events_heartbeat,
+            max_clients=config.web_events_max_clients,
+        )
+        self.watcher = TokenFileWatcher(
+            [target.path for target in self.token_service.file_manager.targets],
+            lambda: self.token_service.publish_current_token("file"),
+            backend=config.token_watch_backend,
+            poll_interval=config.token_watch_poll_interval,
+        )
         self.httpd = None
+        self._created_at = start
+        self._startup_ms = {"servicios": (time.perf_counter() - start) * 1000}
 
     def start(self):
         """Inicia el servidor web."""
-        # Configurar variables de clase en el handler
-        TokenRequestHandler.token_service = self.token_service
-        TokenRequestHandler.renderer = self.renderer
+        # Configurar los servicios compartidos por el handler
+        TokenRequestHandler.configure(
+            self.token_service,
+            self.renderer,
+            self.assets,
+            keepalive_timeout=self.config.web_keepalive_timeout,
+            keepalive_max_requests=self.config.web_keepalive_max_requests,
+            events=self.events,
+        )
 
         print(f"🚀 Iniciando servidor web en http://0.0.0.0:{self.config.port}")
         print(f"📁 Archivos configurados:")
-        print(f"   • JSON: {self.config.json_path}")
-        print(f"   • JS: {self.config.js_path}")
+        for target in self.token_service.file_manager.targets:
+            print(f"   • {target.describe()}")
+        print(
+            f"🧵 Hilos de peticiones: {self.config.web_max_workers} "
+            f"(cola: {self.config.web_queue_size}, keep-alive: {self.config.web_keepalive_timeout:g}s)"
+        )
 
         # Validar rutas
         warnings = self.token_service.file_manager.validate_paths()
         for warning in warnings:
             print(f"⚠️  {warning}")
 
-        socketserver.TCPServer.allow_reuse_address = True
-        self.httpd = socketserver.TCPServer(
+        self.events.start()
+        backend = self.watcher.start()
+        print(f"📡 Eventos en directo en /events (cambios de archivos vía {backend})")
+
+        if self.config.refresh_watch_ids:
+            print(
+                f"⏰ Refresco automático antes de expirar para: "
+                f"{', '.join(self.config.refresh_watch_ids)}"
+            )
+            for provisioning_id in self.config.refresh_watch_ids:
+                self.scheduler.watch(provisioning_id)
+            self.scheduler.start()
+
+        start = time.perf_counter()
+        self.httpd = ThreadPoolHTTPServer(
             ("", self.config.port),
-            TokenRequestHandler
+            TokenRequestHandler,
+            max_workers=self.config.web_max_workers,
+            queue_size=self.config.web_queue_size,
         )
+        self._startup_ms["socket"] = (time.perf_counter() - start) * 1000
+        self._startup_ms["total"] = (time.perf_counter() - self._created_at) * 1000
+        print("⏱️  Arranque: " + " | ".join(f"{name} {ms:.1f} ms" for name, ms in self._startup_ms.items()))
+
+        if self.config.web_prewarm_database:
+            threading.Thread(
+                target=self.token_service.warm_up_database,
+                name="db-prewarm",
+                daemon=True,
+            ).start()
 
         try:
             self.httpd.serve_forever()
@@ -54,7 +234,12 @@ class TokenWebServer:
 
     def stop(self):
         """Detiene el servidor web."""
+        self.scheduler.stop()
+        self.watcher.stop()
+        self.events.stop()
         if self.httpd:
             self.httpd.shutdown()
+            self.httpd.server_close()
+        self.token_service.close()
 
 
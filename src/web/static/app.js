@@ -0,0 +1,121 @@
+function toggleDocs() {
+  const content = document.getElementById('docs-content');
+  const icon = document.getElementById('toggle-icon');
+  content.classList.toggle('show');
+  icon.classList.toggle('open');
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  const tokenTextarea = document.getElementById('token');
+  const updateBadge = document.getElementById('update-badge');
+  const tokenSection = document.getElementById('token-section');
+
+  if (tokenTextarea && tokenTextarea.classList.contains('token-updated')) {
+    if (updateBadge) {
+      showUpdateBadge(updateBadge.textContent.trim());
+    }
+
+    setTimeout(() => {
+      tokenSection.scrollIntoView({ behavior: 'smooth', block: 'center' });
+    }, 300);
+
+    createConfetti();
+
+    setTimeout(() => {
+      tokenTextarea.classList.remove('token-updated');
+      tokenTextarea.classList.add('token-updated-glow');
+    }, 2000);
+
+    setTimeout(() => {
+      tokenTextarea.classList.remove('token-updated-glow');
+    }, 5000);
+  }
+
+  connectEvents();
+});
+
+let badgeTimer = null;
+
+function showUpdateBadge(text) {
+  const updateBadge = document.getElementById('update-badge');
+  if (!updateBadge) return;
+
+  clearTimeout(badgeTimer);
+  updateBadge.textContent = text;
+  updateBadge.style.animation = '';
+  updateBadge.classList.add('show');
+  badgeTimer = setTimeout(() => {
+    updateBadge.style.animation = 'slideIn 0.5s ease-out reverse';
+    badgeTimer = setTimeout(() => updateBadge.classList.remove('show'), 500);
+  }, 5000);
+}
+
+// Cambios del token en directo (Server-Sent Events); el navegador reconecta solo
+function connectEvents() {
+  if (!window.EventSource) return;
+
+  const status = document.getElementById('live-status');
+  const source = new EventSource('/events');
+
+  source.onopen = () => {
+    if (!status) return;
+    status.classList.add('connected');
+    status.title = 'Actualización en directo activa';
+  };
+  source.onerror = () => {
+    if (!status) return;
+    status.classList.remove('connected');
+    status.title = 'Sin conexión con el servidor; reintentando...';
+  };
+
+  source.addEventListener('token', (event) => {
+    const data = JSON.parse(event.data);
+    const tokenTextarea = document.getElementById('token');
+    // No se pisa lo que el usuario está escribiendo
+    if (!tokenTextarea || tokenTextarea.value === data.token || document.activeElement === tokenTextarea) {
+      return;
+    }
+
+    tokenTextarea.value = data.token;
+    tokenTextarea.classList.remove('token-updated-glow');
+    void tokenTextarea.offsetWidth;
+    tokenTextarea.classList.add('token-updated-glow');
+    setTimeout(() => tokenTextarea.classList.remove('token-updated-glow'), 3000);
+
+    if (data.source !== 'snapshot') {
+      showUpdateBadge(data.source === 'file'
+        ? '✨ Token actualizado en los archivos'
+        : '✨ ¡Token actualizado!');
+    }
+  });
+
+  source.addEventListener('refresh', (event) => {
+    const data = JSON.parse(event.data);
+    const ids = data.provisioning_ids || [];
+    if (ids.length === 1) {
+      showUpdateBadge(`🔄 Token refrescado para provisioning ID ${ids[0]}`);
+    } else if (ids.length > 1) {
+      showUpdateBadge(`🔄 Tokens refrescados para ${ids.length} provisioning IDs`);
+    }
+  });
+}
+
+function createConfetti() {
+  const colors = ['#28a745', '#20c997', '#667eea', '#764ba2', '#ffc107'];
+  const tokenSection = document.getElementById('token-section');
+  const rect = tokenSection.getBoundingClientRect();
+
+  for (let i = 0; i < 30; i++) {
+    setTimeout(() => {
+      const confetti = document.createElement('div');
+      confetti.className = 'confetti';
+      confetti.style.left = (rect.left + Math.random() * rect.width) + 'px';
+      confetti.style.top = (rect.top + window.scrollY) + 'px';
+      confetti.style.background = colors[Math.floor(Math.random() * colors.length)];
+      confetti.style.borderRadius = Math.random() > 0.5 ? '50%' : '0';
+      confetti.style.transform = `rotate(${Math.random() * 360}deg)`;
+      document.body.appendChild(confetti);
+      setTimeout(() => confetti.remove(), 3000);
+    }, i * 50);
+  }
+}
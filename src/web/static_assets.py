@@ -0,0 +1,140 @@
+"""
+Recursos estáticos (CSS y JS) de la interfaz web.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+STATIC_PREFIX = "/static/"
+
+# Tipos que merece la pena comprimir
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def is_compressible(content_type: str) -> bool:
+    """Indica si un tipo de contenido se beneficia de gzip."""
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def gzip_etag(etag: str) -> str:
+    """
+    ETag de la variante comprimida con gzip.
+
+    Un ETag fuerte identifica los bytes enviados, así que la variante gzip
+    necesita uno distinto del de la variante sin comprimir.
+
+    Args:
+        etag: ETag entrecomillado de la variante sin comprimir
+
+    Returns:
+        ETag con el sufijo `-gz`
+    """
+    return etag[:-1] + '-gz"' if etag.endswith('"') else etag + "-gz"
+
+
+@dataclass
+class StaticAsset:
+    """Recurso estático preparado para servirse."""
+    name: str
+    content_type: str
+    body: bytes
+    gzip_body: Optional[bytes]
+    etag: str
+
+    @property
+    def gzip_etag(self) -> str:
+        """ETag de `gzip_body`."""
+        return gzip_etag(self.etag)
+
+    @property
+    def version(self) -> str:
+        """Versión del contenido para las URLs con caché de larga duración."""
+        return self.etag.strip('"')[:12]
+
+
+class StaticAssets:
+    """
+    Carga y cachea los recursos de un directorio.
+
+    Cada recurso se lee y se comprime una sola vez por versión del archivo
+    (mtime y tamaño), como los templates en TemplateRenderer.
+    """
+
+    def __init__(self, static_dir: str = None):
+        """
+        Inicializa los recursos.
+
+        Args:
+            static_dir: Directorio de los recursos (por defecto, web/static)
+        """
+        if static_dir is None:
+            static_dir = Path(__file__).parent / "static"
+
+        self.static_dir = Path(static_dir).resolve()
+
+        # nombre -> ((mtime_ns, size), recurso)
+        self._cache: dict[str, tuple[tuple[int, int], StaticAsset]] = {}
+        self._cache_lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        """
+        Obtiene un recurso, recargándolo si el archivo ha cambiado.
+
+        Args:
+            name: Nombre del archivo dentro del directorio
+
+        Returns:
+            Recurso o None si no existe o está fuera del directorio
+        """
+        path = (self.static_dir / name).resolve()
+        if path.parent != self.static_dir:
+            return None
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._cache.get(name)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        body = path.read_bytes()
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+
+        asset = StaticAsset(
+            name=name,
+            content_type=content_type,
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0) if is_compressible(content_type) else None,
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+        )
+
+        with self._cache_lock:
+            self._cache[name] = (version, asset)
+
+        return asset
+
+    def url(self, name: str) -> str:
+        """
+        URL versionada de un recurso (cambia con su contenido).
+
+        Args:
+            name: Nombre del archivo dentro del directorio
+
+        Returns:
+            Ruta con `?v=<versión>`, o sin versión si el recurso no existe
+        """
+        asset = self.get(name)
+        if asset is None:
+            return STATIC_PREFIX + name
+        return f"{STATIC_PREFIX}{name}?v={asset.version}"
@@ -1,9 +1,58 @@
 """
 Motor de renderizado de templates HTML.
 """
+import os
+import re
+import threading
+import time
 from pathlib import Path
 from typing import Dict, Any
 
+from ..services.metrics import TEMPLATE_CACHE_REQUESTS, TEMPLATE_RENDER_SECONDS
+
+
+# Variables simples {{ variable }}
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class CompiledTemplate:
+    """Template dividido en fragmentos literales y variables."""
+
+    def __init__(self, source: str):
+        """
+        Compila el template.
+
+        Args:
+            source: Contenido del template
+        """
+        self.literals: list[str] = []
+        self.placeholders: list[tuple[str, str]] = []
+
+        position = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(source):
+            self.literals.append(source[position:match.start()])
+            self.placeholders.append((match.group(1), match.group(0)))
+            position = match.end()
+        self.literals.append(source[position:])
+
+    def render(self, context: Dict[str, Any]) -> str:
+        """
+        Renderiza el template con un único join.
+
+        Las variables que no están en el contexto se dejan tal cual.
+
+        Args:
+            context: Diccionario con variables para reemplazar
+
+        Returns:
+            Texto renderizado
+        """
+        parts = [self.literals[0]]
+        for (name, raw), literal in zip(self.placeholders, self.literals[1:]):
+            parts.append(str(context.get(name, raw)))
+            parts.append(literal)
+        return "".join(parts)
+
 
 class TemplateRenderer:
     """Renderizador simple de templates HTML."""
@@ -20,6 +69,10 @@ class TemplateRenderer:
 
         self.templates_dir = Path(templates_dir)
 
+        # nombre -> ((mtime_ns, size), template compilado)
+        self._cache: Dict[str, tuple[tuple[int, int], CompiledTemplate]] = {}
+        self._cache_lock = threading.Lock()
+
     def render(self, template_name: str, context: Dict[str, Any]) -> str:
         """
         Renderiza un template con el contexto proporcionado.
@@ -31,20 +84,47 @@ class TemplateRenderer:
         Returns:
             HTML renderizado
         """
+        start = time.perf_counter()
+        html = self.get_template(template_name).render(context)
+        TEMPLATE_RENDER_SECONDS.observe(time.perf_counter() - start, template=template_name)
+        return html
+
+    def get_template(self, template_name: str) -> CompiledTemplate:
+        """
+        Obtiene el template compilado, recompilándolo si el archivo ha cambiado.
+
+        Args:
+            template_name: Nombre del archivo de template
+
+        Returns:
+            Template compilado
+        """
         template_path = self.templates_dir / template_name
+        stat = os.stat(template_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._cache.get(template_name)
+        if cached and cached[0] == version:
+            TEMPLATE_CACHE_REQUESTS.inc(result="hit")
+            return cached[1]
 
+        TEMPLATE_CACHE_REQUESTS.inc(result="miss")
         with open(template_path, "r", encoding="utf-8") as f:
-            template = f.read()
+            compiled = CompiledTemplate(f.read())
 
-        # Reemplazar variables simples {{ variable }}
-        for key, value in context.items():
-            placeholder = f"{{{{ {key} }}}}"
-            template = template.replace(placeholder, str(value))
+        with self._cache_lock:
+            self._cache[template_name] = (version, compiled)
 
-        return template
+        return compiled
 
     def escape_html(self, text: str) -> str:
-        """Escapa caracteres especiales de HTML."""
+        """
+        Escapa caracteres especiales de HTML.
+
+        Se mantiene la cadena de `replace` (en C) porque con respuestas HTML
+        densas es más rápida que `str.translate` con sustituciones de varios
+        caracteres (ver benchmarks/bench_template_renderer.py).
+        """
         return (text
             .replace("&", "&amp;")
             .replace("<", "&lt;")
@@ -53,4 +133,3 @@ class TemplateRenderer:
             .replace("}", "&#125;")
             .replace('"', "&quot;")
             .replace("'", "&#39;"))
-